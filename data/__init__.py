@@ -5,8 +5,12 @@ from .cifar_10 import Cifar10
 from .pascal_voc import PascalVOC
 
 from .helper.inputs import inputs
-from .helper.iterator import iterator
-from .helper.tfrecord import read_tfrecord, write_tfrecord
+from .helper.iterator import iterator, record_iterator, parallel_iterator,\
+                             WorkerPool
+from .helper.tfrecord import read_tfrecord, read_tfrecord_np,\
+                            write_tfrecord
+from .helper.shard import ShardedTFRecordWriter, shard_filenames,\
+                          manifest_filenames
 
 
 datasets = {'cifar_10': Cifar10,
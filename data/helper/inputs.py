@@ -10,7 +10,7 @@ NUM_THREADS = 16
 
 def inputs(dataset, eval_data, batch_size=128, scale_inputs=1,
            distort_inputs=False, zero_mean_inputs=False, num_epochs=None,
-           shuffle=False):
+           shuffle=False, ordered=False):
     """Constructs inputs from a dataset.
 
     Args:
@@ -27,6 +27,10 @@ def inputs(dataset, eval_data, batch_size=128, scale_inputs=1,
           before raising an OutOfRange error (optional).
         shuffle: Boolean indiciating if one wants to shuffle the inputs
           (optional).
+        ordered: Boolean indicating if the inputs should be read in the order
+          of the files with a single thread, so that every run reads them in
+          the same order (optional). The filenames and distortions are still
+          chosen by `shuffle`, but the inputs are not shuffled.
 
     Returns:
         data_batch: 4D tensor of [batch_size, height, width, depth] size.
@@ -52,12 +56,17 @@ def inputs(dataset, eval_data, batch_size=128, scale_inputs=1,
         filenames = dataset.eval_filenames
         num_examples_per_epoch = dataset.num_examples_per_epoch_for_eval
 
+    # Multiple threads enqueue the examples in the order they finish reading
+    # them.
+    num_threads = 1 if ordered else NUM_THREADS
+    shuffle_examples = shuffle and not ordered
+
     if num_epochs is None:
         filename_queue = tf.train.string_input_producer(
-            filenames, shuffle=shuffle)
+            filenames, shuffle=shuffle_examples)
     else:
         filename_queue = tf.train.string_input_producer(
-            filenames, num_epochs, shuffle)
+            filenames, num_epochs, shuffle_examples)
 
     # Read examples from files in the filename queue.
     record = dataset.read(filename_queue)
@@ -80,18 +89,19 @@ def inputs(dataset, eval_data, batch_size=128, scale_inputs=1,
 
     # Create a queue that shuffles the examples, and then read batch_size
     # data + labels from the example queue.
-    if shuffle:
+    if shuffle_examples:
         data_batch, label_batch = tf.train.shuffle_batch(
             [record.data, record.label],
             batch_size=batch_size,
-            num_threads=NUM_THREADS,
+            num_threads=num_threads,
             capacity=capacity,
-            min_after_dequeue=min_queue_examples)
+            min_after_dequeue=min_queue_examples,
+            allow_smaller_final_batch=False if num_epochs is None else True)
     else:
         data_batch, label_batch = tf.train.batch(
             [record.data, record.label],
             batch_size=batch_size,
-            num_threads=NUM_THREADS,
+            num_threads=num_threads,
             capacity=capacity,
             allow_smaller_final_batch=False if num_epochs is None else True)
 
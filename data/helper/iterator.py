@@ -1,11 +1,21 @@
+import io
+import pickle
+import signal
+import collections
+import multiprocessing
+
 import tensorflow as tf
 
 from .inputs import inputs
+from .tfrecord import read_tfrecord_np
+
+
+MAX_PENDING_PER_WORKER = 4
 
 
 def iterator(dataset, eval_data, batch_size=1, scale_inputs=1,
              distort_inputs=False, zero_mean_inputs=False, num_epochs=1,
-             shuffle=False):
+             shuffle=False, skip=0, ordered=False):
 
     """Returns a function which iterates over a dataset in batches.
 
@@ -23,12 +33,20 @@ def iterator(dataset, eval_data, batch_size=1, scale_inputs=1,
           (optional).
         shuffle: Boolean indiciating if one wants to shuffle the inputs
           (optional).
+        skip: Number of records to read and drop before calling the
+          callbacks, e.g. to resume an iteration (optional). The operations
+          of the before callback are not run for skipped records. Only whole
+          batches are dropped, so the first passed batch may still contain
+          up to `batch_size - 1` skipped records. Requires `ordered`, so
+          that the same records are skipped on every run.
+        ordered: Boolean indicating if the inputs should be read in the same
+          order on every run (optional). See `inputs`.
 
     Returns:
         A function that iterates over the dataset.
     """
 
-    def _iterate(each, before=None, done=None):
+    def _iterate(each, before=None, done=None, interrupt=None):
         """Iterates over a dataset defined by the iterator.
 
         Args:
@@ -47,6 +65,11 @@ def iterator(dataset, eval_data, batch_size=1, scale_inputs=1,
                 index: The passed number of records.
                 last_index: The maximal number of records to iterate. Can be
                   None.
+            interrupt: Function that is called before the done callback if
+              the iteration is interrupted by the user (optional).
+                index: The passed number of records.
+                last_index: The maximal number of records to iterate. Can be
+                  None.
         """
 
         index = 0
@@ -69,7 +92,8 @@ def iterator(dataset, eval_data, batch_size=1, scale_inputs=1,
                                              distort_inputs=distort_inputs,
                                              zero_mean_inputs=zero_mean_inputs,
                                              num_epochs=num_epochs,
-                                             shuffle=shuffle)
+                                             shuffle=shuffle,
+                                             ordered=ordered)
 
             if batch_size == 1:
                 # Remove the first dimension, because we only consider batch
@@ -96,13 +120,20 @@ def iterator(dataset, eval_data, batch_size=1, scale_inputs=1,
                         if last_index is not None:
                             index = min(index, last_index)
 
+                        # Only dequeue skipped records without running the
+                        # operations of the before callback.
+                        if index <= skip:
+                            monitored_session.run(data_batch)
+                            continue
+
                         output_batch = monitored_session.run(input_batch)
 
                         # Call the callback for each computed output batch.
                         each(output_batch, index, last_index)
 
             except KeyboardInterrupt:
-                pass
+                if interrupt is not None:
+                    interrupt(index, last_index)
 
             finally:
                 # Call the optional done callback.
@@ -110,3 +141,250 @@ def iterator(dataset, eval_data, batch_size=1, scale_inputs=1,
                     done(index, last_index)
 
     return _iterate
+
+
+def record_iterator(filenames, count, shapes={}, dtypes={}, batch_size=1,
+                    skip=0):
+    """Returns a function which iterates over the examples of TFRecord files
+    in batches with numpy without building up a TensorFlow session.
+
+    Args:
+        filenames: The TFRecord filenames to read in order.
+        count: The number of examples in all files.
+        shapes: A dictionary containing the shape for a feature in a single
+          example.
+        dtypes: A dictionary containing the name of the dtype a feature is
+          stored with (optional).
+        batch_size: Number of examples per batch (optional). The last batch
+          may be smaller.
+        skip: Number of examples to read and drop before calling the
+          callbacks, e.g. to resume an iteration (optional).
+
+    Returns:
+        A function that iterates over the examples with the same signature as
+        the function returned by `iterator`. Each output is a list of
+        [data, label] examples, where data is a dictionary of numpy arrays.
+    """
+
+    def _iterate(each, before=None, done=None, interrupt=None):
+        if before is not None:
+            raise ValueError('Record iterators have no before callback.')
+
+        index = 0
+        batch = []
+
+        try:
+            for filename in filenames:
+                for serialized in tf.python_io.tf_record_iterator(filename):
+                    if index < skip:
+                        index += 1
+                        continue
+
+                    batch.append(read_tfrecord_np(serialized, shapes, dtypes))
+
+                    if len(batch) == batch_size:
+                        index += len(batch)
+                        each(batch, index, count)
+                        batch = []
+
+            if len(batch) > 0:
+                index += len(batch)
+                each(batch, index, count)
+
+        except KeyboardInterrupt:
+            if interrupt is not None:
+                interrupt(index, count)
+
+        finally:
+            if done is not None:
+                done(index, count)
+
+    return _iterate
+
+
+class WorkerPool(object):
+    """A pool of worker processes running the functions of parallel
+    iterators.
+
+    The workers are forked when the pool is created. Forking a process while
+    TensorFlow runs threads can deadlock the forked process, so create the
+    pool before running any TensorFlow session and reuse it for every
+    parallel iterator.
+    """
+
+    def __init__(self, num_workers, objects=[]):
+        """Forks the worker processes.
+
+        Args:
+            num_workers: Number of worker processes.
+            objects: A list of objects the functions run by the workers can
+              refer to without pickling them, e.g. graphers holding closures
+              (optional). The workers inherit these objects when they are
+              forked.
+        """
+
+        self._num_workers = num_workers
+        self._ids = {id(obj): index for index, obj in enumerate(objects)}
+
+        context = multiprocessing.get_context('fork')
+        self._pool = context.Pool(num_workers, initializer=_init_worker,
+                                  initargs=(list(objects),))
+
+    @property
+    def num_workers(self):
+        """The number of worker processes.
+
+        Returns:
+            A number.
+        """
+
+        return self._num_workers
+
+    def dumps(self, function):
+        """Pickles a function to run in the workers.
+
+        Args:
+            function: The function. It and its arguments must be picklable,
+              except for the objects of the pool.
+
+        Returns:
+            The pickled function.
+        """
+
+        stream = io.BytesIO()
+        _Pickler(stream, self._ids).dump(function)
+        return stream.getvalue()
+
+    def apply_async(self, function, output_batch):
+        """Runs a pickled function on an output batch in a worker.
+
+        Args:
+            function: A function pickled by `dumps`.
+            output_batch: The output batch to pass to the function.
+
+        Returns:
+            The `multiprocessing.pool.AsyncResult` of the call.
+        """
+
+        return self._pool.apply_async(_run_worker, (function, output_batch))
+
+    def close(self):
+        """Stops all workers, including those still running a function."""
+
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def parallel_iterator(iterate, function, pool, ordered=True,
+                      max_pending_per_worker=MAX_PENDING_PER_WORKER):
+    """Returns a function which iterates over an iterator while mapping each
+    output batch through a function in a pool of worker processes.
+
+    Args:
+        iterate: A function returned by `iterator` or `record_iterator`.
+        function: Function that is called in a worker process for every
+          output batch and whose return value is passed to the `each`
+          callback. It must only use numpy and must not run TensorFlow
+          operations. It is pickled, see `WorkerPool.dumps`.
+        pool: The `WorkerPool` to run `function` in.
+        ordered: Boolean indicating if the outputs should be passed in the
+          order of the iterator (optional). If False, outputs are passed as
+          soon as they are computed.
+        max_pending_per_worker: Maximal number of output batches per worker
+          that are queued at the same time (optional).
+
+    Returns:
+        A function that iterates over the dataset with the same signature as
+        the function returned by `iterator`.
+    """
+
+    def _iterate(each, before=None, done=None, interrupt=None):
+        # Pickle the function once instead of for every output batch.
+        pickled_function = pool.dumps(function)
+
+        max_pending = pool.num_workers * max_pending_per_worker
+        pending = collections.deque()
+
+        def _flush(last_index, wait):
+            while len(pending) > 0:
+                if ordered:
+                    ready = pending[0] if pending[0][1].ready() else None
+                else:
+                    ready = next((p for p in pending if p[1].ready()), None)
+
+                if ready is None:
+                    # Only block if the queue is full or we need to wait for
+                    # all remaining outputs.
+                    if not wait and len(pending) < max_pending:
+                        return
+
+                    ready = pending[0]
+
+                pending.remove(ready)
+                each(ready[1].get(), ready[0], last_index)
+
+        def _each(output_batch, index, last_index):
+            result = pool.apply_async(pickled_function, output_batch)
+            pending.append((index, result))
+            _flush(last_index, wait=False)
+
+        def _done(index, last_index):
+            try:
+                _flush(last_index, wait=True)
+            finally:
+                if done is not None:
+                    done(index, last_index)
+
+        iterate(_each, before, _done, interrupt)
+
+    return _iterate
+
+
+class _Pickler(pickle.Pickler):
+    """Pickler referring to the objects of a `WorkerPool` by their index."""
+
+    def __init__(self, stream, ids):
+        super().__init__(stream, pickle.HIGHEST_PROTOCOL)
+        self._ids = ids
+
+    def persistent_id(self, obj):
+        return self._ids.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    """Unpickler resolving the objects of a `WorkerPool` in a worker."""
+
+    def persistent_load(self, index):
+        return _worker_objects[index]
+
+
+_worker_objects = []
+_worker_functions = {}
+
+
+def _init_worker(objects):
+    """Initializes a worker process of a `WorkerPool`."""
+
+    global _worker_objects
+    _worker_objects = objects
+
+    # Let the main process handle keyboard interrupts, so that it can finish
+    # all pending outputs.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_worker(function, output_batch):
+    """Runs a pickled function of `parallel_iterator` on an output batch."""
+
+    # Only unpickle each function once per worker.
+    if function not in _worker_functions:
+        _worker_functions.clear()
+        _worker_functions[function] = _Unpickler(io.BytesIO(function)).load()
+
+    return _worker_functions[function](output_batch)
@@ -0,0 +1,164 @@
+import os
+import time
+from functools import partial
+
+import tensorflow as tf
+
+from ..dataset import DataSet
+from .record import Record
+from .iterator import iterator, parallel_iterator, WorkerPool
+
+
+class _Numbers(DataSet):
+    """Dataset of single pixel images holding the numbers up to 10."""
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+
+        with open(self.train_filenames[0], 'wb') as f:
+            f.write(bytes(range(10)))
+
+    @classmethod
+    def create(cls, config):
+        return cls(config['data_dir'])
+
+    @property
+    def train_filenames(self):
+        return [os.path.join(self.data_dir, 'numbers.bin')]
+
+    @property
+    def eval_filenames(self):
+        return self.train_filenames
+
+    @property
+    def labels(self):
+        return [str(i) for i in range(10)]
+
+    @property
+    def num_examples_per_epoch_for_train(self):
+        return 10
+
+    @property
+    def num_examples_per_epoch_for_eval(self):
+        return 10
+
+    def read(self, filename_queue):
+        reader = tf.FixedLengthRecordReader(record_bytes=1)
+        _, value = reader.read(filename_queue)
+
+        number = tf.decode_raw(value, tf.uint8)
+        data = tf.reshape(tf.cast(number, tf.float32), [1, 1, 1])
+
+        return Record(data, [1, 1, 1], tf.cast(number, tf.int64))
+
+
+def _iterate(outputs):
+    """Returns an iterate function passing the outputs one after another."""
+
+    def _iterate(each, before=None, done=None, interrupt=None):
+        index = 0
+
+        try:
+            for output in outputs:
+                index += 1
+                each(output, index, len(outputs))
+
+        finally:
+            if done is not None:
+                done(index, len(outputs))
+
+    return _iterate
+
+
+def _apply(function, value):
+    return function(value)
+
+
+def _square(value):
+    # Finish the outputs in a different order than they are passed.
+    time.sleep(0.01 * (2 - value % 3))
+    return value * value
+
+
+class IteratorTest(tf.test.TestCase):
+
+    def test_smaller_final_batch(self):
+        dataset = _Numbers(self.get_temp_dir())
+
+        # Shuffled and unshuffled iterations pass all examples, although the
+        # batch size doesn't divide the number of examples.
+        for shuffle in [True, False]:
+            labels = []
+
+            def _each(output_batch, index, last_index):
+                labels.extend(output_batch[1].tolist())
+
+            iterate = iterator(dataset, eval_data=False, batch_size=4,
+                               shuffle=shuffle)
+            iterate(_each)
+
+            self.assertEqual(sorted(labels), list(range(10)))
+
+
+class ParallelIteratorTest(tf.test.TestCase):
+
+    def _run(self, ordered, function=_square, objects=[]):
+        passed = []
+        done = []
+
+        def _each(output, index, last_index):
+            passed.append((output, index))
+
+        def _done(index, last_index):
+            done.append((len(passed), index, last_index))
+
+        with WorkerPool(3, objects) as pool:
+            iterate = parallel_iterator(_iterate(list(range(10))), function,
+                                        pool, ordered)
+            iterate(_each, done=_done)
+
+        return passed, done
+
+    def test_ordered(self):
+        passed, _ = self._run(ordered=True)
+
+        self.assertEqual(passed, [(i * i, i + 1) for i in range(10)])
+
+    def test_unordered(self):
+        passed, _ = self._run(ordered=False)
+
+        self.assertEqual(sorted(passed), [(i * i, i + 1) for i in range(10)])
+
+    def test_done(self):
+        # All outputs are passed before the done callback is called.
+        for ordered in [True, False]:
+            _, done = self._run(ordered)
+            self.assertEqual(done, [(10, 10, 10)])
+
+    def test_objects(self):
+        offset = 100
+
+        # Closures can't be pickled, so the workers inherit them.
+        def _add_offset(value):
+            return value + offset
+
+        passed, _ = self._run(ordered=True,
+                              function=partial(_apply, _add_offset),
+                              objects=[_add_offset])
+
+        self.assertEqual(passed, [(i + 100, i + 1) for i in range(10)])
+
+    def test_pool_reuse(self):
+        # A pool runs the functions of multiple iterations.
+        with WorkerPool(2) as pool:
+            for function in [_square, partial(_apply, abs)]:
+                passed = []
+
+                def _each(output, index, last_index):
+                    passed.append(output)
+
+                iterate = parallel_iterator(_iterate([-1, -2, -3]), function,
+                                            pool)
+                iterate(_each)
+
+                self.assertEqual(passed, [function(v) for v in [-1, -2, -3]])
@@ -0,0 +1,199 @@
+import os
+import json
+
+import tensorflow as tf
+
+
+def shard_filenames(filename, num_shards):
+    """Computes the filenames of the shards of a TFRecord file.
+
+    Args:
+        filename: The filename of the unsharded file, e.g. `train.tfrecords`.
+        num_shards: The number of shards.
+
+    Returns:
+        A list of filenames in the format `train-00000-of-00004.tfrecords`.
+        If there is only one shard, the unsharded filename is returned.
+    """
+
+    if num_shards == 1:
+        return [filename]
+
+    base, extension = os.path.splitext(filename)
+
+    return ['{}-{:05d}-of-{:05d}{}'.format(base, i, num_shards, extension)
+            for i in range(num_shards)]
+
+
+class ShardedTFRecordWriter(object):
+    """TFRecord writer that distributes records over shards.
+
+    By default, records are distributed round-robin over all shards. If a
+    shard size is given, the shards are filled one after another instead and
+    every completed shard is recorded in a progress file, so that an
+    interrupted write can be resumed from the last completed shard.
+    """
+
+    def __init__(self, filename, num_shards=1, shard_size=None,
+                 progress_filename=None):
+        """Creates a writer that writes records to multiple shards.
+
+        Args:
+            filename: The filename of the unsharded file.
+            num_shards: The number of shards (optional).
+            shard_size: The number of records of each shard (optional). If
+              None, records are distributed round-robin.
+            progress_filename: The filename to save the manifest of all
+              completed shards to (optional). Requires a shard size.
+        """
+
+        self._filenames = shard_filenames(filename, num_shards)
+        self._shard_size = shard_size
+        self._progress_filename = progress_filename
+        self._counts = [0 for _ in self._filenames]
+        self._completed = []
+        self._index = 0
+
+        if shard_size is None:
+            self._writers = [tf.python_io.TFRecordWriter(f)
+                             for f in self._filenames]
+        else:
+            # Shards are opened one after another.
+            self._writers = [None for _ in self._filenames]
+
+    def resume(self):
+        """Resumes a previous write from the progress file. Shards that are
+        not listed as completed in the progress file are overwritten.
+
+        Returns:
+            The number of records already written to the completed shards.
+        """
+
+        if self._progress_filename is None or\
+           not os.path.exists(self._progress_filename):
+            return 0
+
+        with open(self._progress_filename, 'r') as f:
+            progress = json.load(f)
+
+        # The progress is only valid if it was written with the same shards.
+        if progress['shard_size'] != self._shard_size or\
+           progress['num_shards'] != len(self._filenames):
+            return 0
+
+        self._completed = progress['shards']
+        self._index = len(self._completed)
+
+        for i, shard in enumerate(self._completed):
+            self._counts[i] = shard['count']
+
+        return sum(self._counts)
+
+    def write(self, record):
+        """Writes a serialized record to the next shard.
+
+        Args:
+            record: A string with the serialized record.
+        """
+
+        if self._shard_size is None:
+            self._writers[self._index].write(record)
+            self._counts[self._index] += 1
+            self._index = (self._index + 1) % len(self._writers)
+            return
+
+        if self._writers[self._index] is None:
+            self._writers[self._index] = tf.python_io.TFRecordWriter(
+                self._filenames[self._index])
+
+        self._writers[self._index].write(record)
+        self._counts[self._index] += 1
+
+        # Close a full shard and mark it as completed. The last shard takes
+        # all remaining records.
+        if self._counts[self._index] == self._shard_size and\
+           self._index < len(self._writers) - 1:
+            self._writers[self._index].close()
+            self._writers[self._index] = None
+            self._completed.append(self._shard(self._index))
+            self._write_progress()
+            self._index += 1
+
+    def close(self):
+        """Closes all shards."""
+
+        for i, writer in enumerate(self._writers):
+            if writer is not None:
+                writer.close()
+
+            if self._shard_size is not None:
+                self._writers[i] = None
+
+    @property
+    def count(self):
+        """The number of written records of all shards."""
+
+        return sum(self._counts)
+
+    @property
+    def shards(self):
+        """The manifest of the written shards. Only valid after closing.
+
+        Returns:
+            A list of objects holding the filename relative to the data
+            directory, the number of examples and the size in bytes of each
+            non-empty shard.
+        """
+
+        return [self._shard(i) for i in range(len(self._filenames))
+                if self._counts[i] > 0]
+
+    def _shard(self, index):
+        """The manifest of a single shard.
+
+        Args:
+            index: The index of the shard.
+
+        Returns:
+            An object holding the filename, the number of examples and the
+            size in bytes of the shard.
+        """
+
+        filename = self._filenames[index]
+
+        return {'filename': os.path.basename(filename),
+                'count': self._counts[index],
+                'bytes': os.path.getsize(filename)}
+
+    def _write_progress(self):
+        """Writes the manifest of all completed shards to the progress file."""
+
+        if self._progress_filename is None:
+            return
+
+        with open(self._progress_filename, 'w') as f:
+            json.dump({'shard_size': self._shard_size,
+                       'num_shards': len(self._filenames),
+                       'shards': self._completed}, f)
+
+
+def manifest_filenames(info_filename, filename):
+    """Reads the filenames of all shards from the manifest in an info file.
+
+    Args:
+        info_filename: The info filename holding the manifest.
+        filename: The filename of the unsharded file that is returned if the
+          info file has no manifest.
+
+    Returns:
+        A list of absolute filenames.
+    """
+
+    with open(info_filename, 'r') as f:
+        shards = json.load(f).get('shards')
+
+    if shards is None:
+        return [filename]
+
+    data_dir = os.path.dirname(info_filename)
+    return [os.path.join(data_dir, shard['filename']) for shard in shards]
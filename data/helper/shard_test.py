@@ -0,0 +1,118 @@
+import os
+import json
+
+import tensorflow as tf
+
+from .shard import ShardedTFRecordWriter, shard_filenames,\
+                   manifest_filenames
+
+
+def _read(filename):
+    return [int(record) for record in
+            tf.python_io.tf_record_iterator(filename)]
+
+
+class ShardTest(tf.test.TestCase):
+
+    def test_shard_filenames(self):
+        self.assertEqual(shard_filenames('/tmp/train.tfrecords', 1),
+                         ['/tmp/train.tfrecords'])
+        self.assertEqual(shard_filenames('/tmp/train.tfrecords', 2),
+                         ['/tmp/train-00000-of-00002.tfrecords',
+                          '/tmp/train-00001-of-00002.tfrecords'])
+
+    def test_round_robin(self):
+        filename = os.path.join(self.get_temp_dir(), 'round.tfrecords')
+        writer = ShardedTFRecordWriter(filename, num_shards=3)
+
+        for i in range(7):
+            writer.write(str(i).encode())
+
+        writer.close()
+
+        filenames = shard_filenames(filename, 3)
+        self.assertEqual(_read(filenames[0]), [0, 3, 6])
+        self.assertEqual(_read(filenames[1]), [1, 4])
+        self.assertEqual(_read(filenames[2]), [2, 5])
+        self.assertEqual(writer.count, 7)
+
+    def test_sequential(self):
+        filename = os.path.join(self.get_temp_dir(), 'sequential.tfrecords')
+        writer = ShardedTFRecordWriter(filename, num_shards=3, shard_size=3)
+
+        for i in range(7):
+            writer.write(str(i).encode())
+
+        writer.close()
+
+        filenames = shard_filenames(filename, 3)
+        self.assertEqual(_read(filenames[0]), [0, 1, 2])
+        self.assertEqual(_read(filenames[1]), [3, 4, 5])
+        self.assertEqual(_read(filenames[2]), [6])
+
+    def test_manifest(self):
+        data_dir = self.get_temp_dir()
+        filename = os.path.join(data_dir, 'manifest.tfrecords')
+        info_filename = os.path.join(data_dir, 'manifest_info.json')
+
+        writer = ShardedTFRecordWriter(filename, num_shards=3, shard_size=4)
+
+        for i in range(6):
+            writer.write(str(i).encode())
+
+        writer.close()
+
+        # Empty shards are not part of the manifest.
+        shards = writer.shards
+        filenames = shard_filenames(filename, 3)
+
+        self.assertEqual([shard['filename'] for shard in shards],
+                         [os.path.basename(f) for f in filenames[:2]])
+        self.assertEqual([shard['count'] for shard in shards], [4, 2])
+        self.assertEqual([shard['bytes'] for shard in shards],
+                         [os.path.getsize(f) for f in filenames[:2]])
+
+        with open(info_filename, 'w') as f:
+            json.dump({'count': writer.count, 'shards': shards}, f)
+
+        self.assertEqual(manifest_filenames(info_filename, filename),
+                         filenames[:2])
+
+        with open(info_filename, 'w') as f:
+            json.dump({'count': writer.count}, f)
+
+        self.assertEqual(manifest_filenames(info_filename, filename),
+                         [filename])
+
+    def test_resume(self):
+        data_dir = self.get_temp_dir()
+        filename = os.path.join(data_dir, 'resume.tfrecords')
+        progress_filename = os.path.join(data_dir, 'resume_progress.json')
+
+        # Interrupt a write in the middle of the second shard.
+        writer = ShardedTFRecordWriter(filename, 3, 3, progress_filename)
+
+        for i in range(5):
+            writer.write(str(i).encode())
+
+        writer.close()
+
+        writer = ShardedTFRecordWriter(filename, 3, 3, progress_filename)
+        self.assertEqual(writer.resume(), 3)
+
+        for i in range(3, 8):
+            writer.write(str(i).encode())
+
+        writer.close()
+
+        # The partial shard is overwritten.
+        filenames = shard_filenames(filename, 3)
+        self.assertEqual(_read(filenames[0]), [0, 1, 2])
+        self.assertEqual(_read(filenames[1]), [3, 4, 5])
+        self.assertEqual(_read(filenames[2]), [6, 7])
+        self.assertEqual(writer.count, 8)
+
+        # Progress written with different shards is ignored.
+        writer = ShardedTFRecordWriter(filename, 2, 4, progress_filename)
+        self.assertEqual(writer.resume(), 0)
+        writer.close()
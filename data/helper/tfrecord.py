@@ -4,13 +4,19 @@ import numpy as np
 from .record import Record
 
 
-def read_tfrecord(filename_queue, shapes={}):
+# The default dtype to store and read features with.
+DTYPE = 'float32'
+
+
+def read_tfrecord(filename_queue, shapes={}, dtypes={}):
     """Reads and parses TFRecord examples from data files.
 
     Args:
         filename_queue: A queue of strings with the filenames to read from.
         shapes: A dictionary containing the shape for a feature in a single
           example.
+        dtypes: A dictionary containing the name of the dtype a feature is
+          stored with (optional). Missing features default to float32.
 
     Returns:
         A record object.
@@ -24,7 +30,9 @@ def read_tfrecord(filename_queue, shapes={}):
 
     example = tf.parse_single_example(serialized_example, features=features)
 
-    data = {key: tf.decode_raw(example[key], tf.float32) for key in shapes}
+    data = {key: tf.decode_raw(example[key],
+                               tf.as_dtype(dtypes.get(key, DTYPE)))
+            for key in shapes}
     data = {key: tf.reshape(data[key], shapes[key]) for key in shapes}
 
     label = tf.reshape(example['label'], [1])
@@ -32,17 +40,52 @@ def read_tfrecord(filename_queue, shapes={}):
     return data, label
 
 
-def write_tfrecord(writer, data, label):
+def read_tfrecord_np(serialized_example, shapes={}, dtypes={}):
+    """Parses a serialized TFRecord example with numpy.
+
+    Args:
+        serialized_example: The serialized example.
+        shapes: A dictionary containing the shape for a feature in a single
+          example.
+        dtypes: A dictionary containing the name of the dtype a feature is
+          stored with (optional). Missing features default to float32.
+
+    Returns:
+        data: A dictionary holding numpy arrays of data.
+        label: An int64 numpy array with the label in the shape [1].
+    """
+
+    example = tf.train.Example.FromString(serialized_example)
+    feature = example.features.feature
+
+    data = {key: np.frombuffer(feature[key].bytes_list.value[0],
+                               dtype=np.dtype(dtypes.get(key, DTYPE)))
+            for key in shapes}
+    data = {key: data[key].reshape(shapes[key]) for key in shapes}
+
+    label = np.array(feature['label'].int64_list.value, dtype=np.int64)
+
+    return data, label
+
+
+def write_tfrecord(writer, data, label, dtypes={}):
     """Writes the data and label as a TFRecord example.
 
     Args:
-        writer: A TFRecordReader.
+        writer: A TFRecordWriter.
         data: A dictionary holding numpy arrays of data.
-        label: An int64 label index.
+        label: An int64 label index, optionally in the shape [1] as read by
+          `read_tfrecord_np`.
+        dtypes: A dictionary containing the name of the dtype to store a
+          feature with (optional). Missing features default to float32.
+
+    Raises:
+        ValueError: If a feature does not fit into its dtype.
     """
 
-    features = {key: _bytes_feature(data[key]) for key in data}
-    features['label'] = _int64_feature(label)
+    features = {key: _bytes_feature(data[key], dtypes.get(key, DTYPE))
+                for key in data}
+    features['label'] = _int64_feature(np.reshape(label, []))
 
     example = tf.train.Example(features=tf.train.Features(feature=features))
 
@@ -62,16 +105,38 @@ def _int64_feature(value):
     return tf.train.Feature(int64_list=tf.train.Int64List(value=[int(value)]))
 
 
-def _bytes_feature(value):
+def _bytes_feature(value, dtype=DTYPE):
     """Creates a bytes feature from the passed value.
 
     Args:
         value: An numpy array.
+        dtype: The name of the dtype to store the value with (optional).
 
     Returns:
         A TensorFlow feature.
+
+    Raises:
+        ValueError: If the value does not fit into the dtype.
     """
 
+    dtype = np.dtype(dtype)
+    value = np.asarray(value)
+
+    # Overflows are checked below.
+    with np.errstate(over='ignore'):
+        converted = value.astype(dtype)
+
+    # Refuse to silently wrap integers or overflow floats to infinity.
+    if value.size > 0:
+        if dtype.kind in 'iu':
+            info = np.iinfo(dtype)
+            if value.min() < info.min or value.max() > info.max:
+                raise ValueError('Values exceed the range of {}.'
+                                 .format(dtype.name))
+        elif dtype.kind == 'f':
+            if np.isfinite(value).all() and not np.isfinite(converted).all():
+                raise ValueError('Values exceed the range of {}.'
+                                 .format(dtype.name))
+
     return tf.train.Feature(
-        bytes_list=tf.train.BytesList(
-            value=[value.astype(np.float32).tostring()]))
+        bytes_list=tf.train.BytesList(value=[converted.tobytes()]))
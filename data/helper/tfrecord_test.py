@@ -0,0 +1,88 @@
+import os
+
+import tensorflow as tf
+import numpy as np
+
+from .tfrecord import write_tfrecord, read_tfrecord_np
+
+
+class TFRecordTest(tf.test.TestCase):
+
+    def _write(self, name, data, dtypes):
+        filename = os.path.join(self.get_temp_dir(), name)
+
+        writer = tf.python_io.TFRecordWriter(filename)
+        write_tfrecord(writer, data, 3, dtypes)
+        writer.close()
+
+        return filename
+
+    def test_dtypes(self):
+        image = np.array([[[0, 128, 255]]], dtype=np.float32)
+        neighborhood = np.array([[2, -1], [300, 0]], dtype=np.int64)
+        nodes = np.array([[0.5, 1.5]], dtype=np.float64)
+
+        shapes = {'image': [1, 1, 3], 'neighborhood': [2, 2],
+                  'nodes': [1, 2]}
+        dtypes = {'image': 'uint8', 'neighborhood': 'int16'}
+
+        filename = self._write('dtypes.tfrecords',
+                               {'image': image, 'neighborhood': neighborhood,
+                                'nodes': nodes}, dtypes)
+
+        serialized = next(tf.python_io.tf_record_iterator(filename))
+        data, label = read_tfrecord_np(serialized, shapes, dtypes)
+
+        self.assertEqual(data['image'].dtype, np.uint8)
+        self.assertAllEqual(data['image'], image)
+        self.assertEqual(data['neighborhood'].dtype, np.int16)
+        self.assertAllEqual(data['neighborhood'], neighborhood)
+
+        # Features without a dtype are stored as float32.
+        self.assertEqual(data['nodes'].dtype, np.float32)
+        self.assertAllEqual(data['nodes'], nodes)
+
+        self.assertAllEqual(label, [3])
+
+    def test_integer_range(self):
+        with self.assertRaises(ValueError):
+            self._write('uint8.tfrecords', {'image': np.array([256])},
+                        {'image': 'uint8'})
+
+        with self.assertRaises(ValueError):
+            self._write('int16.tfrecords',
+                        {'neighborhood': np.array([-1, 32768])},
+                        {'neighborhood': 'int16'})
+
+    def test_float_overflow(self):
+        with self.assertRaises(ValueError):
+            self._write('float16.tfrecords',
+                        {'nodes': np.array([1.0, 70000.0])},
+                        {'nodes': 'float16'})
+
+        # Infinite values are stored as they are.
+        filename = self._write('inf.tfrecords',
+                               {'nodes': np.array([1.0, np.inf])},
+                               {'nodes': 'float16'})
+
+        serialized = next(tf.python_io.tf_record_iterator(filename))
+        data, _ = read_tfrecord_np(serialized, {'nodes': [2]},
+                                   {'nodes': 'float16'})
+
+        self.assertAllEqual(data['nodes'], [1.0, np.inf])
+
+    def test_label(self):
+        # Labels read by read_tfrecord_np can be written again.
+        filename = self._write('label.tfrecords', {'nodes': np.array([1.0])},
+                               {})
+        serialized = next(tf.python_io.tf_record_iterator(filename))
+        data, label = read_tfrecord_np(serialized, {'nodes': [1]})
+
+        filename = os.path.join(self.get_temp_dir(), 'relabel.tfrecords')
+        writer = tf.python_io.TFRecordWriter(filename)
+        write_tfrecord(writer, data, label)
+        writer.close()
+
+        serialized = next(tf.python_io.tf_record_iterator(filename))
+        self.assertAllEqual(read_tfrecord_np(serialized, {'nodes': [1]})[1],
+                            [3])
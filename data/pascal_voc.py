@@ -12,6 +12,7 @@ from .dataset import DataSet
 from .helper.record import Record
 from .helper.download import maybe_download_and_extract
 from .helper.tfrecord import read_tfrecord, write_tfrecord
+from .helper.shard import ShardedTFRecordWriter, manifest_filenames
 from .helper.transform_image import crop_shape_from_box
 from .helper.distort_image import distort_image_for_train,\
                                   distort_image_for_eval
@@ -20,6 +21,7 @@ from .helper.distort_image import distort_image_for_train,\
 DATA_URL = 'http://host.robots.ox.ac.uk/pascal/VOC/voc2012/'\
            'VOCtrainval_11-May-2012.tar'
 DATA_DIR = '/tmp/pascal_voc_data'
+NUM_SHARDS = 1
 
 # The final shape of all images of the PascalVOC dataset.
 HEIGHT = 224
@@ -30,6 +32,10 @@ SHAPE = [HEIGHT, WIDTH, 3]
 MIN_OBJECT_HEIGHT = 50
 MIN_OBJECT_WIDTH = 50
 
+# The images are stored as uint8, which is lossless because the cropped
+# images are uint8 already.
+DTYPES = {'data': 'uint8'}
+
 # Filenames where the TFRecord information of the PascalVOC dataset is stored.
 TRAIN_FILENAME = 'train.tfrecords'
 TRAIN_INFO_FILENAME = 'train_info.json'
@@ -40,18 +46,26 @@ EVAL_INFO_FILENAME = 'eval_info.json'
 class PascalVOC(DataSet):
     """PascalVOC image classification dataset."""
 
-    def __init__(self, data_dir=DATA_DIR):
+    def __init__(self, data_dir=DATA_DIR, num_shards=NUM_SHARDS):
         """Creates a PascalVOC image classification dataset.
 
         Args:
             data_dir: The path to the directory where the PascalVOC dataset is
             stored.
+            num_shards: The number of TFRecord files each image set is split
+              into (optional).
         """
 
         super().__init__(data_dir)
+        self._num_shards = num_shards
         maybe_download_and_extract(DATA_URL, data_dir)
         self._write_to_tfrecord()
 
+        # Read the dtypes the images were stored with. Info files without
+        # dtypes were written with float32 images.
+        with open(os.path.join(data_dir, TRAIN_INFO_FILENAME), 'r') as f:
+            self._dtypes = json.load(f).get('dtypes', {})
+
     @classmethod
     def create(cls, config):
         """Static constructor to create a PascalVOC dataset based on a json
@@ -65,20 +79,25 @@ class PascalVOC(DataSet):
             A PascalVOC dataset.
         """
 
-        return cls(config.get('data_dir', DATA_DIR))
+        return cls(config.get('data_dir', DATA_DIR),
+                   config.get('num_shards', NUM_SHARDS))
 
     @property
     def train_filenames(self):
         """The filenames of the training batches from the PascalVOC dataset."""
 
-        return [os.path.join(self.data_dir, TRAIN_FILENAME)]
+        return manifest_filenames(
+            os.path.join(self.data_dir, TRAIN_INFO_FILENAME),
+            os.path.join(self.data_dir, TRAIN_FILENAME))
 
     @property
     def eval_filenames(self):
         """The filenames of the evaluation batches from the PascalVOC
         dataset."""
 
-        return [os.path.join(self.data_dir, EVAL_FILENAME)]
+        return manifest_filenames(
+            os.path.join(self.data_dir, EVAL_INFO_FILENAME),
+            os.path.join(self.data_dir, EVAL_FILENAME))
 
     @property
     def labels(self):
@@ -108,8 +127,9 @@ class PascalVOC(DataSet):
     def read(self, filename_queue):
         """Reads and parses examples from PascalVOC data files."""
 
-        data, label = read_tfrecord(filename_queue, {'data': SHAPE})
-        return Record(data['data'], SHAPE, label)
+        data, label = read_tfrecord(filename_queue, {'data': SHAPE},
+                                    self._dtypes)
+        return Record(tf.cast(data['data'], tf.float32), SHAPE, label)
 
     def distort_for_train(self, record):
         """Applies random distortions for training to a PascalVOC record."""
@@ -147,7 +167,7 @@ class PascalVOC(DataSet):
     def _write_image_set_to_tfrecord(self, image_set_filename, image_dir,
                                      annotation_dir, tfrecord_filename,
                                      info_filename):
-        """Converts and writes an image set to a tfrecord file.
+        """Converts and writes an image set to sharded tfrecord files.
 
         Args:
             image_set_filename: The filename containing the image names in the
@@ -155,16 +175,19 @@ class PascalVOC(DataSet):
             image_dir: The directory containing the images.
             annotation_dir: The directory containing the annotations for all
               images.
-            tfrecord_filename: The filename of the tfrecord file to save to.
+            tfrecord_filename: The filename of the unsharded tfrecord file to
+              save to.
             info_filename: The info filename to save the num examples per epoch
-              information of the image set.
+              information and the manifest of the shards of the image set.
         """
 
-        if tf.gfile.Exists(tfrecord_filename):
+        # The info file is written after all shards are written.
+        if tf.gfile.Exists(info_filename):
             return
 
         try:
-            writer = tf.python_io.TFRecordWriter(tfrecord_filename)
+            writer = ShardedTFRecordWriter(tfrecord_filename,
+                                           self._num_shards)
 
             # Read the lines of the image set filename which correspond to the
             # image names.
@@ -206,7 +229,8 @@ class PascalVOC(DataSet):
         finally:
             writer.close()
 
-            self._write_num_examples_per_epoch(info_filename, num_objects)
+            self._write_num_examples_per_epoch(info_filename, num_objects,
+                                               writer.shards)
 
             print('')
             print(' '.join([
@@ -220,7 +244,7 @@ class PascalVOC(DataSet):
         """Converts and expands an image to a tfrecord file.
 
         Args:
-            writer: A TFRecordReader.
+            writer: A TFRecordWriter.
             image_filename: The filename of the image.
             annotation_filename: The filename to the annotaiton of the image.
 
@@ -269,23 +293,29 @@ class PascalVOC(DataSet):
             label_index = self.label_index(label_name)
 
             # Write the cropped image as a TFRecord example.
-            write_tfrecord(writer, {'data': cropped_image}, label_index)
+            write_tfrecord(writer, {'data': cropped_image}, label_index,
+                           DTYPES)
 
         return {
             'num_objects': num_objects,
             'num_objects_bypassed': num_objects_bypassed,
         }
 
-    def _write_num_examples_per_epoch(self, filename, num_examples_per_epoch):
-        """Writes the number of examples per epoch to a filename.
+    def _write_num_examples_per_epoch(self, filename, num_examples_per_epoch,
+                                      shards):
+        """Writes the number of examples per epoch and the manifest of the
+        shards to a filename.
 
         Args:
             filename: A tensor of type string.
             num_examples_per_epoch: An integer.
+            shards: The manifest of the written shards.
         """
 
         with open(filename, 'w') as f:
-            json.dump({'num_examples_per_epoch': num_examples_per_epoch}, f)
+            json.dump({'num_examples_per_epoch': num_examples_per_epoch,
+                       'shards': shards,
+                       'dtypes': DTYPES}, f)
 
     def _read_num_examples_per_epoch(self, filename):
         """Reads the number of examples per epoch of a filename.
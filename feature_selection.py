@@ -10,13 +10,12 @@ import numpy as np  # nopep8
 from data import PascalVOC, read_tfrecord  # nopep8
 from grapher import SegmentationGrapher  # nopep8
 from segmentation.algorithm import slic_generator  # nopep8
-from segmentation import adjacency_unweighted  # nopep8
 from patchy import PatchySan  # nopep8
 
 
 pascal = PascalVOC()
 grapher = SegmentationGrapher(slic_generator(num_segments=400),
-                              [adjacency_unweighted])
+                              ['unweighted'])
 num_channels = grapher.num_node_channels
 patchy = PatchySan(pascal, grapher,
                    data_dir='/tmp/patchy_san_slic_pascal_voc_data',
@@ -28,8 +27,9 @@ filename_queue = tf.train.string_input_producer(patchy.train_filenames,
 # Load the node features. We are not interested in the labels.
 data, _ = read_tfrecord(filename_queue,
                         {'nodes': [-1, num_channels],
-                         'neighborhood': [400, 1]})
-data = data['nodes']
+                         'neighborhood': [400, 1]},
+                        patchy.dtypes)
+data = tf.cast(data['nodes'], tf.float32)
 
 # The data queue.
 data_batch = tf.train.batch(
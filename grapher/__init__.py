@@ -1,6 +1,8 @@
 from .grapher import Grapher
 
 from .segmentation import SegmentationGrapher
+from .cache import CachedGrapher
 
 
-graphers = {'segmentation': SegmentationGrapher}
+graphers = {'segmentation': SegmentationGrapher,
+            'cached': CachedGrapher}
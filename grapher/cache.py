@@ -0,0 +1,336 @@
+import os
+import json
+import hashlib
+
+import tensorflow as tf
+import numpy as np
+import scipy.sparse as sp
+
+from .grapher import Grapher
+
+
+# The version of the format graphs are cached in. Changing the format
+# requires a new version, so that graphs in the old format are never read.
+CACHE_VERSION = 1
+
+
+class CachedGrapher(Grapher):
+    """A graph generator that caches the graphs of another graph generator on
+    disk. Graphs are keyed by the content of the input image and the
+    configuration of the cached graph generator, so the cache can be shared
+    across datasets using the same graph generator configuration."""
+
+    def __init__(self, grapher, config, cache_dir):
+        """Creates a graph generator that caches the graphs of a graph
+        generator.
+
+        Args:
+            grapher: The graph generator to cache. Needs to implement
+              `create_graph_np`.
+            config: The json configuration of the graph generator.
+            cache_dir: The path to the directory where the graphs are cached.
+        """
+
+        self._grapher = grapher
+        self._cache_dir = os.path.join(cache_dir, _hash(
+            str(CACHE_VERSION).encode('utf-8'),
+            json.dumps(config, sort_keys=True).encode('utf-8')))
+
+        if not tf.gfile.Exists(self._cache_dir):
+            tf.gfile.MakeDirs(self._cache_dir)
+
+    @classmethod
+    def create(cls, config):
+        """Static constructor to create a cached graph generator based on a
+        json object.
+
+        Args:
+            config: A configuration object with sensible defaults for
+              missing values.
+
+        Returns:
+            A cached graph generator.
+        """
+
+        # Import here to avoid a circular import of the grapher registry.
+        from . import graphers
+
+        grapher_config = config['grapher']
+        grapher = graphers[grapher_config['name']].create(grapher_config)
+
+        return cls(grapher, grapher_config, config['cache_dir'])
+
+    @property
+    def num_node_channels(self):
+        """The number of corresponding channels for each node in the graph.
+
+        Returns:
+            A number.
+        """
+
+        return self._grapher.num_node_channels
+
+    @property
+    def num_edge_channels(self):
+        """The number of corresponding channels for each edge in the graph.
+
+        Returns:
+            A number.
+        """
+
+        return self._grapher.num_edge_channels
+
+    def create_graph(self, data):
+        """Generates a graph based on the passed data, reading it from the
+        cache if possible.
+
+        Args:
+            data: The data.
+
+        Returns:
+            nodes: A tensor that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+            adjacencies: A tensor that holds the (multiple) adjacency
+              matrices of the graph in the shape
+              [num_nodes, num_nodes, num_edge_channels].
+        """
+
+        nodes, adjacencies = tf.py_func(
+            self.create_graph_np, [data], [tf.float32, tf.float32],
+            stateful=False, name='cached_graph')
+
+        return nodes, adjacencies
+
+    def create_graph_np(self, data, sparse=False):
+        """Generates a graph based on the passed numpy data, reading it from
+        the cache if possible.
+
+        Args:
+            data: A numpy array that holds the data.
+            sparse: Boolean whether to return sparse adjacencies (optional).
+
+        Returns:
+            nodes: A numpy array that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+            adjacencies: An numpy array that holds the (multiple) adjacency
+              matrices of the graph in the shape
+              [num_nodes, num_nodes, num_edge_channels]. If sparse, a list of
+              num_edge_channels `scipy.sparse.csr_matrix` adjacencies.
+        """
+
+        filename = self._filename(data)
+
+        if os.path.exists(filename):
+            nodes, adjacencies, _ = _load_graph(filename, sparse)
+            return nodes, adjacencies
+
+        # Graphs are always computed sparse, so that saving them scales with
+        # the number of edges.
+        nodes, adjacencies = self._grapher.create_graph_np(data, sparse=True)
+        nodes = nodes.astype(np.float32)
+
+        _save_graph(filename, nodes, adjacencies)
+
+        return nodes, _adjacencies(nodes, adjacencies, sparse)
+
+    def create_spatial_graph_np(self, data, sparse=False):
+        """Generates a graph with the positions of its nodes based on the
+        passed numpy data, reading it from the cache if possible. See
+        `Grapher.create_spatial_graph_np` for a description of the returned
+        values.
+
+        Args:
+            data: A numpy array that holds the data.
+            sparse: Boolean whether to return sparse adjacencies (optional).
+
+        Returns:
+            nodes: A numpy array with shape [num_nodes, num_node_channels].
+            adjacencies: A numpy array with shape
+              [num_nodes, num_nodes, num_edge_channels] or a list of
+              num_edge_channels `scipy.sparse.csr_matrix` if sparse.
+            centroids: A numpy array with shape [num_nodes, 2].
+        """
+
+        filename = self._filename(data)
+
+        # Graphs cached without their positions are computed again.
+        if os.path.exists(filename):
+            nodes, adjacencies, centroids = _load_graph(filename, sparse)
+
+            if centroids is not None:
+                return nodes, adjacencies, centroids
+
+        nodes, adjacencies, centroids =\
+            self._grapher.create_spatial_graph_np(data, sparse=True)
+        nodes = nodes.astype(np.float32)
+        centroids = centroids.astype(np.float32)
+
+        _save_graph(filename, nodes, adjacencies, centroids)
+
+        return nodes, _adjacencies(nodes, adjacencies, sparse), centroids
+
+    def flip_nodes_np(self, nodes):
+        """Flips the nodes of a graph horizontally like the cached graph
+        generator. See `Grapher.flip_nodes_np`.
+
+        Args:
+            nodes: A numpy array with shape [num_nodes, num_node_channels].
+
+        Returns:
+            A numpy array with shape [num_nodes, num_node_channels].
+        """
+
+        return self._grapher.flip_nodes_np(nodes)
+
+    def _filename(self, data):
+        """Computes the cache filename of the graph of the passed data.
+
+        Args:
+            data: A numpy array that holds the data.
+
+        Returns:
+            The filename.
+        """
+
+        data = np.ascontiguousarray(data)
+        key = _hash(str(data.shape).encode('utf-8'),
+                    data.dtype.str.encode('utf-8'), data.tobytes())
+
+        return os.path.join(self._cache_dir, key[:2], '{}.npz'.format(key))
+
+
+def _hash(*values):
+    """Computes the hex digest of the passed byte strings.
+
+    Args:
+        values: Byte strings.
+
+    Returns:
+        A string.
+    """
+
+    sha1 = hashlib.sha1()
+
+    for value in values:
+        sha1.update(value)
+
+    return sha1.hexdigest()
+
+
+def _save_graph(filename, nodes, adjacencies, centroids=None):
+    """Saves a graph with a sparse adjacency to a file. The file is written
+    atomically, so that concurrent writers never see partial files.
+
+    Args:
+        filename: The filename.
+        nodes: The nodes with shape [num_nodes, num_node_channels].
+        adjacencies: A list of num_edge_channels sparse adjacencies with shape
+          [num_nodes, num_nodes].
+        centroids: The positions of the nodes with shape [num_nodes, 2]
+          (optional).
+    """
+
+    dirname = os.path.dirname(filename)
+    if not os.path.exists(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Another process created the directory in the meantime.
+            pass
+
+    # Only store the edges, which are adjacent in at least one channel.
+    adjacencies = [sp.csr_matrix(adjacency, dtype=np.float32)
+                   for adjacency in adjacencies]
+    pattern = sum(abs(adjacency) for adjacency in adjacencies).tocoo()
+    pattern.eliminate_zeros()
+    rows, cols = pattern.row, pattern.col
+
+    values = np.stack([np.asarray(adjacency[rows, cols]).reshape(-1)
+                       for adjacency in adjacencies], axis=1)
+
+    arrays = {'nodes': nodes, 'rows': rows.astype(np.int32),
+              'cols': cols.astype(np.int32),
+              'values': values.astype(np.float32),
+              'num_edge_channels': len(adjacencies)}
+
+    if centroids is not None:
+        arrays['centroids'] = centroids
+
+    tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+
+    try:
+        with open(tmp_filename, 'wb') as f:
+            np.savez(f, **arrays)
+
+        os.rename(tmp_filename, filename)
+
+    finally:
+        # Remove the partial file of a failed write.
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def _load_graph(filename, sparse=False):
+    """Loads a graph saved by `_save_graph`.
+
+    Args:
+        filename: The filename.
+        sparse: Boolean whether to return sparse adjacencies (optional).
+
+    Returns:
+        nodes: The nodes with shape [num_nodes, num_node_channels].
+        adjacencies: The adjacencies with shape
+          [num_nodes, num_nodes, num_edge_channels] or a list of
+          num_edge_channels `scipy.sparse.csr_matrix` if sparse.
+        centroids: The positions of the nodes with shape [num_nodes, 2] or
+          None if they weren't saved.
+    """
+
+    with np.load(filename) as f:
+        nodes = f['nodes']
+        num_nodes = nodes.shape[0]
+        num_edge_channels = int(f['num_edge_channels'])
+        rows, cols, values = f['rows'], f['cols'], f['values']
+
+        adjacencies = [
+            sp.csr_matrix((values[:, i], (rows, cols)),
+                          shape=(num_nodes, num_nodes), dtype=np.float32)
+            for i in range(num_edge_channels)]
+
+        centroids = f['centroids'] if 'centroids' in f.files else None
+
+    return nodes, _adjacencies(nodes, adjacencies, sparse), centroids
+
+
+def _adjacencies(nodes, adjacencies, sparse=False):
+    """Converts a list of sparse adjacencies to the requested format.
+
+    Args:
+        nodes: The nodes with shape [num_nodes, num_node_channels].
+        adjacencies: A list of num_edge_channels sparse adjacencies with shape
+          [num_nodes, num_nodes].
+        sparse: Boolean whether to return sparse adjacencies (optional).
+
+    Returns:
+        A list of num_edge_channels `scipy.sparse.csr_matrix` if sparse or a
+        numpy array with shape [num_nodes, num_nodes, num_edge_channels].
+    """
+
+    adjacencies = [sp.csr_matrix(adjacency, dtype=np.float32)
+                   for adjacency in adjacencies]
+
+    if sparse:
+        for adjacency in adjacencies:
+            adjacency.eliminate_zeros()
+            adjacency.sort_indices()
+
+        return adjacencies
+
+    num_nodes = nodes.shape[0]
+    dense = np.zeros((num_nodes, num_nodes, len(adjacencies)),
+                     dtype=np.float32)
+
+    for i, adjacency in enumerate(adjacencies):
+        dense[:, :, i] = adjacency.toarray()
+
+    return dense
@@ -0,0 +1,130 @@
+import os
+
+import tensorflow as tf
+import numpy as np
+import scipy.sparse as sp
+
+from .grapher import Grapher
+from .cache import CachedGrapher, _save_graph, _load_graph
+
+
+class _CountingGrapher(Grapher):
+    """Grapher creating a path graph, that counts its calls."""
+
+    def __init__(self):
+        self.num_calls = 0
+
+    @classmethod
+    def create(cls, config):
+        return cls()
+
+    @property
+    def num_node_channels(self):
+        return 1
+
+    @property
+    def num_edge_channels(self):
+        return 2
+
+    def create_graph(self, data):
+        raise NotImplementedError
+
+    def create_graph_np(self, data, sparse=False):
+        self.num_calls += 1
+
+        nodes = np.array([[0], [1], [2]]) + float(np.sum(data))
+
+        # The edge of the second channel is missing in the first channel.
+        adjacencies = [
+            sp.csr_matrix(np.array([[0, 1, 0], [1, 0, 0], [0, 0, 0]])),
+            sp.csr_matrix(np.array([[0, 2, 0], [2, 0, 3], [0, 3, 0]])),
+        ]
+
+        return nodes, adjacencies
+
+
+class CachedGrapherTest(tf.test.TestCase):
+
+    def _cached(self, config={'name': 'counting'}):
+        return CachedGrapher(_CountingGrapher(), config, self.get_temp_dir())
+
+    def test_hit_and_miss(self):
+        cached = self._cached({'name': 'hit'})
+        data = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+
+        nodes, adjacencies = cached.create_graph_np(data)
+        self.assertEqual(cached._grapher.num_calls, 1)
+
+        cached_nodes, cached_adjacencies = cached.create_graph_np(data)
+        self.assertEqual(cached._grapher.num_calls, 1)
+
+        self.assertAllEqual(cached_nodes, nodes)
+        self.assertAllEqual(cached_adjacencies, adjacencies)
+        self.assertEqual(adjacencies.shape, (3, 3, 2))
+        self.assertAllEqual(adjacencies[:, :, 1],
+                            [[0, 2, 0], [2, 0, 3], [0, 3, 0]])
+
+        sparse_nodes, sparse_adjacencies = cached.create_graph_np(
+            data, sparse=True)
+        self.assertEqual(cached._grapher.num_calls, 1)
+        self.assertAllEqual(sparse_adjacencies[0].toarray(),
+                            adjacencies[:, :, 0])
+        self.assertAllEqual(sparse_adjacencies[1].toarray(),
+                            adjacencies[:, :, 1])
+
+        cached.create_graph_np(data + 1)
+        self.assertEqual(cached._grapher.num_calls, 2)
+
+    def test_key(self):
+        cached = self._cached({'name': 'key'})
+        data = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+
+        cached.create_graph_np(data)
+
+        # The same bytes with a different shape or dtype are a miss.
+        cached.create_graph_np(data.reshape(2, 3, 2))
+        self.assertEqual(cached._grapher.num_calls, 2)
+
+        cached.create_graph_np(data.view(np.int8))
+        self.assertEqual(cached._grapher.num_calls, 3)
+
+        cached.create_graph_np(data.copy())
+        self.assertEqual(cached._grapher.num_calls, 3)
+
+    def test_config(self):
+        data = np.zeros((2, 2, 3), dtype=np.uint8)
+
+        cached = self._cached({'name': 'config', 'value': 1})
+        cached.create_graph_np(data)
+
+        # Graphers with the same configuration share the cache.
+        same = self._cached({'value': 1, 'name': 'config'})
+        same.create_graph_np(data)
+        self.assertEqual(same._grapher.num_calls, 0)
+        self.assertEqual(same._filename(data), cached._filename(data))
+
+        other = self._cached({'name': 'config', 'value': 2})
+        other.create_graph_np(data)
+        self.assertEqual(other._grapher.num_calls, 1)
+        self.assertNotEqual(other._filename(data), cached._filename(data))
+
+    def test_atomic_save(self):
+        filename = os.path.join(self.get_temp_dir(), 'atomic', 'graph.npz')
+        nodes = np.array([[0.5], [1.5]], dtype=np.float32)
+        adjacencies = [sp.csr_matrix(np.array([[0, 1], [1, 0]]))]
+
+        _save_graph(filename, nodes, adjacencies)
+
+        loaded_nodes, loaded_adjacencies, centroids = _load_graph(filename)
+        self.assertAllEqual(loaded_nodes, nodes)
+        self.assertAllEqual(loaded_adjacencies[:, :, 0], [[0, 1], [1, 0]])
+        self.assertIsNone(centroids)
+
+        # A failed write neither replaces the saved graph nor leaves a
+        # partial file behind.
+        with self.assertRaises(Exception):
+            _save_graph(filename, np.array([lambda: None]), adjacencies)
+
+        self.assertEqual(os.listdir(os.path.dirname(filename)),
+                         ['graph.npz'])
+        self.assertAllEqual(_load_graph(filename)[0], nodes)
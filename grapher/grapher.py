@@ -59,3 +59,74 @@ class Grapher(object):
         """
 
         pass
+
+    def create_graph_np(self, data, sparse=False):
+        """Generates a graph based on the passed data without building any
+        TensorFlow operations, so that it can be run in worker processes.
+
+        Args:
+            data: A numpy array that holds the data.
+            sparse: Boolean whether to return sparse adjacencies, whose
+              memory scales with the number of edges (optional).
+
+        Returns:
+            nodes: A numpy array that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+            adjacencies: An numpy array that holds the (multiple) adjacency
+              matrices of the graph in the shape
+              [num_nodes, num_nodes, num_edge_channels]. If sparse, a list of
+              num_edge_channels `scipy.sparse.csr_matrix` adjacencies with
+              shape [num_nodes, num_nodes].
+
+        Raises:
+            NotImplementedError: If the grapher has no numpy implementation.
+        """
+
+        raise NotImplementedError(
+            '{} has no numpy implementation.'.format(type(self).__name__))
+
+    def create_spatial_graph_np(self, data, sparse=False):
+        """Generates a graph based on the passed data like `create_graph_np`
+        and additionally locates its nodes in the data, e.g. to transform
+        the graph like its data.
+
+        Args:
+            data: A numpy array that holds the data.
+            sparse: Boolean whether to return sparse adjacencies (optional).
+
+        Returns:
+            nodes: A numpy array that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+            adjacencies: An numpy array that holds the (multiple) adjacency
+              matrices of the graph in the shape
+              [num_nodes, num_nodes, num_edge_channels]. If sparse, a list of
+              num_edge_channels `scipy.sparse.csr_matrix` adjacencies.
+            centroids: A numpy array that holds the position of each node in
+              the shape [num_nodes, 2].
+
+        Raises:
+            NotImplementedError: If the grapher can't locate its nodes.
+        """
+
+        raise NotImplementedError(
+            '{} has no spatial numpy implementation.'
+            .format(type(self).__name__))
+
+    def flip_nodes_np(self, nodes):
+        """Computes the channels of the nodes of the graph of the
+        horizontally flipped data from the channels of the nodes of the graph
+        of the data.
+
+        Args:
+            nodes: A numpy array that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+
+        Returns:
+            A numpy array with shape [num_nodes, num_node_channels].
+
+        Raises:
+            NotImplementedError: If the grapher can't flip its nodes.
+        """
+
+        raise NotImplementedError(
+            '{} can\'t flip its nodes.'.format(type(self).__name__))
@@ -2,9 +2,12 @@ from __future__ import absolute_import
 
 import tensorflow as tf
 
-from segmentation import feature_extraction, NUM_FEATURES
+from segmentation import feature_extraction, feature_extraction_np,\
+                         flip_features_np, num_features,\
+                         DEFAULT_FEATURE_GROUPS
 from segmentation.algorithm import json_generators as segmentations
-from segmentation import adjacencies
+from segmentation import fused_adjacencies, fused_adjacencies_np,\
+                         segment_centroids_np, ADJACENCIES
 
 from .grapher import Grapher
 
@@ -12,18 +15,42 @@ from .grapher import Grapher
 class SegmentationGrapher(Grapher):
     """A graph generator by segmenting input images."""
 
-    def __init__(self, segment, adjacencies_from_segmentation):
+    def __init__(self, segment, adjacencies_from_segmentation,
+                 segment_np=None, feature_groups=DEFAULT_FEATURE_GROUPS,
+                 fused=False):
         """Creates a graph generator by segmenting input images.
 
         Args:
             segment: A segmentation algorithm that takes a sinle input image.
-            adjacencies_from_segmentation: An array of adjacency generation
-              algorithms which each produces an adjacency matrix based on a
-              computed segmentation.
+            adjacencies_from_segmentation: An array of adjacency names, see
+              `segmentation.ADJACENCIES`. Each produces an adjacency matrix
+              based on a computed segmentation. All adjacencies are computed
+              in a single pass over the segmentation.
+            segment_np: The numpy implementation of `segment` (optional).
+            feature_groups: An array of the names of the feature groups of
+              each node, see `segmentation.FEATURE_GROUPS` (optional).
+            fused: Boolean whether `create_graph` runs the whole numpy
+              implementation in a single operation instead of an operation
+              for each step (optional).
+
+        Raises:
+            ValueError: If an adjacency or a feature group is unknown or the
+              graph should be fused without numpy implementation.
         """
 
+        if fused and segment_np is None:
+            raise ValueError('A fused grapher needs a numpy segmentation.')
+
+        for name in adjacencies_from_segmentation:
+            if name not in ADJACENCIES:
+                raise ValueError('Unknown adjacency {}.'.format(name))
+
         self._segment = segment
         self._adjacencies_from_segmentation = adjacencies_from_segmentation
+        self._segment_np = segment_np
+        self._feature_groups = list(feature_groups)
+        self._fused = fused
+        self._num_node_channels = num_features(self._feature_groups)
 
     @classmethod
     def create(cls, config):
@@ -39,11 +66,13 @@ class SegmentationGrapher(Grapher):
         """
 
         segmentation_config = config['segmentation']
+        segment = segmentations[segmentation_config['name']]
 
-        return cls(
-            segmentations[segmentation_config['name']](segmentation_config),
-            [adjacencies[name] for name in
-                config['adjacencies_from_segmentation']])
+        return cls(segment(segmentation_config),
+                   config['adjacencies_from_segmentation'],
+                   segment(segmentation_config, numpy=True),
+                   config.get('feature_groups', DEFAULT_FEATURE_GROUPS),
+                   config.get('fused', False))
 
     @property
     def num_node_channels(self):
@@ -53,7 +82,7 @@ class SegmentationGrapher(Grapher):
             A number.
         """
 
-        return NUM_FEATURES
+        return self._num_node_channels
 
     @property
     def num_edge_channels(self):
@@ -81,11 +110,119 @@ class SegmentationGrapher(Grapher):
               [num_nodes, num_nodes, num_edge_channels].
         """
 
+        if self._fused:
+            return self._create_fused_graph(image)
+
         segmentation = self._segment(image)
 
         # Compute the nodes and adjacency matrices based on the segmentation.
-        nodes = feature_extraction(segmentation, image)
-        adjacency = self._adjacencies_from_segmentation[0](segmentation)
+        nodes = feature_extraction(segmentation, image,
+                                   self._feature_groups)
+        adjacencies = fused_adjacencies(segmentation, image,
+                                        self._adjacencies_from_segmentation)
+
+        return nodes, adjacencies
+
+    def create_graph_np(self, image, sparse=False):
+        """Generates a graph based on the passed numpy image without building
+        any TensorFlow operations. See `create_graph` for a description of the
+        returned values.
+
+        Args:
+            image: The image.
+            sparse: Boolean whether to return sparse adjacencies (optional).
+
+        Returns:
+            nodes: A numpy array that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+            adjacencies: An numpy array that holds the (multiple) adjacency
+              matrices of the graph in the shape
+              [num_nodes, num_nodes, num_edge_channels]. If sparse, a list of
+              num_edge_channels `scipy.sparse.csr_matrix` adjacencies.
+
+        Raises:
+            NotImplementedError: If the grapher was created without numpy
+              implementations.
+        """
+
+        nodes, adjacencies, _ = self.create_spatial_graph_np(image, sparse)
+
+        return nodes, adjacencies
+
+    def create_spatial_graph_np(self, image, sparse=False):
+        """Generates a graph based on the passed numpy image and locates each
+        node at the centroid of its segment. See `create_graph` for a
+        description of the returned nodes and adjacencies.
+
+        Args:
+            image: The image.
+            sparse: Boolean whether to return sparse adjacencies (optional).
+
+        Returns:
+            nodes: A numpy array that holds the channels for each node in the
+              shape [num_nodes, num_node_channels].
+            adjacencies: An numpy array that holds the (multiple) adjacency
+              matrices of the graph in the shape
+              [num_nodes, num_nodes, num_edge_channels]. If sparse, a list of
+              num_edge_channels `scipy.sparse.csr_matrix` adjacencies.
+            centroids: A numpy array that holds the [row, column] centroid of
+              each segment in the shape [num_nodes, 2].
+
+        Raises:
+            NotImplementedError: If the grapher was created without numpy
+              implementations.
+        """
+
+        if self._segment_np is None:
+            return super(SegmentationGrapher, self).create_spatial_graph_np(
+                image, sparse)
+
+        segmentation = self._segment_np(image)
+
+        # Compute the nodes and adjacency matrices based on the segmentation.
+        # The centroids are shared with the adjacencies using them.
+        centroids = segment_centroids_np(segmentation)
+        nodes = feature_extraction_np(segmentation, image,
+                                      self._feature_groups)
+        adjacencies = fused_adjacencies_np(
+            segmentation, image, self._adjacencies_from_segmentation,
+            centroids=centroids, sparse=sparse)
+
+        return nodes, adjacencies, centroids
+
+    def _create_fused_graph(self, image):
+        """Generates a graph with a single operation running the numpy
+        implementation, so that the image crosses the boundary between
+        TensorFlow and numpy only once. See `create_graph` for a description
+        of the returned values.
+
+        Args:
+            image: The image.
+
+        Returns:
+            nodes: A tensor with shape [num_nodes, num_node_channels].
+            adjacencies: A tensor with shape
+              [num_nodes, num_nodes, num_edge_channels].
+        """
+
+        nodes, adjacencies = tf.py_func(
+            self.create_graph_np, [image], [tf.float32, tf.float32],
+            stateful=False, name='segmentation_graph')
+
+        nodes.set_shape([None, self.num_node_channels])
+        adjacencies.set_shape([None, None, self.num_edge_channels])
+
+        return nodes, adjacencies
+
+    def flip_nodes_np(self, nodes):
+        """Computes the features of the segments of the horizontally flipped
+        image from the features of the segments of the image.
+
+        Args:
+            nodes: A numpy array with shape [num_nodes, num_node_channels].
+
+        Returns:
+            A numpy array with shape [num_nodes, num_node_channels].
+        """
 
-        # Till now, we only consider one adjacency matrix.
-        return nodes, tf.expand_dims(adjacency, axis=2)
+        return flip_features_np(nodes, self._feature_groups)
@@ -1,9 +1,13 @@
 from .patchy import PatchySan
 
 from .helper.labeling import labelings,\
+                             labelings_np,\
                              scanline,\
                              betweenness_centrality
 
 from .helper.neighborhood_assembly import neighborhood_assemblies,\
+                                          neighborhood_assemblies_np,\
                                           neighborhoods_weights_to_root,\
                                           neighborhoods_grid_spiral
+
+from .helper.receptive_field import receptive_fields
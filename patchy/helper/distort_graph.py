@@ -0,0 +1,161 @@
+import numpy as np
+
+from segmentation import flip_features_np
+
+
+# The ratio to crop the graph, which equals the ratio images are cropped with.
+CROP_RATIO = 0.75
+
+
+def distort_graph_for_train_np(data, random_state, crop_ratio=CROP_RATIO,
+                               flip_nodes=flip_features_np):
+    """Applies a random crop and a random horizontal flip to a graph. Nodes
+    are cropped based on their centroids.
+
+    Args:
+        data: A dictionary holding the nodes, the sparse edges and weights of
+          the adjacency, the centroids of the nodes and the shape of the
+          graph's image.
+        random_state: The numpy random state to draw the distortions from.
+        crop_ratio: The ratio to crop the graph (optional).
+        flip_nodes: A function computing the nodes of the horizontally
+          flipped graph (optional).
+
+    Returns:
+        A new dictionary holding the distorted graph.
+    """
+
+    height, width = _crop_shape(data['shape'], crop_ratio)
+
+    top = random_state.randint(0, data['shape'][0] - height + 1)
+    left = random_state.randint(0, data['shape'][1] - width + 1)
+
+    data = _crop_graph_np(data, top, left, height, width)
+
+    if random_state.randint(2) == 1:
+        data = _flip_graph_np(data, flip_nodes)
+
+    return _sort_graph_np(data)
+
+
+def distort_graph_for_eval_np(data, crop_ratio=CROP_RATIO):
+    """Crops the center of a graph. Nodes are cropped based on their
+    centroids.
+
+    Args:
+        data: A dictionary holding the nodes, the sparse edges and weights of
+          the adjacency, the centroids of the nodes and the shape of the
+          graph's image.
+        crop_ratio: The ratio to crop the graph (optional).
+
+    Returns:
+        A new dictionary holding the cropped graph.
+    """
+
+    height, width = _crop_shape(data['shape'], crop_ratio)
+
+    top = (data['shape'][0] - height) // 2
+    left = (data['shape'][1] - width) // 2
+
+    data = _crop_graph_np(data, top, left, height, width)
+
+    return _sort_graph_np(data)
+
+
+def _crop_shape(shape, crop_ratio):
+    """Calculates a new, smaller shape after cropping.
+
+    Args:
+        shape: The [height, width] shape.
+        crop_ratio: The ratio to crop.
+
+    Returns:
+        The cropped height and width.
+    """
+
+    return int(crop_ratio * shape[0]), int(crop_ratio * shape[1])
+
+
+def _crop_graph_np(data, top, left, height, width):
+    """Drops all nodes whose centroids lie outside of a crop window.
+
+    Args:
+        data: A dictionary holding the graph.
+        top: The top row of the crop window.
+        left: The left column of the crop window.
+        height: The height of the crop window.
+        width: The width of the crop window.
+
+    Returns:
+        A new dictionary holding the cropped graph.
+    """
+
+    centroids = data['centroids'] - np.array([top, left], dtype=np.float32)
+
+    keep = (centroids[:, 0] >= 0) & (centroids[:, 0] < height) &\
+        (centroids[:, 1] >= 0) & (centroids[:, 1] < width)
+
+    data = dict(data, centroids=centroids,
+                shape=np.array([height, width], dtype=np.int32))
+
+    return _select_nodes_np(data, np.flatnonzero(keep))
+
+
+def _flip_graph_np(data, flip_nodes=flip_features_np):
+    """Flips a graph horizontally.
+
+    Args:
+        data: A dictionary holding the graph.
+        flip_nodes: A function computing the nodes of the flipped graph
+          (optional).
+
+    Returns:
+        A new dictionary holding the flipped graph.
+    """
+
+    centroids = data['centroids'].copy()
+    centroids[:, 1] = data['shape'][1] - 1 - centroids[:, 1]
+
+    return dict(data, nodes=flip_nodes(data['nodes']),
+                centroids=centroids)
+
+
+def _sort_graph_np(data):
+    """Orders the nodes of a graph by the scanline order of their centroids,
+    which approximates the order of the labels of a segmentation.
+
+    Args:
+        data: A dictionary holding the graph.
+
+    Returns:
+        A new dictionary holding the sorted graph.
+    """
+
+    centroids = np.round(data['centroids'])
+    order = np.lexsort((centroids[:, 1], centroids[:, 0]))
+
+    return _select_nodes_np(data, order)
+
+
+def _select_nodes_np(data, indices):
+    """Selects nodes of a graph and the edges between them.
+
+    Args:
+        data: A dictionary holding the graph.
+        indices: The indices of the nodes to select in their new order.
+
+    Returns:
+        A new dictionary holding the graph of the selected nodes.
+    """
+
+    # Map the old node indices to the new ones or -1 for dropped nodes.
+    mapping = np.full(data['nodes'].shape[0], -1, dtype=np.int32)
+    mapping[indices] = np.arange(indices.size, dtype=np.int32)
+
+    edges = mapping[data['edges']]
+    keep = (edges >= 0).all(axis=1)
+
+    return dict(data, nodes=data['nodes'][indices],
+                centroids=data['centroids'][indices],
+                edges=edges[keep].reshape(-1, 2),
+                weights=data['weights'][keep])
@@ -0,0 +1,50 @@
+import tensorflow as tf
+import numpy as np
+
+from .distort_graph import distort_graph_for_train_np,\
+                           distort_graph_for_eval_np
+
+
+class DistortGraphTest(tf.test.TestCase):
+
+    def _graph(self):
+        nodes = np.zeros((4, 45), dtype=np.float32)
+        nodes[:, 0] = [0, 1, 2, 3]
+
+        return {'nodes': nodes,
+                'edges': np.array([[0, 1], [1, 0], [1, 2], [2, 1], [2, 3],
+                                   [3, 2]]),
+                'weights': np.array([1, 1, 2, 2, 3, 3], dtype=np.float32),
+                'centroids': np.array([[0, 0], [3, 1], [3, 6], [7, 7]],
+                                      dtype=np.float32),
+                'shape': np.array([8, 8])}
+
+    def test_distort_graph_for_eval(self):
+        data = distort_graph_for_eval_np(self._graph(), crop_ratio=0.75)
+
+        # The center crop [1:7, 1:7] drops the first and the last node.
+        self.assertAllEqual(data['shape'], [6, 6])
+        self.assertAllEqual(data['nodes'][:, 0], [1, 2])
+        self.assertAllEqual(data['centroids'], [[2, 0], [2, 5]])
+        self.assertAllEqual(data['edges'], [[0, 1], [1, 0]])
+        self.assertAllEqual(data['weights'], [2, 2])
+
+    def test_distort_graph_for_train(self):
+        random_state = np.random.RandomState(0)
+
+        for _ in range(10):
+            data = distort_graph_for_train_np(self._graph(), random_state,
+                                              crop_ratio=0.75)
+
+            num_nodes = data['nodes'].shape[0]
+
+            self.assertAllEqual(data['shape'], [6, 6])
+            self.assertEqual(data['centroids'].shape, (num_nodes, 2))
+            self.assertTrue((data['centroids'] >= 0).all())
+            self.assertTrue((data['centroids'] < 6).all())
+            self.assertTrue((data['edges'] < num_nodes).all())
+            self.assertEqual(data['edges'].shape[0], data['weights'].shape[0])
+
+            # Nodes are ordered in scanline order.
+            rows = np.round(data['centroids'][:, 0])
+            self.assertTrue((np.diff(rows) >= 0).all())
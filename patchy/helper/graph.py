@@ -0,0 +1,129 @@
+import heapq
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+
+def csr_adjacency_np(adjacency):
+    """Converts a dense or sparse adjacency matrix to the compressed sparse
+    row format. Zero weights are treated as missing edges like in dense
+    adjacency matrices.
+
+    Args:
+        adjacency: A numpy array or a scipy sparse matrix with shape
+          [num_nodes, num_nodes].
+
+    Returns:
+        A `scipy.sparse.csr_matrix` with sorted indices.
+    """
+
+    if sp.issparse(adjacency):
+        adjacency = sp.csr_matrix(adjacency, copy=True)
+    else:
+        adjacency = sp.csr_matrix(np.asarray(adjacency))
+
+    adjacency.eliminate_zeros()
+    adjacency.sort_indices()
+
+    return adjacency
+
+
+def networkx_graph_np(adjacency):
+    """Converts a dense or sparse adjacency matrix to a networkx graph. The
+    conversion of a sparse adjacency scales with the number of edges instead
+    of the squared number of nodes.
+
+    Args:
+        adjacency: A numpy array or a scipy sparse matrix with shape
+          [num_nodes, num_nodes].
+
+    Returns:
+        A `networkx.Graph` with the adjacency values as edge weights.
+    """
+
+    if sp.issparse(adjacency):
+        return nx.from_scipy_sparse_matrix(csr_adjacency_np(adjacency))
+    else:
+        return nx.from_numpy_matrix(adjacency)
+
+
+def neighbors_np(adjacency):
+    """Computes the sorted neighbors of each node of a dense or sparse
+    adjacency matrix.
+
+    Args:
+        adjacency: A numpy array or a scipy sparse matrix with shape
+          [num_nodes, num_nodes].
+
+    Returns:
+        A list of numpy arrays holding the neighbors of each node.
+    """
+
+    adjacency = csr_adjacency_np(adjacency)
+    indptr, indices = adjacency.indptr, adjacency.indices
+
+    return [indices[indptr[i]:indptr[i+1]]
+            for i in range(adjacency.shape[0])]
+
+
+def bounded_dijkstra_np(adjacency, roots, size):
+    """Computes the nearest nodes of each root by shortest path length on a
+    dense or sparse adjacency matrix. Each search stops as soon as `size`
+    nodes are settled. Nodes are settled in the same order as
+    `networkx.single_source_dijkstra_path_length`, i.e. equally distant
+    nodes are ordered by the time they were first reached with their final
+    distance, which breaks ties by the order of the sorted neighbors.
+
+    Args:
+        adjacency: A numpy array or a scipy sparse matrix with shape
+          [num_nodes, num_nodes].
+        roots: The root nodes.
+        size: The maximal number of nodes to settle per root.
+
+    Returns:
+        A list holding a list of (node, distance) tuples in settled order for
+        each root.
+    """
+
+    adjacency = csr_adjacency_np(adjacency)
+
+    # Python lists are considerably faster to index than numpy arrays.
+    indptr = adjacency.indptr.tolist()
+    indices = adjacency.indices.tolist()
+    weights = adjacency.data.astype(np.float64).tolist()
+
+    settled_list = []
+    for root in roots:
+        root = int(root)
+
+        settled = []
+        distances = {}
+        seen = {root: 0}
+        fringe = [(0, 0, root)]
+        count = 1
+
+        while fringe and len(settled) < size:
+            distance, _, node = heapq.heappop(fringe)
+            if node in distances:
+                continue
+
+            distances[node] = distance
+            settled.append((node, distance))
+
+            for k in range(indptr[node], indptr[node+1]):
+                neighbor = indices[k]
+                neighbor_distance = distance + weights[k]
+
+                if neighbor in distances:
+                    continue
+
+                if neighbor not in seen or neighbor_distance < seen[neighbor]:
+                    seen[neighbor] = neighbor_distance
+                    heapq.heappush(fringe, (neighbor_distance, count,
+                                            neighbor))
+                    count += 1
+
+        settled_list.append(settled)
+
+    return settled_list
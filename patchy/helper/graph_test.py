@@ -0,0 +1,79 @@
+import tensorflow as tf
+import numpy as np
+import scipy.sparse as sp
+
+from .graph import csr_adjacency_np, networkx_graph_np, neighbors_np,\
+                   bounded_dijkstra_np
+from .labeling import betweenness_centrality_np, canonize_np
+from .neighborhood_assembly import neighborhoods_weights_to_root_np
+
+
+class GraphTest(tf.test.TestCase):
+
+    def _adjacency(self):
+        return np.array([
+            [0, 1, 4, 0, 0, 0, 0],
+            [1, 0, 2, 0, 5, 0, 0],
+            [4, 2, 0, 1, 0, 0, 0],
+            [0, 0, 1, 0, 0, 9, 2],
+            [0, 5, 0, 0, 0, 3, 0],
+            [0, 0, 0, 9, 3, 0, 0],
+            [0, 0, 0, 2, 0, 0, 0],
+        ], dtype=np.float32)
+
+    def test_csr_adjacency(self):
+        adjacency = self._adjacency()
+
+        csr = csr_adjacency_np(adjacency)
+        self.assertAllEqual(csr.toarray(), adjacency)
+        self.assertEqual(csr.nnz, np.count_nonzero(adjacency))
+
+        # Explicitly stored zeros are no edges.
+        sparse = sp.csr_matrix(([0, 1], ([0, 0], [1, 2])), shape=(3, 3))
+        self.assertEqual(csr_adjacency_np(sparse).nnz, 1)
+
+    def test_networkx_graph(self):
+        adjacency = self._adjacency()
+
+        dense = networkx_graph_np(adjacency)
+        sparse = networkx_graph_np(sp.csr_matrix(adjacency))
+
+        self.assertEqual(sorted(dense.edges(data=True)),
+                         sorted(sparse.edges(data=True)))
+
+    def test_neighbors(self):
+        neighbors = neighbors_np(sp.csr_matrix(self._adjacency()))
+
+        self.assertAllEqual(neighbors[0], [1, 2])
+        self.assertAllEqual(neighbors[3], [2, 5, 6])
+        self.assertAllEqual(neighbors[6], [3])
+
+    def test_bounded_dijkstra(self):
+        adjacency = self._adjacency()
+
+        settled = bounded_dijkstra_np(adjacency, [0, 6], 4)
+        self.assertEqual(settled[0], [(0, 0), (1, 1), (2, 3), (3, 4)])
+        self.assertEqual(settled[1], [(6, 0), (3, 2), (2, 3), (1, 5)])
+
+        # Equally distant nodes are settled in the order they were reached.
+        adjacency = np.array([
+            [0, 1, 0, 1],
+            [1, 0, 1, 0],
+            [0, 1, 0, 1],
+            [1, 0, 1, 0],
+        ], dtype=np.float32)
+
+        settled = bounded_dijkstra_np(sp.csr_matrix(adjacency), [2], 10)
+        self.assertEqual(settled[0], [(2, 0), (1, 1), (3, 1), (0, 2)])
+
+    def test_sparse_equals_dense(self):
+        adjacency = self._adjacency()
+        sparse = sp.csr_matrix(adjacency)
+        sequence = np.array([0, 2, 5, -1], dtype=np.int32)
+
+        self.assertAllEqual(betweenness_centrality_np(sparse),
+                            betweenness_centrality_np(adjacency))
+        self.assertAllEqual(canonize_np(sparse), canonize_np(adjacency))
+        self.assertAllEqual(
+            neighborhoods_weights_to_root_np(sparse, sequence, 3),
+            neighborhoods_weights_to_root_np(adjacency, sequence, 3))
@@ -1,51 +1,391 @@
+from __future__ import division
+
+from collections import OrderedDict
+
 from six.moves import xrange
 
 import tensorflow as tf
-import networkx as nx
 import numpy as np
 import pynauty as nauty
 
+from timing import timed
+
+from .graph import csr_adjacency_np
+
+
+# Number of pivot sources and random seed of approximate betweenness
+# centralities.
+BETWEENNESS_K = 32
+BETWEENNESS_SEED = 0
+
+# Maximal number of sources whose shortest paths are traversed at once.
+BETWEENNESS_BATCH_SIZE = 256
+
+# Maximal number of canonical labelings of graph structures to remember.
+CANONIZE_CACHE_SIZE = 1024
+
+# Damping factor of PageRank and the convergence criteria of the power
+# iterations.
+PAGERANK_ALPHA = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+
+_canonical_labelings = OrderedDict()
+
 
 def scanline(adjacency, labels=None):
     with tf.name_scope('scanline', values=[adjacency, labels]):
         return _labels_default(labels, adjacency)
 
 
+@timed('scanline')
+def scanline_np(adjacency, labels=None):
+    return _labels_default_np(labels, adjacency)
+
+
 def betweenness_centrality(adjacency, labels=None):
-    def _betweeness_centrality(adjacency, labels):
-        graph = nx.from_numpy_matrix(adjacency)
+    labels = _labels_default(labels, adjacency)
+    return tf.py_func(betweenness_centrality_np, [adjacency, labels],
+                      tf.int32, stateful=False, name='betweenness_centrality')
+
+
+@timed('betweenness_centrality')
+def betweenness_centrality_np(adjacency, labels=None):
+    labels = _labels_default_np(labels, adjacency)
+    adjacency = csr_adjacency_np(adjacency)
 
-        labeling = nx.betweenness_centrality(graph, normalized=False)
-        labeling = list(labeling.items())
-        labeling = sorted(labeling, key=lambda n: n[1], reverse=True)
+    sources = np.arange(adjacency.shape[0])
+    centrality = _betweenness_centrality_np(adjacency, sources)
 
-        return np.array([labels[n[0]] for n in labeling])
+    return _order_by_centrality_np(centrality, labels)
 
+
+def betweenness_centrality_approx(adjacency, labels=None, k=BETWEENNESS_K):
     labels = _labels_default(labels, adjacency)
-    return tf.py_func(_betweeness_centrality, [adjacency, labels], tf.int32,
-                      stateful=False, name='betweenness_centrality')
 
+    def _betweenness_centrality_approx(adjacency, labels):
+        return betweenness_centrality_approx_np(adjacency, labels, k)
+
+    return tf.py_func(_betweenness_centrality_approx, [adjacency, labels],
+                      tf.int32, stateful=False,
+                      name='betweenness_centrality_approx')
+
+
+@timed('betweenness_centrality_approx')
+def betweenness_centrality_approx_np(adjacency, labels=None, k=BETWEENNESS_K,
+                                     seed=BETWEENNESS_SEED):
+    labels = _labels_default_np(labels, adjacency)
+    adjacency = csr_adjacency_np(adjacency)
+    num_nodes = adjacency.shape[0]
+
+    # Estimate the centralities from the shortest paths of `k` pivot
+    # sources, which are sampled reproducibly for each graph.
+    k = min(k, num_nodes)
+    sources = np.random.RandomState(seed).choice(num_nodes, k, replace=False)
+    centrality = _betweenness_centrality_np(adjacency, np.sort(sources))
+
+    if k > 0:
+        centrality *= num_nodes / k
+
+    return _order_by_centrality_np(centrality, labels)
+
+
+def degree_centrality(adjacency, labels=None):
+    labels = _labels_default(labels, adjacency)
+    return tf.py_func(degree_centrality_np, [adjacency, labels], tf.int32,
+                      stateful=False, name='degree_centrality')
+
+
+@timed('degree_centrality')
+def degree_centrality_np(adjacency, labels=None):
+    labels = _labels_default_np(labels, adjacency)
+    adjacency = csr_adjacency_np(adjacency)
+
+    centrality = np.diff(adjacency.indptr).astype(np.float64)
+
+    return _order_by_centrality_np(centrality, labels)
+
+
+def weighted_degree_centrality(adjacency, labels=None):
+    labels = _labels_default(labels, adjacency)
+    return tf.py_func(weighted_degree_centrality_np, [adjacency, labels],
+                      tf.int32, stateful=False,
+                      name='weighted_degree_centrality')
+
+
+@timed('weighted_degree_centrality')
+def weighted_degree_centrality_np(adjacency, labels=None):
+    labels = _labels_default_np(labels, adjacency)
+    adjacency = csr_adjacency_np(adjacency)
+
+    centrality = np.asarray(adjacency.sum(axis=1), np.float64).ravel()
+
+    return _order_by_centrality_np(centrality, labels)
+
+
+def pagerank(adjacency, labels=None):
+    labels = _labels_default(labels, adjacency)
+    return tf.py_func(pagerank_np, [adjacency, labels], tf.int32,
+                      stateful=False, name='pagerank')
+
+
+@timed('pagerank')
+def pagerank_np(adjacency, labels=None, alpha=PAGERANK_ALPHA):
+    labels = _labels_default_np(labels, adjacency)
+    pattern = _pattern_np(adjacency)
+    num_nodes = pattern.shape[0]
+
+    if num_nodes == 0:
+        return np.asarray(labels, np.int32)
+
+    degrees = np.diff(pattern.indptr)
+    dangling = degrees == 0
+    transition = pattern.T.tocsr()
+
+    # Nodes without edges pass on no centrality along edges.
+    inverse_degrees = np.zeros(num_nodes)
+    inverse_degrees[~dangling] = 1 / degrees[~dangling]
+
+    # Power iteration of the random walk that teleports to a random node
+    # with probability `1 - alpha` and from nodes without edges.
+    centrality = np.full(num_nodes, 1 / num_nodes)
+    for _ in xrange(MAX_ITERATIONS):
+        previous = centrality
+        teleport = (1 - alpha) + alpha * previous[dangling].sum()
+
+        centrality = alpha * transition.dot(previous * inverse_degrees) +\
+            teleport / num_nodes
+
+        if np.abs(centrality - previous).sum() < num_nodes * TOLERANCE:
+            break
+
+    return _order_by_centrality_np(centrality, labels)
+
+
+def eigenvector_centrality(adjacency, labels=None):
+    labels = _labels_default(labels, adjacency)
+    return tf.py_func(eigenvector_centrality_np, [adjacency, labels],
+                      tf.int32, stateful=False,
+                      name='eigenvector_centrality')
+
+
+@timed('eigenvector_centrality')
+def eigenvector_centrality_np(adjacency, labels=None):
+    labels = _labels_default_np(labels, adjacency)
+    pattern = _pattern_np(adjacency)
+    num_nodes = pattern.shape[0]
+
+    # Power iteration with the shifted adjacency `A + I`, which has the same
+    # eigenvectors but converges on bipartite graphs, too.
+    centrality = np.full(num_nodes, 1 / max(num_nodes, 1))
+    for _ in xrange(MAX_ITERATIONS):
+        previous = centrality
+        centrality = previous + pattern.dot(previous)
+
+        norm = np.linalg.norm(centrality)
+        centrality = centrality / norm if norm > 0 else centrality
+
+        if np.abs(centrality - previous).sum() < num_nodes * TOLERANCE:
+            break
+
+    return _order_by_centrality_np(centrality, labels)
 
-def canonize(adjacency, labels=None):
-    def _canonical(adjacency, labels):
-        count = adjacency.shape[0]
-        adjacency_dict = {}
 
-        for i in xrange(count):
-            adjacency_dict[i] = list(np.nonzero(adjacency[i])[0])
+def spatial_raster(adjacency, labels=None, centroids=None):
+    if centroids is None:
+        raise ValueError('Spatial raster labeling requires centroids.')
 
-        graph = nauty.Graph(count, adjacency_dict=adjacency_dict)
-        labeling = nauty.canonical_labeling(graph)
+    labels = _labels_default(labels, adjacency)
+    return tf.py_func(spatial_raster_np, [adjacency, labels, centroids],
+                      tf.int32, stateful=False, name='spatial_raster')
+
+
+@timed('spatial_raster')
+def spatial_raster_np(adjacency, labels=None, centroids=None):
+    if centroids is None:
+        raise ValueError('Spatial raster labeling requires centroids.')
+
+    labels = _labels_default_np(labels, adjacency)
+    num_nodes = centroids.shape[0]
 
-        labeling = [labels[i] for i in labeling]
+    if num_nodes == 0:
+        return np.asarray(labels, np.int32)
 
-        return np.array(labeling, np.int32)
+    # Read the centroids in rows of the height of an average segment from
+    # left to right and top to bottom. The height is estimated from the area
+    # spanned by the centroids.
+    extent = centroids.max(axis=0) - centroids.min(axis=0) + 1
+    step = np.sqrt(extent[0] * extent[1] / num_nodes)
 
+    rows = np.floor((centroids[:, 0] - centroids[:, 0].min()) / step)
+    order = np.lexsort((centroids[:, 1], rows))
+
+    return np.asarray(labels)[order].astype(np.int32)
+
+
+def canonize(adjacency, labels=None):
     labels = _labels_default(labels, adjacency)
-    return tf.py_func(_canonical, [adjacency, labels], tf.int32,
+    return tf.py_func(canonize_np, [adjacency, labels], tf.int32,
                       stateful=False, name='canonical')
 
 
+@timed('canonize')
+def canonize_np(adjacency, labels=None):
+    labels = _labels_default_np(labels, adjacency)
+    adjacency = csr_adjacency_np(adjacency)
+
+    # Graphs with identical structure are only canonized once.
+    key = (adjacency.shape[0], adjacency.indptr.astype(np.int64).tobytes(),
+           adjacency.indices.astype(np.int64).tobytes())
+
+    labeling = _canonical_labelings.get(key)
+    if labeling is None:
+        labeling = _canonical_labeling_np(adjacency)
+        _canonical_labelings[key] = labeling
+
+        if len(_canonical_labelings) > CANONIZE_CACHE_SIZE:
+            _canonical_labelings.popitem(last=False)
+    else:
+        _canonical_labelings.move_to_end(key)
+
+    return np.asarray(labels)[labeling].astype(np.int32)
+
+
+def _canonical_labeling_np(adjacency):
+    """Computes the canonical labeling of a graph with nauty. The search
+    starts from the partition of the nodes by their degree, so that nauty
+    only explores the automorphisms preserving the degrees.
+
+    Args:
+        adjacency: A `scipy.sparse.csr_matrix` with shape
+          [num_nodes, num_nodes].
+
+    Returns:
+        The canonical order of the nodes as int64 numpy array.
+    """
+
+    count = adjacency.shape[0]
+
+    if count == 0:
+        return np.zeros(0, np.int64)
+
+    indptr = adjacency.indptr.tolist()
+    indices = adjacency.indices.tolist()
+    adjacency_dict = {i: indices[indptr[i]:indptr[i+1]] for i in xrange(count)}
+
+    # The cells are ordered by ascending degree, which makes the coloring
+    # invariant under isomorphism.
+    degrees = np.diff(adjacency.indptr)
+    coloring = [set(np.nonzero(degrees == degree)[0].tolist())
+                for degree in np.unique(degrees)]
+
+    graph = nauty.Graph(count, adjacency_dict=adjacency_dict,
+                        vertex_coloring=coloring)
+
+    return np.array(nauty.canonical_labeling(graph), np.int64)
+
+
+def _betweenness_centrality_np(adjacency, sources):
+    """Computes the unnormalized betweenness centralities of an unweighted,
+    undirected graph with Brandes' algorithm restricted to the shortest
+    paths starting at `sources`. The breadth-first searches of a batch of
+    sources are traversed level by level with sparse matrix products.
+
+    Args:
+        adjacency: A `scipy.sparse.csr_matrix` with shape
+          [num_nodes, num_nodes].
+        sources: The source nodes.
+
+    Returns:
+        A float64 numpy array with shape [num_nodes].
+    """
+
+    num_nodes = adjacency.shape[0]
+    pattern = _pattern_np(adjacency)
+    pattern_t = pattern.T.tocsr()
+
+    centrality = np.zeros(num_nodes, dtype=np.float64)
+
+    for start in xrange(0, len(sources), BETWEENNESS_BATCH_SIZE):
+        batch = sources[start:start + BETWEENNESS_BATCH_SIZE]
+        index = np.arange(len(batch))
+
+        # Count the shortest paths from each source to each node.
+        distances = np.full((len(batch), num_nodes), -1, dtype=np.int64)
+        distances[index, batch] = 0
+        sigma = np.zeros((len(batch), num_nodes), dtype=np.float64)
+        sigma[index, batch] = 1
+
+        frontier = sigma.copy()
+        depth = 0
+        while True:
+            paths = pattern_t.dot(frontier.T).T
+            reached = (paths > 0) & (distances < 0)
+
+            if not reached.any():
+                break
+
+            depth += 1
+            distances[reached] = depth
+            sigma[reached] = paths[reached]
+            frontier = np.where(reached, paths, 0)
+
+        # Accumulate the dependencies of the sources from the deepest level
+        # towards the sources.
+        delta = np.zeros((len(batch), num_nodes), dtype=np.float64)
+        for level in xrange(depth, 0, -1):
+            coefficients = np.where(distances == level,
+                                    (1 + delta) / np.maximum(sigma, 1), 0)
+            dependencies = pattern.dot(coefficients.T).T
+
+            delta += np.where(distances == level - 1, sigma * dependencies,
+                              0)
+
+        delta[index, batch] = 0
+        centrality += delta.sum(axis=0)
+
+    # Each shortest path of an undirected graph is counted in both
+    # directions.
+    return centrality / 2
+
+
+def _pattern_np(adjacency):
+    """Computes the unweighted sparsity pattern of an adjacency matrix.
+
+    Args:
+        adjacency: A numpy array or a scipy sparse matrix with shape
+          [num_nodes, num_nodes].
+
+    Returns:
+        A `scipy.sparse.csr_matrix` with ones for all edges.
+    """
+
+    pattern = csr_adjacency_np(adjacency)
+    pattern.data = np.ones_like(pattern.data, dtype=np.float64)
+
+    return pattern
+
+
+def _order_by_centrality_np(centrality, labels):
+    """Orders the labels by descending centrality of their nodes. Nodes of
+    equal centrality keep their order.
+
+    Args:
+        centrality: The centrality of each node.
+        labels: The labels of the nodes.
+
+    Returns:
+        The ordered labels as int32 numpy array.
+    """
+
+    # Round off accumulated floating point errors to not separate nodes of
+    # equal centrality.
+    centrality = np.round(centrality, 8)
+    order = np.argsort(-centrality, kind='mergesort')
+
+    return np.asarray(labels)[order].astype(np.int32)
+
+
 def _labels_default(labels, adjacency):
     if labels is None:
         return tf.range(0, tf.shape(adjacency)[0], dtype=tf.int32)
@@ -53,6 +393,30 @@ def _labels_default(labels, adjacency):
         return labels
 
 
+def _labels_default_np(labels, adjacency):
+    if labels is None:
+        return np.arange(adjacency.shape[0], dtype=np.int32)
+    else:
+        return labels
+
+
 labelings = {'scanline': scanline,
              'betweenness_centrality': betweenness_centrality,
+             'betweenness_centrality_approx': betweenness_centrality_approx,
+             'degree_centrality': degree_centrality,
+             'weighted_degree_centrality': weighted_degree_centrality,
+             'pagerank': pagerank,
+             'eigenvector_centrality': eigenvector_centrality,
+             'spatial_raster': spatial_raster,
              'canonize': canonize}
+
+labelings_np = {
+    'scanline': scanline_np,
+    'betweenness_centrality': betweenness_centrality_np,
+    'betweenness_centrality_approx': betweenness_centrality_approx_np,
+    'degree_centrality': degree_centrality_np,
+    'weighted_degree_centrality': weighted_degree_centrality_np,
+    'pagerank': pagerank_np,
+    'eigenvector_centrality': eigenvector_centrality_np,
+    'spatial_raster': spatial_raster_np,
+    'canonize': canonize_np}
@@ -0,0 +1,84 @@
+"""Benchmarks the betweenness centrality node labelings.
+
+Run with:
+    python -m patchy.helper.labeling_benchmark --benchmarks=.
+"""
+
+import time
+
+from six.moves import xrange
+import tensorflow as tf
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import Delaunay
+
+from .labeling import betweenness_centrality_np,\
+                      betweenness_centrality_approx_np
+
+
+# Number of segments of the shipped PatchySan PascalVOC configuration.
+NUM_SEGMENTS = 300
+K = 32
+
+BURN_ITERS = 1
+NUM_ITERS = 10
+
+
+def betweenness_centrality_networkx(adjacency):
+    """The previous networkx implementation of `betweenness_centrality_np`."""
+
+    graph = nx.Graph(adjacency)
+
+    labeling = nx.betweenness_centrality(graph, normalized=False)
+    labeling = list(labeling.items())
+    labeling = sorted(labeling, key=lambda n: n[1], reverse=True)
+
+    return np.array([n[0] for n in labeling], np.int32)
+
+
+class LabelingBenchmark(tf.test.Benchmark):
+
+    def _adjacency(self):
+        # Region adjacency graphs of segmentations are planar, so we
+        # approximate them by Delaunay triangulations of random centroids.
+        points = np.random.RandomState(0).rand(NUM_SEGMENTS, 2)
+        simplices = Delaunay(points).simplices
+
+        rows = simplices[:, [0, 1, 2, 1, 2, 0]].ravel()
+        cols = simplices[:, [1, 2, 0, 0, 1, 2]].ravel()
+
+        adjacency = sp.csr_matrix((np.ones(rows.size), (rows, cols)),
+                                  shape=(NUM_SEGMENTS, NUM_SEGMENTS))
+        adjacency.data.fill(1)
+
+        return adjacency
+
+    def _run(self, name, labeling, adjacency):
+        for _ in xrange(BURN_ITERS):
+            labeling(adjacency)
+
+        start = time.time()
+        for _ in xrange(NUM_ITERS):
+            labeling(adjacency)
+        wall_time = (time.time() - start) / NUM_ITERS
+
+        self.report_benchmark(iters=NUM_ITERS, wall_time=wall_time,
+                              name=name)
+
+    def benchmark_networkx(self):
+        adjacency = self._adjacency().toarray()
+        self._run('networkx', betweenness_centrality_networkx, adjacency)
+
+    def benchmark_brandes(self):
+        self._run('brandes', betweenness_centrality_np, self._adjacency())
+
+    def benchmark_brandes_approx(self):
+        def _labeling(adjacency):
+            return betweenness_centrality_approx_np(adjacency, k=K)
+
+        self._run('brandes_approx', _labeling, self._adjacency())
+
+
+if __name__ == '__main__':
+    tf.test.main()
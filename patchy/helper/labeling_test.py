@@ -1,6 +1,15 @@
 import tensorflow as tf
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
 
-from .labeling import scanline, betweenness_centrality, canonize
+from .labeling import scanline, betweenness_centrality,\
+                      betweenness_centrality_approx,\
+                      betweenness_centrality_np,\
+                      betweenness_centrality_approx_np, degree_centrality,\
+                      weighted_degree_centrality, pagerank, pagerank_np,\
+                      eigenvector_centrality, eigenvector_centrality_np,\
+                      spatial_raster, canonize, canonize_np
 
 
 class LabelingTest(tf.test.TestCase):
@@ -38,6 +47,146 @@ class LabelingTest(tf.test.TestCase):
             labeling = betweenness_centrality(adjacency, labels)
             self.assertAllEqual(labeling.eval(), expected)
 
+    def test_betweenness_centrality_equals_networkx(self):
+        random_state = np.random.RandomState(0)
+
+        for _ in range(20):
+            num_nodes = random_state.randint(1, 30)
+            adjacency = random_state.rand(num_nodes, num_nodes) < 0.15
+            adjacency = np.triu(adjacency, 1)
+            adjacency = (adjacency | adjacency.T).astype(np.float32)
+
+            centrality = nx.betweenness_centrality(
+                nx.Graph(adjacency), normalized=False)
+            centrality = sorted(centrality.items(), key=lambda n: n[1],
+                                reverse=True)
+            expected = [n[0] for n in centrality]
+
+            self.assertAllEqual(betweenness_centrality_np(adjacency),
+                                expected)
+            self.assertAllEqual(
+                betweenness_centrality_np(sp.csr_matrix(adjacency)),
+                expected)
+
+    def test_betweenness_centrality_approx(self):
+        adjacency = tf.constant([
+            [0, 1, 1, 0, 0, 0, 0],
+            [1, 0, 1, 0, 1, 0, 0],
+            [1, 1, 0, 1, 0, 0, 0],
+            [0, 0, 1, 0, 0, 1, 1],
+            [0, 1, 0, 0, 0, 1, 0],
+            [0, 0, 0, 1, 1, 0, 0],
+            [0, 0, 0, 1, 0, 0, 0],
+        ])
+
+        labels = tf.constant([1, 2, 3, 4, 5, 6, 7])
+
+        # Using all nodes as pivots computes the exact centralities.
+        expected = [4, 3, 2, 6, 5, 1, 7]
+
+        with self.test_session() as sess:
+            labeling = betweenness_centrality_approx(adjacency, labels, k=10)
+            self.assertAllEqual(labeling.eval(), expected)
+
+            # Pivots are sampled reproducibly.
+            adjacency = adjacency.eval()
+            self.assertAllEqual(
+                betweenness_centrality_approx_np(adjacency, k=3),
+                betweenness_centrality_approx_np(adjacency, k=3))
+
+    def test_degree_centrality(self):
+        adjacency = tf.constant([
+            [0, 1, 1, 0, 0],
+            [1, 0, 1, 1, 0],
+            [1, 1, 0, 0, 0],
+            [0, 1, 0, 0, 5],
+            [0, 0, 0, 5, 0],
+        ], dtype=tf.float32)
+
+        with self.test_session() as sess:
+            labeling = degree_centrality(adjacency)
+            self.assertAllEqual(labeling.eval(), [1, 0, 2, 3, 4])
+
+            labeling = weighted_degree_centrality(adjacency)
+            self.assertAllEqual(labeling.eval(), [3, 4, 1, 0, 2])
+
+    def _random_graphs(self):
+        random_state = np.random.RandomState(0)
+
+        for _ in range(20):
+            num_nodes = random_state.randint(2, 30)
+            adjacency = random_state.rand(num_nodes, num_nodes) < 0.15
+            adjacency = np.triu(adjacency, 1)
+            yield (adjacency | adjacency.T).astype(np.float32)
+
+    def _order(self, centrality):
+        centrality = sorted(centrality.items(), key=lambda n: n[1],
+                            reverse=True)
+        return [n[0] for n in centrality]
+
+    def test_pagerank(self):
+        adjacency = tf.constant([
+            [0, 1, 1, 1],
+            [1, 0, 0, 0],
+            [1, 0, 0, 0],
+            [1, 0, 0, 0],
+        ])
+
+        with self.test_session() as sess:
+            labeling = pagerank(adjacency)
+            self.assertAllEqual(labeling.eval(), [0, 1, 2, 3])
+
+        for adjacency in self._random_graphs():
+            expected = nx.pagerank(nx.Graph(adjacency), weight=None,
+                                   max_iter=1000, tol=1e-10)
+            self.assertAllEqual(pagerank_np(sp.csr_matrix(adjacency)),
+                                self._order(expected))
+
+        # Empty graphs and nodes without edges need no division by zero.
+        with np.errstate(all='raise'):
+            self.assertAllEqual(pagerank_np(np.zeros((0, 0))), [])
+            self.assertAllEqual(pagerank_np(np.array([
+                [0, 0, 0],
+                [0, 0, 1],
+                [0, 1, 0],
+            ])), [1, 2, 0])
+
+    def test_eigenvector_centrality(self):
+        adjacency = tf.constant([
+            [0, 1, 0, 0, 0],
+            [1, 0, 1, 1, 0],
+            [0, 1, 0, 1, 0],
+            [0, 1, 1, 0, 1],
+            [0, 0, 0, 1, 0],
+        ])
+
+        with self.test_session() as sess:
+            labeling = eigenvector_centrality(adjacency)
+            self.assertAllEqual(labeling.eval(), [1, 3, 2, 0, 4])
+
+        graph = nx.karate_club_graph()
+        adjacency = nx.to_scipy_sparse_matrix(graph, weight=None)
+
+        expected = self._order(nx.eigenvector_centrality(graph, tol=1e-10))
+        self.assertAllEqual(eigenvector_centrality_np(adjacency)[:10],
+                            expected[:10])
+
+    def test_spatial_raster(self):
+        adjacency = tf.zeros([5, 5])
+        centroids = tf.constant([
+            [0.5, 3], [0, 0], [5, 1], [4.6, 0.2], [9, 9],
+        ])
+
+        # The centroids are read in rows of height sqrt(10 * 10 / 5).
+        expected = [1, 0, 3, 2, 4]
+
+        with self.test_session() as sess:
+            labeling = spatial_raster(adjacency, centroids=centroids)
+            self.assertAllEqual(labeling.eval(), expected)
+
+        with self.assertRaises(ValueError):
+            spatial_raster(adjacency)
+
     def test_canonize(self):
         adjacency = tf.constant([
             [0, 1, 1, 0, 1, 1, 0, 0],
@@ -75,3 +224,21 @@ class LabelingTest(tf.test.TestCase):
         with self.test_session() as sess:
             labeling = canonize(adjacency)
             self.assertAllEqual(labeling.eval(), expected)
+
+    def test_canonize_permutations(self):
+        random_state = np.random.RandomState(0)
+
+        for adjacency in self._random_graphs():
+            permutation = random_state.permutation(adjacency.shape[0])
+            permuted = adjacency[permutation][:, permutation]
+
+            # Canonically ordered adjacencies of isomorphic graphs are equal.
+            labeling = canonize_np(adjacency)
+            permuted_labeling = canonize_np(sp.csr_matrix(permuted))
+
+            self.assertAllEqual(
+                adjacency[labeling][:, labeling],
+                permuted[permuted_labeling][:, permuted_labeling])
+
+            # Repeated graph structures are canonized from the cache.
+            self.assertAllEqual(canonize_np(adjacency), labeling)
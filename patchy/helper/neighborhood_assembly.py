@@ -2,90 +2,134 @@ from datetime import datetime
 
 from six.moves import xrange
 import tensorflow as tf
-import networkx as nx
 import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from timing import timed
+
+from .graph import csr_adjacency_np, bounded_dijkstra_np
 
 
 def neighborhoods_weights_to_root(adjacency, sequence, size):
     def _neighborhoods_weights_to_root(adjacency, sequence):
-        graph = nx.from_numpy_matrix(adjacency)
+        return neighborhoods_weights_to_root_np(adjacency, sequence, size)
 
-        neighborhoods = np.zeros((sequence.shape[0], size), dtype=np.int32)
-        neighborhoods.fill(-1)
+    return tf.py_func(_neighborhoods_weights_to_root, [adjacency, sequence],
+                      tf.int32, stateful=False,
+                      name='neighborhoods_weights_to_root')
 
-        for i in xrange(0, sequence.shape[0]):
-            n = sequence[i]
-            if n < 0:
-                break
 
-            shortest = nx.single_source_dijkstra_path_length(graph, n).items()
-            shortest = sorted(shortest, key=lambda v: v[1])
-            shortest = shortest[:size]
+@timed('neighborhoods_weights_to_root')
+def neighborhoods_weights_to_root_np(adjacency, sequence, size):
+    neighborhoods = np.zeros((sequence.shape[0], size), dtype=np.int32)
+    neighborhoods.fill(-1)
 
-            for j in xrange(0, min(size, len(shortest))):
-                neighborhoods[i][j] = shortest[j][0]
+    # The sequence is padded with negative nodes at its end.
+    num_roots = np.argmax(sequence < 0) if (sequence < 0).any() else\
+        sequence.shape[0]
 
-        return neighborhoods
+    # Stop each search after the `size` nearest nodes are settled.
+    nearest = bounded_dijkstra_np(adjacency, sequence[:num_roots], size)
 
-    return tf.py_func(_neighborhoods_weights_to_root, [adjacency, sequence],
-                      tf.int32, stateful=False,
-                      name='neighborhoods_weights_to_root')
+    for i, settled in enumerate(nearest):
+        neighborhoods[i, :len(settled)] = [node for node, _ in settled]
+
+    return neighborhoods
 
 
 def neighborhoods_grid_spiral(adjacency, sequence, size):
     def _neighborhoods_grid_spiral(adjacency, sequence):
-        graph = nx.from_numpy_matrix(adjacency)
-
-        neighborhoods = np.zeros((sequence.shape[0], size), dtype=np.int32)
-        neighborhoods.fill(-1)
-
-        # Note: This method just works properly on planar graphs where nodes
-        # are placed in a grid like layout and are weighted by distance.
-        #
-        # Add root to arr => [root]
-        # Find nearest neighbor x to root
-        # Add x => arr = [root, x]
-        # Find nearest neighbor y with n(x, y) and min w(x,y) + w(root, y)
-        # that is not already in arr.
-        # set x = y
-        # repeat until arr.length == size
-
-        for i in xrange(0, sequence.shape[0]):
-            root = sequence[i]
-            if root < 0:
-                break
-
-            # Add root node to the beginning of the neighborhood.
-            neighborhoods[i][0] = root
-            x = root
-
-            ws = nx.single_source_dijkstra_path_length(graph, root)
-            ws = list(ws.items())
-
-            for j in xrange(1, size):
-                if x == -1:
-                    break
-
-                y = -1
-                weight = float('inf')
-                for _, n, d, in graph.edges_iter(x, data=True):
-                    if n in neighborhoods[i]:
-                        continue
-
-                    w = ws[n][1] + d['weight']
-                    if w < weight:
-                        y = n
-                        weight = w
-
-                neighborhoods[i][j] = y
-                x = y
-
-        return neighborhoods
+        return neighborhoods_grid_spiral_np(adjacency, sequence, size)
 
     return tf.py_func(_neighborhoods_grid_spiral, [adjacency, sequence],
                       tf.int32, stateful=False,
                       name='neighborhoods_grid_spiral')
 
 
+@timed('neighborhoods_grid_spiral')
+def neighborhoods_grid_spiral_np(adjacency, sequence, size):
+    adjacency = csr_adjacency_np(adjacency)
+    num_nodes = adjacency.shape[0]
+
+    neighborhoods = np.zeros((sequence.shape[0], size), dtype=np.int32)
+    neighborhoods.fill(-1)
+
+    # Note: This method just works properly on planar graphs where nodes
+    # are placed in a grid like layout and are weighted by distance.
+    #
+    # Add root to arr => [root]
+    # Find nearest neighbor x to root
+    # Add x => arr = [root, x]
+    # Find nearest neighbor y with n(x, y) and min w(x,y) + w(root, y)
+    # that is not already in arr.
+    # set x = y
+    # repeat until arr.length == size
+    #
+    # All roots of the sequence walk their spiral simultaneously. The index
+    # `num_nodes` is used as a sentinel for missing nodes.
+
+    # The sequence is padded with negative nodes at its end.
+    num_roots = np.argmax(sequence < 0) if (sequence < 0).any() else\
+        sequence.shape[0]
+    roots = sequence[:num_roots].astype(np.int64)
+
+    if num_roots == 0:
+        return neighborhoods
+
+    neighborhoods[:num_roots, 0] = roots
+
+    # Pad the sorted neighbors and weights of each node to a dense table with
+    # an additional sentinel row.
+    degrees = np.diff(adjacency.indptr)
+    max_degree = max(degrees.max() if num_nodes > 0 else 0, 1)
+
+    rows = np.repeat(np.arange(num_nodes), degrees)
+    cols = np.arange(adjacency.nnz) - np.repeat(adjacency.indptr[:-1], degrees)
+
+    neighbors = np.full((num_nodes + 1, max_degree), num_nodes, np.int64)
+    neighbors[rows, cols] = adjacency.indices
+    weights = np.full((num_nodes + 1, max_degree), np.inf)
+    weights[rows, cols] = adjacency.data
+
+    # Each node of a spiral is at most `size - 1` hops away from its root.
+    # Distances beyond `size` times the maximal weight are therefore never
+    # compared and the searches can stop early.
+    limit = size * adjacency.data.max() if adjacency.nnz > 0 else 0
+    distances = np.full((num_roots, num_nodes + 1), np.inf)
+    distances[:, :num_nodes] = dijkstra(adjacency, indices=roots,
+                                        limit=limit)
+
+    visited = np.zeros((num_roots, num_nodes + 1), dtype=np.bool_)
+    visited[:, num_nodes] = True
+
+    index = np.arange(num_roots)
+    visited[index, roots] = True
+    x = roots
+
+    for j in xrange(1, size):
+        candidates = neighbors[x]
+
+        w = distances[index[:, None], candidates] + weights[x]
+        w[visited[index[:, None], candidates]] = np.inf
+
+        # Prefer the nearest of equally weighted neighbors to continue along
+        # the current ring of the spiral, and then the lowest node.
+        min_w = w.min(axis=1)
+        ties = np.where(w == min_w[:, None], weights[x], np.inf)
+        best = np.argmin(ties, axis=1)
+        y = candidates[index, best]
+        y[np.isinf(min_w)] = num_nodes
+
+        visited[index, y] = True
+        neighborhoods[:num_roots, j] = np.where(y == num_nodes, -1, y)
+        x = y
+
+    return neighborhoods
+
+
 neighborhood_assemblies = {'weights_to_root': neighborhoods_weights_to_root,
                            'grid_spiral': neighborhoods_grid_spiral}
+
+neighborhood_assemblies_np = {
+    'weights_to_root': neighborhoods_weights_to_root_np,
+    'grid_spiral': neighborhoods_grid_spiral_np}
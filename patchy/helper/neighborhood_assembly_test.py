@@ -1,9 +1,65 @@
 from math import sqrt
 
 import tensorflow as tf
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
 
+from .graph import networkx_graph_np
 from .neighborhood_assembly import neighborhoods_weights_to_root,\
-                                   neighborhoods_grid_spiral
+                                   neighborhoods_grid_spiral,\
+                                   neighborhoods_grid_spiral_np
+
+
+def _grid_spiral_reference(adjacency, sequence, size):
+    graph = networkx_graph_np(adjacency)
+
+    neighborhoods = np.zeros((sequence.shape[0], size), dtype=np.int32)
+    neighborhoods.fill(-1)
+
+    for i, root in enumerate(sequence):
+        if root < 0:
+            break
+
+        neighborhoods[i][0] = root
+        x = root
+
+        ws = nx.single_source_dijkstra_path_length(graph, root)
+
+        for j in range(1, size):
+            candidates = [(ws[n] + d['weight'], d['weight'], n)
+                          for _, n, d in graph.edges(x, data=True)
+                          if n not in neighborhoods[i]]
+
+            if len(candidates) == 0:
+                break
+
+            x = min(candidates)[2]
+            neighborhoods[i][j] = x
+
+    return neighborhoods
+
+
+def _random_grid(random_state, height, width, jitter):
+    num_nodes = height * width
+    rows, cols = np.unravel_index(np.arange(num_nodes), (height, width))
+
+    positions = np.stack([rows, cols], axis=1).astype(np.float64)
+    positions += random_state.uniform(-jitter, jitter, positions.shape)
+
+    # Connect 8-neighbors on the grid and randomly drop some edges.
+    adjacency = np.zeros((num_nodes, num_nodes), dtype=np.float32)
+    for u in range(num_nodes):
+        for v in range(u + 1, num_nodes):
+            if max(abs(rows[u] - rows[v]), abs(cols[u] - cols[v])) > 1:
+                continue
+            if random_state.rand() < 0.2:
+                continue
+
+            distance = np.linalg.norm(positions[u] - positions[v])
+            adjacency[u, v] = adjacency[v, u] = distance
+
+    return adjacency
 
 
 class NeighborhoodAssemblyTest(tf.test.TestCase):
@@ -88,3 +144,57 @@ class NeighborhoodAssemblyTest(tf.test.TestCase):
             neighborhoods = neighborhoods_grid_spiral(
                 adjacency, sequence, size)
             self.assertAllEqual(neighborhoods.eval(), expected)
+
+    def test_grid_spiral_equals_reference(self):
+        random_state = np.random.RandomState(0)
+
+        # Grids without jitter contain many equally weighted candidates.
+        for jitter in [0, 0.3]:
+            for _ in range(50):
+                height, width = random_state.randint(1, 7, size=2)
+                adjacency = _random_grid(random_state, height, width, jitter)
+
+                num_nodes = adjacency.shape[0]
+                sequence = random_state.permutation(num_nodes)
+                sequence = sequence[:random_state.randint(0, num_nodes + 1)]
+                sequence = np.concatenate([sequence, [-1, -1]])
+                sequence = sequence.astype(np.int32)
+
+                size = random_state.randint(1, 12)
+
+                expected = _grid_spiral_reference(adjacency, sequence, size)
+
+                self.assertAllEqual(
+                    neighborhoods_grid_spiral_np(adjacency, sequence, size),
+                    expected)
+                self.assertAllEqual(
+                    neighborhoods_grid_spiral_np(sp.csr_matrix(adjacency),
+                                                 sequence, size),
+                    expected)
+
+    def test_grid_spiral_properties(self):
+        random_state = np.random.RandomState(1)
+
+        for _ in range(50):
+            adjacency = _random_grid(random_state, 5, 6, 0.3)
+            sequence = np.arange(30, dtype=np.int32)
+            size = 9
+
+            neighborhoods = neighborhoods_grid_spiral_np(adjacency, sequence,
+                                                         size)
+
+            for root, neighborhood in zip(sequence, neighborhoods):
+                nodes = neighborhood[neighborhood >= 0]
+                self.assertEqual(nodes[0], root)
+
+                # Spirals start at their root, visit each node at most once,
+                # walk along edges and only end early at a dead end.
+                self.assertEqual(nodes.size, np.unique(nodes).size)
+                self.assertTrue((neighborhood[nodes.size:] == -1).all())
+
+                for x, y in zip(nodes[:-1], nodes[1:]):
+                    self.assertGreater(adjacency[x, y], 0)
+
+                if nodes.size < size:
+                    neighbors = np.nonzero(adjacency[nodes[-1]])[0]
+                    self.assertTrue(set(neighbors) <= set(nodes))
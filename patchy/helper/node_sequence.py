@@ -1,4 +1,7 @@
 import tensorflow as tf
+import numpy as np
+
+from timing import timed
 
 
 def node_sequence(sequence, width, stride):
@@ -25,3 +28,21 @@ def node_sequence(sequence, width, stride):
         sequence = tf.concat(0, [sequence, padding])
 
     return sequence
+
+
+@timed('node_sequence')
+def node_sequence_np(sequence, width, stride):
+    """Normalizes a given numpy sequence to have a fixed width by striding
+    over the sequence. See `node_sequence` for a description of the arguments.
+
+    Returns:
+        A 1d numpy array.
+    """
+
+    # Stride the sequence based on the given stride size.
+    sequence = np.asarray(sequence, dtype=np.int32)[0:width*stride:stride]
+
+    # Pad right with -1 if the sequence length is lower than width.
+    padding = -np.ones(width - sequence.shape[0], dtype=np.int32)
+
+    return np.concatenate((sequence, padding))
@@ -1,6 +1,8 @@
 import tensorflow as tf
+import numpy as np
 
 # from .node_sequence import node_sequence
+from .node_sequence import node_sequence_np
 
 
 class NodeSequenceTest(tf.test.TestCase):
@@ -27,3 +29,21 @@ class NodeSequenceTest(tf.test.TestCase):
 
             # s = node_sequence(sequence, width=5, stride=3)
             # self.assertAllEqual(s.eval(), [1, 4, 7, -1, -1])
+
+    def test_node_sequence_np(self):
+        sequence = np.array([1, 2, 3, 4, 5, 6, 7, 8], dtype=np.int32)
+
+        s = node_sequence_np(sequence, width=8, stride=1)
+        self.assertAllEqual(s, [1, 2, 3, 4, 5, 6, 7, 8])
+
+        s = node_sequence_np(sequence, width=4, stride=1)
+        self.assertAllEqual(s, [1, 2, 3, 4])
+
+        s = node_sequence_np(sequence, width=10, stride=1)
+        self.assertAllEqual(s, [1, 2, 3, 4, 5, 6, 7, 8, -1, -1])
+
+        s = node_sequence_np(sequence, width=5, stride=2)
+        self.assertAllEqual(s, [1, 3, 5, 7, -1])
+
+        s = node_sequence_np(sequence, width=5, stride=3)
+        self.assertAllEqual(s, [1, 4, 7, -1, -1])
@@ -0,0 +1,46 @@
+import tensorflow as tf
+
+
+def receptive_fields(nodes, neighborhoods):
+    """Converts neighborhoods to a feature map by gathering the features of
+    all neighborhood nodes with a single gather. Nodes with index -1 get zero
+    features.
+
+    Both arguments can have an additional leading batch dimension, so the
+    features can also be gathered after batching.
+
+    Args:
+        nodes: A 2d float tensor with shape [num_nodes, num_node_channels] or
+          a 3d tensor with shape [batch_size, num_nodes, num_node_channels].
+        neighborhoods: A 2d int32 tensor with shape [num_neighborhoods,
+          neighborhood_size] or a 3d tensor with shape [batch_size,
+          num_neighborhoods, neighborhood_size] holding the node indices,
+          padded with -1.
+
+    Returns:
+        A tensor with shape [num_neighborhoods, neighborhood_size,
+        num_node_channels] or [batch_size, num_neighborhoods,
+        neighborhood_size, num_node_channels].
+    """
+
+    with tf.name_scope('receptive_fields', values=[nodes, neighborhoods]):
+        batched = neighborhoods.get_shape().ndims == 3
+
+        # Prepend a zero node to the nodes, so that all indices are shifted
+        # by one and the padding index -1 gathers zero features.
+        if batched:
+            nodes = tf.pad(nodes, [[0, 0], [1, 0], [0, 0]])
+        else:
+            nodes = tf.pad(nodes, [[1, 0], [0, 0]])
+
+        indices = neighborhoods + 1
+
+        if batched:
+            # Flatten the batch and offset the indices of each example by the
+            # number of nodes of all previous examples.
+            shape = tf.shape(nodes)
+            offsets = tf.range(0, shape[0]) * shape[1]
+            indices += tf.reshape(offsets, [-1, 1, 1])
+            nodes = tf.reshape(nodes, [-1, shape[2]])
+
+        return tf.gather(nodes, indices)
@@ -0,0 +1,90 @@
+"""Benchmarks the conversion of neighborhoods to feature maps.
+
+Run with:
+    python -m patchy.helper.receptive_field_benchmark --benchmarks=.
+"""
+
+import time
+
+from six.moves import xrange
+import tensorflow as tf
+import numpy as np
+
+from .receptive_field import receptive_fields
+
+
+# Sizes of the shipped PatchySan PascalVOC configuration.
+NUM_SEGMENTS = 300
+NUM_NODES = 150
+NEIGHBORHOOD_SIZE = 18
+NUM_NODE_CHANNELS = 45
+BATCH_SIZE = 128
+
+BURN_ITERS = 2
+NUM_ITERS = 20
+
+
+def receptive_fields_map_fn(nodes, neighborhood):
+    """The previous per-node implementation of `receptive_fields`."""
+
+    def _map_features(node):
+        i = tf.maximum(node, 0)
+        positive = tf.strided_slice(nodes, [i], [i+1], [1])
+        negative = tf.zeros([1, NUM_NODE_CHANNELS])
+
+        return tf.where(node < 0, negative, positive)
+
+    data = tf.reshape(neighborhood, [-1])
+    data = tf.map_fn(_map_features, data, dtype=tf.float32)
+
+    return tf.reshape(data, [NUM_NODES, NEIGHBORHOOD_SIZE, NUM_NODE_CHANNELS])
+
+
+class ReceptiveFieldBenchmark(tf.test.Benchmark):
+
+    def _inputs(self, batch_size=None):
+        rng = np.random.RandomState(0)
+        shape = [] if batch_size is None else [batch_size]
+
+        nodes = rng.rand(*(shape + [NUM_SEGMENTS, NUM_NODE_CHANNELS]))
+        neighborhood = rng.randint(
+            -1, NUM_SEGMENTS, shape + [NUM_NODES, NEIGHBORHOOD_SIZE])
+
+        return (tf.constant(nodes, tf.float32),
+                tf.constant(neighborhood, tf.int32))
+
+    def _run(self, name, op, num_examples):
+        with tf.Session() as sess:
+            for _ in xrange(BURN_ITERS):
+                sess.run(op)
+
+            start = time.time()
+            for _ in xrange(NUM_ITERS):
+                sess.run(op)
+            wall_time = (time.time() - start) / NUM_ITERS
+
+        self.report_benchmark(
+            iters=NUM_ITERS, wall_time=wall_time, name=name,
+            extras={'examples_per_sec': num_examples / wall_time})
+
+    def benchmark_map_fn(self):
+        with tf.Graph().as_default():
+            nodes, neighborhood = self._inputs()
+            op = receptive_fields_map_fn(nodes, neighborhood)
+            self._run('map_fn', op, 1)
+
+    def benchmark_gather(self):
+        with tf.Graph().as_default():
+            nodes, neighborhood = self._inputs()
+            op = receptive_fields(nodes, neighborhood)
+            self._run('gather', op, 1)
+
+    def benchmark_gather_batched(self):
+        with tf.Graph().as_default():
+            nodes, neighborhood = self._inputs(BATCH_SIZE)
+            op = receptive_fields(nodes, neighborhood)
+            self._run('gather_batched', op, BATCH_SIZE)
+
+
+if __name__ == '__main__':
+    tf.test.main()
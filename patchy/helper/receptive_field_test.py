@@ -0,0 +1,50 @@
+import tensorflow as tf
+
+from .receptive_field import receptive_fields
+
+
+class ReceptiveFieldTest(tf.test.TestCase):
+
+    def test_receptive_fields(self):
+        neighborhoods = tf.constant([
+            [1, 0, 3, -1],
+            [2, 1, 0, -1],
+        ])
+
+        nodes = tf.constant([
+            [0.5, 0.5, 0.5],
+            [1.5, 1.5, 1.5],
+            [2.5, 2.5, 2.5],
+            [3.5, 3.5, 3.5],
+        ])
+
+        expected = [
+            [[1.5, 1.5, 1.5], [0.5, 0.5, 0.5], [3.5, 3.5, 3.5], [0, 0, 0]],
+            [[2.5, 2.5, 2.5], [1.5, 1.5, 1.5], [0.5, 0.5, 0.5], [0, 0, 0]],
+        ]
+
+        with self.test_session() as sess:
+            data = receptive_fields(nodes, neighborhoods)
+            self.assertAllEqual(data.eval(), expected)
+
+    def test_receptive_fields_batched(self):
+        neighborhoods = tf.constant([
+            [[1, 0, -1], [0, 1, -1]],
+            [[2, 0, 1], [-1, -1, -1]],
+        ])
+
+        nodes = tf.constant([
+            [[0.5, 0.5], [1.5, 1.5], [0, 0]],
+            [[2.5, 2.5], [3.5, 3.5], [4.5, 4.5]],
+        ])
+
+        expected = [
+            [[[1.5, 1.5], [0.5, 0.5], [0, 0]],
+             [[0.5, 0.5], [1.5, 1.5], [0, 0]]],
+            [[[4.5, 4.5], [2.5, 2.5], [3.5, 3.5]],
+             [[0, 0], [0, 0], [0, 0]]],
+        ]
+
+        with self.test_session() as sess:
+            data = receptive_fields(nodes, neighborhoods)
+            self.assertAllEqual(data.eval(), expected)
@@ -1,29 +1,51 @@
 import os
 import sys
+import time
 import json
+import zlib
+import hashlib
+from functools import partial
+from inspect import signature
 
 import tensorflow as tf
+import numpy as np
+import scipy.sparse as sp
 
 from data import DataSet, Record, datasets
-from data import iterator, read_tfrecord, write_tfrecord
-from grapher import graphers
+from data import iterator, record_iterator, parallel_iterator, WorkerPool
+from data import read_tfrecord, write_tfrecord
+from data import ShardedTFRecordWriter, manifest_filenames
+from grapher import graphers, CachedGrapher
+from timing import pop_durations, merge_durations, summary
 
-from .helper.labeling import labelings, scanline
+from .helper.labeling import labelings, labelings_np, scanline
 from .helper.neighborhood_assembly import neighborhood_assemblies as neighb,\
+                                          neighborhood_assemblies_np,\
                                           neighborhoods_weights_to_root
-from .helper.node_sequence import node_sequence
+from .helper.node_sequence import node_sequence_np
+from .helper.distort_graph import distort_graph_for_train_np,\
+                                  distort_graph_for_eval_np
+from .helper.receptive_field import receptive_fields
 
 
 DATA_DIR = '/tmp/patchy_san_data'
 FORCE_WRITE = False
 WRITE_NUM_EPOCHS = 1
 DISTORT_INPUTS = False
+DISTORT_GRAPHS = False
+WRITE_NUM_WORKERS = 0
+WRITE_ORDERED = True
+WRITE_BATCH_SIZE = 1
+NUM_SHARDS = 1
+NODE_DTYPE = 'float32'
+NEIGHBORHOOD_DTYPE = 'int16'
 
 NUM_NODES = 100
 NODE_STRIDE = 1
 NEIGHBORHOOD_SIZE = 9
 
 INFO_FILENAME = 'info.json'
+TIMING_FILENAME = 'timing.json'
 TRAIN_FILENAME = 'train.tfrecords'
 TRAIN_INFO_FILENAME = 'train_info.json'
 TRAIN_EVAL_FILENAME = 'train_eval.tfrecords'
@@ -31,6 +53,15 @@ TRAIN_EVAL_INFO_FILENAME = 'train_eval_info.json'
 EVAL_FILENAME = 'eval.tfrecords'
 EVAL_INFO_FILENAME = 'eval_info.json'
 
+# The stages of each TFRecord file with the suffixes of their filenames. Each
+# stage is computed from the records of the previous stage.
+STAGES = ['graph', 'sequence', 'receptive_field']
+STAGE_SUFFIXES = {'graph': '_graphs', 'sequence': '_sequences',
+                  'receptive_field': ''}
+GRAPH_DTYPES = {'nodes': 'float32', 'edges': 'int32', 'weights': 'float32'}
+SEQUENCE_DTYPES = dict(GRAPH_DTYPES, sequence='int32')
+SPATIAL_DTYPES = {'centroids': 'float32', 'shape': 'int32'}
+
 
 class PatchySan(DataSet):
 
@@ -39,7 +70,13 @@ class PatchySan(DataSet):
                  distort_inputs=DISTORT_INPUTS, node_labeling=None,
                  num_nodes=NUM_NODES, node_stride=NODE_STRIDE,
                  neighborhood_assembly=None,
-                 neighborhood_size=NEIGHBORHOOD_SIZE):
+                 neighborhood_size=NEIGHBORHOOD_SIZE,
+                 write_num_workers=WRITE_NUM_WORKERS,
+                 write_ordered=WRITE_ORDERED, num_shards=NUM_SHARDS,
+                 node_dtype=NODE_DTYPE,
+                 neighborhood_dtype=NEIGHBORHOOD_DTYPE, graph_config=None,
+                 write_batch_size=WRITE_BATCH_SIZE,
+                 distort_graphs=DISTORT_GRAPHS, node_labeling_k=None):
 
         node_labeling = scanline if node_labeling is None else node_labeling
         neighborhood_assembly = neighborhoods_weights_to_root if\
@@ -50,6 +87,9 @@ class PatchySan(DataSet):
         self._num_nodes = num_nodes
         self._neighborhood_size = neighborhood_size
         self._distort_inputs = distort_inputs
+        self._distort_graphs = distort_graphs
+        self._dtypes = {'nodes': node_dtype,
+                        'neighborhood': neighborhood_dtype}
 
         super().__init__(data_dir)
 
@@ -58,46 +98,136 @@ class PatchySan(DataSet):
 
         tf.gfile.MakeDirs(data_dir)
 
-        info_file = os.path.join(data_dir, INFO_FILENAME)
+        # Fingerprint the configuration of each stage including the stages it
+        # depends on. Graphers created without a json configuration are
+        # identified by their type.
+        if graph_config is None:
+            graph_config = {'grapher': type(grapher).__name__,
+                            'num_node_channels': grapher.num_node_channels,
+                            'num_edge_channels': grapher.num_edge_channels}
 
-        if not tf.gfile.Exists(info_file) or force_write:
-            with open(info_file, 'w') as f:
-                json.dump({'max_num_epochs': write_num_epochs,
-                           'distort_inputs': distort_inputs,
-                           'node_labeling': node_labeling.__name__,
+        graph_stage_config = {'graph': graph_config,
+                              'distort_inputs': distort_inputs,
+                              'distort_graphs': distort_graphs}
+        sequence_config = {'node_labeling': node_labeling.__name__,
                            'num_nodes': num_nodes,
-                           'num_node_channels': grapher.num_node_channels,
-                           'node_stride': node_stride,
-                           'neighborhood_assembly':
-                           neighborhood_assembly.__name__,
-                           'neighborhood_size': neighborhood_size,
-                           'num_edge_channels': grapher.num_edge_channels}, f)
-
-        train_file = os.path.join(data_dir, TRAIN_FILENAME)
-        train_info_file = os.path.join(data_dir, TRAIN_INFO_FILENAME)
-
-        if not tf.gfile.Exists(train_file):
-            _write(dataset, grapher, False, train_file, train_info_file,
-                   write_num_epochs, distort_inputs, True, node_labeling,
-                   num_nodes, node_stride, neighborhood_assembly,
-                   neighborhood_size)
-
-        eval_file = os.path.join(data_dir, EVAL_FILENAME)
-        eval_info_file = os.path.join(data_dir, EVAL_INFO_FILENAME)
-
-        if not tf.gfile.Exists(eval_file):
-            _write(dataset, grapher, True, eval_file, eval_info_file,
-                   1, distort_inputs, False, node_labeling, num_nodes,
-                   node_stride, neighborhood_assembly, neighborhood_size)
-
-        train_eval_file = os.path.join(data_dir, TRAIN_EVAL_FILENAME)
-        train_eval_info_file = os.path.join(data_dir, TRAIN_EVAL_INFO_FILENAME)
-
-        if distort_inputs and not tf.gfile.Exists(train_eval_file):
-            _write(dataset, grapher, False, train_eval_file,
-                   train_eval_info_file, 1, distort_inputs, False,
-                   node_labeling, num_nodes, node_stride,
-                   neighborhood_assembly, neighborhood_size)
+                           'node_stride': node_stride}
+
+        # Distorted graphs are written for a single epoch and distorted for
+        # every epoch by the sequence stage.
+        if distort_graphs:
+            sequence_config['write_num_epochs'] = write_num_epochs
+        else:
+            graph_stage_config['write_num_epochs'] = write_num_epochs
+
+        # Spatial labelings require the centroids of the nodes in the graph
+        # records.
+        node_labeling_np = _numpy_implementation(node_labeling, labelings,
+                                                 labelings_np)
+        if _is_spatial(node_labeling_np):
+            graph_stage_config['spatial'] = True
+
+        # Approximate labelings are additionally fingerprinted by their number
+        # of pivot sources.
+        if node_labeling_k is not None:
+            sequence_config['node_labeling_k'] = node_labeling_k
+
+        fingerprints = _fingerprints({
+            'graph': graph_stage_config,
+            'sequence': sequence_config,
+            'receptive_field': {
+                'neighborhood_assembly': neighborhood_assembly.__name__,
+                'neighborhood_size': neighborhood_size,
+                'dtypes': self._dtypes}})
+
+        info_file = os.path.join(data_dir, INFO_FILENAME)
+
+        if tf.gfile.Exists(info_file):
+            with open(info_file, 'r') as f:
+                previous_fingerprints = json.load(f).get('stages', {})
+        else:
+            previous_fingerprints = {}
+
+        _remove_changed_stages(data_dir, previous_fingerprints, fingerprints)
+
+        with open(info_file, 'w') as f:
+            json.dump({'max_num_epochs': write_num_epochs,
+                       'distort_inputs': distort_inputs,
+                       'distort_graphs': distort_graphs,
+                       'node_labeling': node_labeling.__name__,
+                       'node_labeling_k': node_labeling_k,
+                       'num_nodes': num_nodes,
+                       'num_node_channels': grapher.num_node_channels,
+                       'node_stride': node_stride,
+                       'neighborhood_assembly':
+                       neighborhood_assembly.__name__,
+                       'neighborhood_size': neighborhood_size,
+                       'num_edge_channels': grapher.num_edge_channels,
+                       'num_shards': num_shards,
+                       'dtypes': self._dtypes,
+                       'stages': fingerprints},
+                      f)
+
+        if node_labeling_k is not None:
+            if 'k' not in signature(node_labeling_np).parameters:
+                raise ValueError('{} has no number of pivot sources.'
+                                 .format(node_labeling.__name__))
+
+            node_labeling_np = partial(node_labeling_np, k=node_labeling_k)
+
+        neighborhood_assembly_np = _numpy_implementation(
+            neighborhood_assembly, neighb, neighborhood_assemblies_np)
+
+        # The sequence and receptive field stages are computed with the numpy
+        # implementations of the labeling and neighborhood assembly, which
+        # can optionally be run in parallel worker processes. The workers are
+        # forked once before any TensorFlow session runs and are reused for
+        # every stage. They inherit the grapher, labeling and neighborhood
+        # assembly, which may hold closures we can't pickle.
+        pool = WorkerPool(write_num_workers,
+                          [grapher, node_labeling_np,
+                           neighborhood_assembly_np]) if\
+            write_num_workers > 0 else None
+        workers = (pool, write_ordered) if pool is not None else None
+
+        write = partial(
+            _write_stages, dataset=dataset, grapher=grapher,
+            node_labeling=node_labeling_np,
+            num_nodes=num_nodes, node_stride=node_stride,
+            neighborhood_assembly=neighborhood_assembly_np,
+            neighborhood_size=neighborhood_size, workers=workers,
+            num_shards=num_shards, dtypes=self._dtypes,
+            batch_size=write_batch_size, distort_graphs=distort_graphs)
+
+        try:
+            write(eval_data=False,
+                  tfrecord_file=os.path.join(data_dir, TRAIN_FILENAME),
+                  write_num_epochs=write_num_epochs,
+                  distort_inputs=distort_inputs, shuffle=True)
+
+            write(eval_data=True,
+                  tfrecord_file=os.path.join(data_dir, EVAL_FILENAME),
+                  write_num_epochs=1, distort_inputs=distort_inputs,
+                  shuffle=False)
+
+            if distort_inputs or distort_graphs:
+                # Distorted graphs are computed from the undistorted train
+                # images, so the train graph stage already holds the graphs
+                # to evaluate the training data with.
+                graph_file = _stage_filename(
+                    os.path.join(data_dir, TRAIN_FILENAME), 'graph') if\
+                    distort_graphs else None
+
+                write(eval_data=False,
+                      tfrecord_file=os.path.join(data_dir,
+                                                 TRAIN_EVAL_FILENAME),
+                      write_num_epochs=1, distort_inputs=distort_inputs,
+                      shuffle=False, graph_file=graph_file)
+
+        finally:
+            # Stops workers that are still busy after an error, too.
+            if pool is not None:
+                pool.close()
 
     @classmethod
     def create(cls, config):
@@ -114,9 +244,16 @@ class PatchySan(DataSet):
 
         dataset_config = config['dataset']
         grapher_config = config['grapher']
+        grapher = graphers[grapher_config['name']].create(grapher_config)
+
+        # Share the graphs between datasets with different receptive field
+        # configurations by caching them based on the grapher configuration.
+        if config.get('graph_cache_dir') is not None:
+            grapher = CachedGrapher(grapher, grapher_config,
+                                    config['graph_cache_dir'])
 
         return cls(datasets[dataset_config['name']].create(dataset_config),
-                   graphers[grapher_config['name']].create(grapher_config),
+                   grapher,
                    config.get('data_dir', DATA_DIR),
                    config.get('force_write', FORCE_WRITE),
                    config.get('write_num_epochs', WRITE_NUM_EPOCHS),
@@ -125,22 +262,41 @@ class PatchySan(DataSet):
                    config.get('num_nodes', NUM_NODES),
                    config.get('node_stride', NODE_STRIDE),
                    neighb.get(config.get('neighborhood_assembly')),
-                   config.get('neighborhood_size', NEIGHBORHOOD_SIZE))
+                   config.get('neighborhood_size', NEIGHBORHOOD_SIZE),
+                   config.get('write_num_workers', WRITE_NUM_WORKERS),
+                   config.get('write_ordered', WRITE_ORDERED),
+                   config.get('num_shards', NUM_SHARDS),
+                   config.get('node_dtype', NODE_DTYPE),
+                   config.get('neighborhood_dtype', NEIGHBORHOOD_DTYPE),
+                   {'dataset': dataset_config, 'grapher': grapher_config},
+                   config.get('write_batch_size', WRITE_BATCH_SIZE),
+                   config.get('distort_graphs', DISTORT_GRAPHS),
+                   config.get('k'))
 
     @property
     def train_filenames(self):
-        return [os.path.join(self.data_dir, TRAIN_FILENAME)]
+        return manifest_filenames(
+            os.path.join(self.data_dir, TRAIN_INFO_FILENAME),
+            os.path.join(self.data_dir, TRAIN_FILENAME))
 
     @property
     def eval_filenames(self):
-        return [os.path.join(self.data_dir, EVAL_FILENAME)]
+        return manifest_filenames(
+            os.path.join(self.data_dir, EVAL_INFO_FILENAME),
+            os.path.join(self.data_dir, EVAL_FILENAME))
 
     @property
     def train_eval_filenames(self):
-        if self._distort_inputs:
-            return [os.path.join(self.data_dir, TRAIN_EVAL_FILENAME)]
+        if self._distort_inputs or self._distort_graphs:
+            return manifest_filenames(
+                os.path.join(self.data_dir, TRAIN_EVAL_INFO_FILENAME),
+                os.path.join(self.data_dir, TRAIN_EVAL_FILENAME))
         else:
-            return [os.path.join(self.data_dir, TRAIN_FILENAME)]
+            return self.train_filenames
+
+    @property
+    def dtypes(self):
+        return self._dtypes
 
     @property
     def labels(self):
@@ -160,7 +316,7 @@ class PatchySan(DataSet):
 
     @property
     def num_examples_per_epoch_for_train_eval(self):
-        if self._distort_inputs:
+        if self._distort_inputs or self._distort_graphs:
             filename = os.path.join(self._data_dir, TRAIN_EVAL_INFO_FILENAME)
             with open(filename, 'r') as f:
                 count = json.load(f)['count']
@@ -173,69 +329,700 @@ class PatchySan(DataSet):
         data, label = read_tfrecord(
             filename_queue,
             {'nodes': [-1, self._grapher.num_node_channels],
-             'neighborhood': [self._num_nodes, self._neighborhood_size]})
-
-        nodes = data['nodes']
+             'neighborhood': [self._num_nodes, self._neighborhood_size]},
+            self._dtypes)
 
         # Convert the neighborhood to a feature map.
-        def _map_features(node):
-            i = tf.maximum(node, 0)
-            positive = tf.strided_slice(nodes, [i], [i+1], [1])
-            negative = tf.zeros([1, self._grapher.num_node_channels])
-
-            return tf.where(i < 0, negative, positive)
-
-        data = tf.reshape(data['neighborhood'], [-1])
-        data = tf.cast(data, tf.int32)
-        data = tf.map_fn(_map_features, data, dtype=tf.float32)
+        nodes = tf.cast(data['nodes'], tf.float32)
+        neighborhood = tf.cast(data['neighborhood'], tf.int32)
+        data = receptive_fields(nodes, neighborhood)
         shape = [self._num_nodes, self._neighborhood_size,
                  self._grapher.num_node_channels]
-        data = tf.reshape(data, shape)
 
         return Record(data, shape, label)
 
 
-def _write(dataset, grapher, eval_data, tfrecord_file, info_file,
-           write_num_epochs, distort_inputs, shuffle,
-           node_labeling, num_nodes, node_stride, neighborhood_assembly,
-           neighborhood_size):
+def _write_stages(dataset, grapher, eval_data, tfrecord_file,
+                  write_num_epochs, distort_inputs, shuffle, node_labeling,
+                  num_nodes, node_stride, neighborhood_assembly,
+                  neighborhood_size, workers=None, num_shards=1, dtypes={},
+                  batch_size=1, distort_graphs=False, graph_file=None):
+    """Writes all stages of a TFRecord file, which are not yet written.
+
+    Args:
+        dataset: The dataset to read the images from.
+        grapher: The grapher.
+        eval_data: Boolean indicating if one should use the train or eval data
+          set.
+        tfrecord_file: The filename of the receptive field stage.
+        write_num_epochs: The number of epochs to write.
+        distort_inputs: Boolean whether to distort the images.
+        shuffle: Boolean indiciating if one wants to shuffle the images.
+        node_labeling: The numpy implementation of the node labeling.
+        num_nodes: The number of nodes in the node sequence.
+        node_stride: The distance between two selected nodes.
+        neighborhood_assembly: The numpy implementation of the neighborhood
+          assembly.
+        neighborhood_size: The size of each neighborhood.
+        workers: A tuple of the `WorkerPool` and whether to write in order
+          (optional). If None, everything is computed in the main process.
+        num_shards: The number of shards of each stage (optional).
+        dtypes: The dtypes of the receptive field stage (optional).
+        batch_size: The number of images or records each stage computes per
+          call (optional).
+        distort_graphs: Boolean whether to distort the graphs of the
+          undistorted images instead of the images (optional). The graph of
+          each image is computed once and distorted for every epoch by the
+          sequence stage.
+        graph_file: The filename of an already written graph stage to compute
+          the sequence stage from (optional). If None, the graph stage of
+          `tfrecord_file` is written.
+    """
+
+    write_graphs = graph_file is None
+
+    if write_graphs:
+        graph_file = _stage_filename(tfrecord_file, 'graph')
+
+    sequence_file = _stage_filename(tfrecord_file, 'sequence')
+
+    graph_shapes = {'nodes': [-1, grapher.num_node_channels],
+                    'edges': [-1, 2], 'weights': [-1]}
+    graph_dtypes = GRAPH_DTYPES
+    distort = None
+    multiplicity = 1
+
+    # Distorting graphs and spatial labelings require the centroids of the
+    # nodes.
+    spatial = distort_graphs or _is_spatial(node_labeling)
+
+    if spatial:
+        graph_shapes = dict(graph_shapes, centroids=[-1, 2], shape=[2])
+        graph_dtypes = dict(graph_dtypes, **SPATIAL_DTYPES)
+
+    if distort_graphs:
+        # Like images, graphs are distorted randomly when shuffled.
+        if shuffle:
+            distort = partial(_distort_graphs_for_train_np,
+                              num_epochs=write_num_epochs,
+                              flip_nodes=grapher.flip_nodes_np)
+            multiplicity = write_num_epochs
+        else:
+            distort = _distort_graphs_for_eval_np
+
+        write_num_epochs = 1
+        distort_inputs = False
+
+    sequence_shapes = dict(graph_shapes, sequence=[num_nodes])
+    sequence_dtypes = dict(graph_dtypes, **SEQUENCE_DTYPES)
+
+    if write_graphs and not tf.gfile.Exists(_info_filename(graph_file)):
+        if not eval_data:
+            num_examples = dataset.num_examples_per_epoch_for_train
+        else:
+            num_examples = dataset.num_examples_per_epoch_for_eval
+
+        # Read the images in the same order with a single thread on every
+        # run, so that a resumed write skips exactly the images of the
+        # completed shards. Shuffled images are still distorted for training
+        # and get shuffled when the records are read for training.
+        iterate = partial(iterator, dataset, eval_data,
+                          batch_size=batch_size,
+                          distort_inputs=distort_inputs,
+                          num_epochs=write_num_epochs, shuffle=shuffle,
+                          ordered=True)
+
+        def _before(image, label):
+            nodes, adjacencies = grapher.create_graph(image)
+            return [nodes, adjacencies, label]
+
+        def _expand(image, label):
+            # The iterator removes the batch dimension of single images.
+            return [tf.expand_dims(image, axis=0),
+                    tf.expand_dims(label, axis=0)]
+
+        # Graphers are run with their TensorFlow operations for single images
+        # in the main process and with their numpy implementation on whole
+        # batches of images otherwise. Only the numpy implementation can
+        # locate the nodes.
+        if workers is None and batch_size == 1 and not spatial:
+            _write(iterate, _graph_records, graph_file,
+                   write_num_epochs * num_examples, num_shards, graph_dtypes,
+                   before=_before)
+        else:
+            _write(iterate,
+                   partial(_graphs_np, grapher=grapher, spatial=spatial),
+                   graph_file, write_num_epochs * num_examples, num_shards,
+                   graph_dtypes, workers,
+                   _expand if batch_size == 1 else None)
+
+    # Don't compute a stage on top of an incomplete stage.
+    _require_stage(graph_file)
+
+    if not tf.gfile.Exists(_info_filename(sequence_file)):
+        _write_from_stage(
+            graph_file, graph_shapes, graph_dtypes,
+            partial(_sequences_np, node_labeling=node_labeling,
+                    num_nodes=num_nodes, node_stride=node_stride,
+                    distort=distort),
+            sequence_file, num_shards, sequence_dtypes, workers, batch_size,
+            multiplicity)
+
+    _require_stage(sequence_file)
+
+    if not tf.gfile.Exists(_info_filename(tfrecord_file)):
+        _write_from_stage(
+            sequence_file, sequence_shapes, sequence_dtypes,
+            partial(_receptive_fields_np,
+                    neighborhood_assembly=neighborhood_assembly,
+                    neighborhood_size=neighborhood_size),
+            tfrecord_file, num_shards, dtypes, workers, batch_size)
+
+    _require_stage(tfrecord_file)
+
+
+def _require_stage(stage_file):
+    """Raises an error if a stage is incomplete, e.g. after its write was
+    interrupted or failed.
+
+    Args:
+        stage_file: The filename of the stage.
+
+    Raises:
+        RuntimeError: If the stage has no info file.
+    """
+
+    if not tf.gfile.Exists(_info_filename(stage_file)):
+        raise RuntimeError('Saving to {} is incomplete. It will be resumed on '
+                           'the next run.'.format(stage_file))
+
+
+def _write_from_stage(stage_file, shapes, stage_dtypes, function,
+                      tfrecord_file, num_shards, dtypes, workers, batch_size,
+                      multiplicity=1):
+    """Writes a stage computed from the records of a previous stage.
 
-    writer = tf.python_io.TFRecordWriter(tfrecord_file)
+    Args:
+        stage_file: The filename of the previous stage.
+        shapes: The shapes of the features of the previous stage.
+        stage_dtypes: The dtypes of the features of the previous stage.
+        function: The numpy function computing a list of [data, label]
+          records for each batch of [data, label] records of the previous
+          stage.
+        tfrecord_file: The filename to write to.
+        num_shards: The number of shards.
+        dtypes: The dtypes to write the features with.
+        workers: A tuple of the `WorkerPool` and whether to write in order or
+          None.
+        batch_size: The number of records per batch.
+        multiplicity: The number of records `function` computes for each
+          record of the previous stage (optional).
+    """
 
-    iterate = iterator(dataset, eval_data, distort_inputs=distort_inputs,
-                       num_epochs=write_num_epochs, shuffle=shuffle)
+    info_file = _info_filename(stage_file)
 
-    def _before(image, label):
-        nodes, adjacencies = grapher.create_graph(image)
+    with open(info_file, 'r') as f:
+        count = json.load(f)['count']
 
-        # Only take the first adjacency matrix.
-        count = tf.shape(adjacencies)[0]
-        adjacency = tf.strided_slice(
-            adjacencies, [0, 0, 0], [count, count, 1], [1, 1, 1])
-        adjacency = tf.squeeze(adjacency, axis=2)
-        sequence = node_labeling(adjacency)
-        sequence = node_sequence(sequence, num_nodes, node_stride)
-        neighborhood = neighborhood_assembly(adjacency, sequence,
-                                             neighborhood_size)
+    iterate = partial(record_iterator,
+                      manifest_filenames(info_file, stage_file), count,
+                      shapes, stage_dtypes, batch_size)
 
-        return [nodes, neighborhood, label]
+    _write(iterate, function, tfrecord_file, multiplicity * count, num_shards,
+           dtypes, workers, multiplicity=multiplicity)
+
+
+def _write(iterate, function, tfrecord_file, num_examples, num_shards=1,
+           dtypes={}, workers=None, before=None, multiplicity=1):
+    """Writes the outputs of an iteration to a sharded TFRecord file and its
+    info file. The write is resumed from the last completed shard of a
+    previously interrupted write, unless it is written by unordered workers.
+
+    Args:
+        iterate: A function returning an iterate function, that skips the
+          number of outputs passed as `skip` argument. The iteration must
+          pass the same outputs in the same order on every run.
+        function: A numpy function computing the list of [data, label]
+          records to write for each output batch of the iteration.
+        tfrecord_file: The filename to write to.
+        num_examples: The number of records to write.
+        num_shards: The number of shards (optional).
+        dtypes: The dtypes to write the features with (optional).
+        workers: A tuple of the `WorkerPool` and whether to write in order
+          (optional). If given, `function` is run in the worker processes.
+        before: The before callback of the iteration, whose outputs are
+          passed to `function` (optional).
+        multiplicity: The number of records `function` computes for each
+          output of the iteration (optional).
+    """
+
+    # Fill the shards one after another, so that every completed shard is a
+    # checkpoint we can resume from after an interruption.
+    shard_size = max(-(-num_examples // num_shards), 1)
+    info_file = _info_filename(tfrecord_file)
+    progress_file = '{}_progress.json'.format(
+        os.path.splitext(tfrecord_file)[0])
+
+    # Resuming skips the records written before the interruption, which is
+    # only sound if the records are written in the order of the iteration.
+    # Unordered workers write the records in the order they finish, so their
+    # writes are restarted instead.
+    resumable = workers is None or workers[1]
+
+    if not resumable and tf.gfile.Exists(progress_file):
+        tf.gfile.Remove(progress_file)
+
+    writer = ShardedTFRecordWriter(tfrecord_file, num_shards, shard_size,
+                                   progress_file if resumable else None)
+    skip = writer.resume()
+
+    if skip > 0:
+        print('Resuming to save to {} after {} records.'
+              .format(tfrecord_file, skip))
+
+    iterate = iterate(skip=skip // multiplicity)
+
+    if workers is not None:
+        # Send the durations recorded in the worker processes along with
+        # each output.
+        iterate = parallel_iterator(
+            iterate, partial(_timed_np, function=function), *workers)
+        function = None
+
+    # Drop durations recorded before this write, e.g. by a previous stage.
+    pop_durations()
+    durations = {}
+    start = time.perf_counter()
 
     def _each(output, index, last_index):
-        write_tfrecord(writer,
-                       {'nodes': output[0], 'neighborhood': output[1]},
-                       output[2])
+        if function is not None:
+            records = function(output)
+        else:
+            records, worker_durations = output
+            merge_durations(durations, worker_durations)
+
+        merge_durations(durations, pop_durations())
+
+        # The first batch after resuming may contain already written records.
+        first = multiplicity * index - len(records)
+        records = records[max(skip - first, 0):]
+
+        for data, label in records:
+            write_tfrecord(writer, data, label, dtypes)
 
         sys.stdout.write(
-            '\r>> Saving graphs to {} {:.1f}%'
+            '\r>> Saving to {} {:.1f}%'
             .format(tfrecord_file, 100.0 * index / last_index))
         sys.stdout.flush()
 
     def _done(index, last_index):
+        writer.close()
+
         print('')
-        print('Successfully saved {} graphs to {}.'
-              .format(index, tfrecord_file))
+
+        _write_timing(tfrecord_file, durations, writer.count - skip,
+                      time.perf_counter() - start)
+
+        # Don't write the info file of an incomplete write, e.g. after an
+        # interruption or an error, so that the write gets resumed from the
+        # last completed shard on the next run.
+        if writer.count < num_examples:
+            print('Stopped saving to {} after {} of {} records.'
+                  .format(tfrecord_file, writer.count, num_examples))
+            return
+
+        print('Successfully saved {} records to {}.'
+              .format(writer.count, tfrecord_file))
 
         with open(info_file, 'w') as f:
-            json.dump({'count': index}, f)
+            json.dump({'count': writer.count, 'shards': writer.shards}, f)
+
+        if tf.gfile.Exists(progress_file):
+            tf.gfile.Remove(progress_file)
+
+    iterate(_each, before, _done)
+
+
+def _timed_np(output, function):
+    """Runs a function and collects the durations it recorded, so that they
+    can be sent from a worker process to the main process.
+
+    Args:
+        output: The output to pass to the function.
+        function: The function.
+
+    Returns:
+        A tuple of the return value of the function and the recorded
+        durations.
+    """
+
+    pop_durations()
+    output = function(output)
+
+    return output, pop_durations()
+
+
+def _write_timing(tfrecord_file, durations, num_records, seconds):
+    """Adds the latencies and the throughput of a write to the timing report
+    next to the info file.
+
+    Args:
+        tfrecord_file: The written filename.
+        durations: The durations recorded while writing.
+        num_records: The number of written records.
+        seconds: The duration of the write in seconds.
+    """
+
+    report_file = os.path.join(os.path.dirname(tfrecord_file),
+                               TIMING_FILENAME)
+
+    if tf.gfile.Exists(report_file):
+        with open(report_file, 'r') as f:
+            report = json.load(f)
+    else:
+        report = {}
+
+    name = os.path.splitext(os.path.basename(tfrecord_file))[0]
+    report[name] = {'num_records': num_records,
+                    'seconds': seconds,
+                    'records_per_sec': num_records / max(seconds, 1e-9),
+                    'stages': summary(durations)}
+
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def _graph_records(output):
+    """Computes the graph records of the outputs of the graph operations of
+    a single image.
+
+    Args:
+        output: A list of the nodes, the adjacencies and the label.
+
+    Returns:
+        A list with the graph record.
+    """
+
+    return [_graph_record(output)]
+
+
+def _graphs_np(output, grapher, spatial=False):
+    """Computes the graph records of a batch of images with numpy.
+
+    Args:
+        output: The [images, labels] output batch of the dataset iterator.
+        grapher: The grapher.
+        spatial: Boolean whether to add the centroids of the nodes and the
+          shape of the image to the records (optional).
+
+    Returns:
+        A list of graph records.
+    """
+
+    records = []
+
+    for image, label in zip(*output):
+        if not spatial:
+            nodes, adjacencies = grapher.create_graph_np(image, sparse=True)
+            records.append(_graph_record([nodes, adjacencies, label]))
+            continue
+
+        nodes, adjacencies, centroids = grapher.create_spatial_graph_np(
+            image, sparse=True)
+        data, label = _graph_record([nodes, adjacencies, label])
+        data['centroids'] = centroids
+        data['shape'] = np.array(image.shape[:2], dtype=np.int32)
+        records.append([data, label])
+
+    return records
+
+
+def _graph_record(output):
+    """Converts a graph to its record with a sparse adjacency.
+
+    Args:
+        output: A list of the nodes, the adjacencies and the label. The
+          adjacencies are either dense in the shape
+          [num_nodes, num_nodes, num_edge_channels] or a list of sparse
+          matrices.
+
+    Returns:
+        A list of the graph data and the label.
+    """
+
+    nodes, adjacencies, label = output
+
+    # Only take the first adjacency matrix.
+    if isinstance(adjacencies, list):
+        adjacency = sp.csr_matrix(adjacencies[0])
+        adjacency.eliminate_zeros()
+        adjacency.sort_indices()
+        adjacency = adjacency.tocoo()
+        rows, cols, weights = adjacency.row, adjacency.col, adjacency.data
+    else:
+        adjacency = adjacencies[:, :, 0]
+        rows, cols = np.nonzero(adjacency)
+        weights = adjacency[rows, cols]
+
+    return [{'nodes': nodes,
+             'edges': np.stack([rows, cols], axis=1),
+             'weights': weights}, label]
+
+
+def _adjacency_np(data):
+    """Converts the sparse adjacency of a graph record to a sparse matrix,
+    so that the labelings and neighborhood assemblies scale with the number
+    of edges.
+
+    Args:
+        data: The graph data of a record.
+
+    Returns:
+        A `scipy.sparse.csr_matrix` in the shape [num_nodes, num_nodes].
+    """
+
+    num_nodes = data['nodes'].shape[0]
+    edges = data['edges'].reshape(-1, 2)
+
+    return sp.csr_matrix((data['weights'], (edges[:, 0], edges[:, 1])),
+                         shape=(num_nodes, num_nodes), dtype=np.float32)
+
+
+def _sequences_np(records, node_labeling, num_nodes, node_stride,
+                  distort=None):
+    """Computes the node sequences of graph records with numpy.
+
+    Args:
+        records: A list of [data, label] graph records.
+        node_labeling: The numpy implementation of the node labeling.
+        num_nodes: The number of nodes in the node sequence.
+        node_stride: The distance between two selected nodes.
+        distort: A function computing a list of distorted graphs for the
+          graph data of a record (optional).
+
+    Returns:
+        A list of the records with their node sequence.
+    """
+
+    outputs = []
+
+    for data, label in records:
+        graphs = [data] if distort is None else distort(data)
+
+        for graph in graphs:
+            if _is_spatial(node_labeling):
+                sequence = node_labeling(_adjacency_np(graph),
+                                         centroids=graph['centroids'])
+            else:
+                sequence = node_labeling(_adjacency_np(graph))
+            sequence = node_sequence_np(sequence, num_nodes, node_stride)
+            outputs.append([dict(graph, sequence=sequence), label])
+
+    return outputs
+
+
+def _distort_graphs_for_train_np(data, num_epochs, flip_nodes):
+    """Distorts a graph randomly for each epoch. The distortions are seeded
+    by the graph, so that they don't depend on the process computing them.
+
+    Args:
+        data: The graph data of a record.
+        num_epochs: The number of epochs.
+        flip_nodes: A function computing the nodes of a horizontally flipped
+          graph.
+
+    Returns:
+        A list of distorted graph data.
+    """
+
+    random_state = np.random.RandomState(zlib.crc32(data['nodes'].tobytes()))
+
+    return [distort_graph_for_train_np(data, random_state,
+                                       flip_nodes=flip_nodes)
+            for _ in range(num_epochs)]
+
+
+def _distort_graphs_for_eval_np(data):
+    """Distorts a graph for evaluation.
+
+    Args:
+        data: The graph data of a record.
+
+    Returns:
+        A list with the distorted graph data.
+    """
+
+    return [distort_graph_for_eval_np(data)]
+
+
+def _receptive_fields_np(records, neighborhood_assembly, neighborhood_size):
+    """Computes the neighborhoods of sequence records with numpy.
+
+    Args:
+        records: A list of [data, label] sequence records.
+        neighborhood_assembly: The numpy implementation of the neighborhood
+          assembly.
+        neighborhood_size: The size of each neighborhood.
+
+    Returns:
+        A list of records with the nodes and the neighborhood.
+    """
+
+    outputs = []
+
+    for data, label in records:
+        neighborhood = neighborhood_assembly(
+            _adjacency_np(data), data['sequence'], neighborhood_size)
+        outputs.append([{'nodes': data['nodes'],
+                         'neighborhood': neighborhood}, label])
+
+    return outputs
+
+
+def _stage_filename(tfrecord_file, stage):
+    """Computes the filename of a stage of a TFRecord file.
+
+    Args:
+        tfrecord_file: The filename of the receptive field stage, e.g.
+          `train.tfrecords`.
+        stage: The name of the stage.
+
+    Returns:
+        The filename of the stage, e.g. `train_graphs.tfrecords`.
+    """
+
+    base, extension = os.path.splitext(tfrecord_file)
+    return '{}{}{}'.format(base, STAGE_SUFFIXES[stage], extension)
+
+
+def _info_filename(tfrecord_file):
+    """Computes the filename of the info file of a TFRecord file.
+
+    Args:
+        tfrecord_file: The filename, e.g. `train.tfrecords`.
+
+    Returns:
+        The filename of the info file, e.g. `train_info.json`.
+    """
+
+    return '{}_info.json'.format(os.path.splitext(tfrecord_file)[0])
+
+
+def _remove_stage(tfrecord_file, stage):
+    """Removes all files of a stage of a TFRecord file.
+
+    Args:
+        tfrecord_file: The filename of the receptive field stage.
+        stage: The name of the stage.
+    """
+
+    filename = _stage_filename(tfrecord_file, stage)
+    base, extension = os.path.splitext(filename)
+
+    filenames = tf.gfile.Glob('{}-*-of-*{}'.format(base, extension))
+    filenames += [filename, _info_filename(filename),
+                  '{}_progress.json'.format(base)]
+
+    for filename in filenames:
+        if tf.gfile.Exists(filename):
+            tf.gfile.Remove(filename)
+
+
+def _remove_changed_stages(data_dir, previous_fingerprints, fingerprints):
+    """Removes every stage whose configuration changed and all stages that
+    depend on it, so that only those get recomputed.
+
+    Args:
+        data_dir: The directory holding the TFRecord files.
+        previous_fingerprints: A dictionary holding the fingerprint of each
+          written stage.
+        fingerprints: A dictionary holding the fingerprint of each stage.
+    """
+
+    changed = False
+    for stage in STAGES:
+        changed = changed or\
+            previous_fingerprints.get(stage) != fingerprints[stage]
+
+        if changed:
+            for filename in [TRAIN_FILENAME, EVAL_FILENAME,
+                             TRAIN_EVAL_FILENAME]:
+                _remove_stage(os.path.join(data_dir, filename), stage)
+
+
+def _fingerprints(configs):
+    """Computes the fingerprint of each stage from its configuration and the
+    fingerprint of the stage it depends on.
+
+    Args:
+        configs: A dictionary holding the json configuration of each stage.
+
+    Returns:
+        A dictionary holding the fingerprint of each stage.
+    """
+
+    fingerprints = {}
+    previous = None
+
+    for stage in STAGES:
+        config = dict(configs[stage])
+
+        if previous is not None:
+            config[previous] = fingerprints[previous]
+
+        fingerprints[stage] = _fingerprint(config)
+        previous = stage
+
+    return fingerprints
+
+
+def _fingerprint(config):
+    """Computes the fingerprint of a json configuration.
+
+    Args:
+        config: The json configuration.
+
+    Returns:
+        A hex string.
+    """
+
+    return hashlib.sha1(
+        json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _is_spatial(node_labeling):
+    """Checks whether a numpy node labeling orders the nodes by their
+    centroids.
+
+    Args:
+        node_labeling: The numpy implementation of the node labeling.
+
+    Returns:
+        Boolean whether the labeling takes the centroids of the nodes.
+    """
+
+    return 'centroids' in signature(node_labeling).parameters
+
+
+def _numpy_implementation(function, functions, functions_np):
+    """Finds the numpy implementation of a registered function.
+
+    Args:
+        function: The function.
+        functions: The registry of the function.
+        functions_np: The registry of the numpy implementations with the same
+          keys as `functions`.
+
+    Returns:
+        The numpy implementation of the function.
+
+    Raises:
+        ValueError: If the function has no registered numpy implementation.
+    """
+
+    for name in functions:
+        if functions[name] is function and name in functions_np:
+            return functions_np[name]
 
-    iterate(_each, _before, _done)
+    raise ValueError('{} has no numpy implementation.'
+                     .format(function.__name__))
@@ -1,4 +1,158 @@
+import os
+import time
+from functools import partial
+
 import tensorflow as tf
+import numpy as np
+import scipy.sparse as sp
+
+from data import DataSet, Record, iterator, read_tfrecord_np,\
+                 manifest_filenames, WorkerPool
+from grapher import Grapher, SegmentationGrapher
+
+from .patchy import PatchySan, _graph_record, _graphs_np, _adjacency_np,\
+                    _stage_filename, _info_filename, _write,\
+                    _fingerprints, _remove_changed_stages
+
+
+def _numbers(num_examples, stop=None):
+    """Returns a function returning an iterate function, that passes the
+    numbers up to `num_examples` and is interrupted before passing `stop`."""
+
+    def _iterate(skip=0):
+        def _iterate(each, before=None, done=None, interrupt=None):
+            index = skip
+
+            try:
+                while index < num_examples:
+                    if index == stop:
+                        raise KeyboardInterrupt
+
+                    # Give the workers time to finish previous numbers.
+                    time.sleep(0.01)
+
+                    index += 1
+                    each(index - 1, index, num_examples)
+
+            except KeyboardInterrupt:
+                if interrupt is not None:
+                    interrupt(index, num_examples)
+
+            finally:
+                if done is not None:
+                    done(index, num_examples)
+
+        return _iterate
+
+    return _iterate
+
+
+class _Numbers(DataSet):
+    """Dataset of single pixel images holding the numbers up to 40."""
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+
+        with open(self.train_filenames[0], 'wb') as f:
+            f.write(bytes(range(40)))
+
+    @classmethod
+    def create(cls, config):
+        return cls(config['data_dir'])
+
+    @property
+    def train_filenames(self):
+        return [os.path.join(self.data_dir, 'numbers.bin')]
+
+    @property
+    def eval_filenames(self):
+        return self.train_filenames
+
+    @property
+    def labels(self):
+        return [str(i) for i in range(40)]
+
+    @property
+    def num_examples_per_epoch_for_train(self):
+        return 40
+
+    @property
+    def num_examples_per_epoch_for_eval(self):
+        return 40
+
+    def read(self, filename_queue):
+        reader = tf.FixedLengthRecordReader(record_bytes=1)
+        _, value = reader.read(filename_queue)
+
+        # Decoding takes a different time for every number like decoding
+        # images of different sizes.
+        number = tf.py_func(_decode, [tf.decode_raw(value, tf.uint8)],
+                            tf.uint8)
+        number.set_shape([1])
+        data = tf.reshape(tf.cast(number, tf.float32), [1, 1, 1])
+
+        return Record(data, [1, 1, 1], tf.cast(number, tf.int64))
+
+
+class _PixelGrapher(Grapher):
+    """Grapher creating a single node graph for each single pixel image, that
+    is interrupted when creating the graph of the image holding `stop`."""
+
+    def __init__(self, stop=None):
+        self._stop = stop
+
+    @classmethod
+    def create(cls, config):
+        return cls(config.get('stop'))
+
+    @property
+    def num_node_channels(self):
+        return 1
+
+    @property
+    def num_edge_channels(self):
+        return 1
+
+    def create_graph(self, data):
+        raise NotImplementedError
+
+    def create_graph_np(self, data, sparse=False):
+        if data[0, 0, 0] == self._stop:
+            raise KeyboardInterrupt
+
+        return data.reshape(1, 1), [sp.csr_matrix((1, 1))]
+
+    def create_spatial_graph_np(self, data, sparse=False):
+        nodes, adjacencies = self.create_graph_np(data, sparse)
+        return nodes, adjacencies, np.array([[0.5, 0.5]])
+
+    def flip_nodes_np(self, nodes):
+        return nodes
+
+
+def _decode(number):
+    time.sleep(0.005 * (number[0] % 5))
+    return number
+
+
+def _number_records(number):
+    # Let the first number finish last when computed by workers.
+    if number == 0:
+        time.sleep(0.2)
+
+    return [[{'number': np.array([number])}, number]]
+
+
+def _read_numbers(tfrecord_file):
+    numbers = []
+    for filename in manifest_filenames(_info_filename(tfrecord_file),
+                                       tfrecord_file):
+        for serialized in tf.python_io.tf_record_iterator(filename):
+            data, _ = read_tfrecord_np(serialized, {'number': [1]},
+                                       {'number': 'int32'})
+            numbers.append(int(data['number'][0]))
+
+    return numbers
 
 
 class NodeSequenceTest(tf.test.TestCase):
@@ -34,3 +188,210 @@ class NodeSequenceTest(tf.test.TestCase):
             data = tf.reshape(data, [2, 4, 3])
 
             self.assertAllEqual(data.eval(), expected)
+
+
+class StageTest(tf.test.TestCase):
+
+    def test_graph_record(self):
+        nodes = np.array([[0.5], [1.5], [2.5]], dtype=np.float32)
+        adjacencies = np.array([
+            [[0, 1], [2, 1], [0, 0]],
+            [[2, 0], [0, 0], [3, 1]],
+            [[0, 0], [3, 0], [0, 0]],
+        ], dtype=np.float32)
+
+        data, label = _graph_record([nodes, adjacencies, 1])
+
+        self.assertAllEqual(data['nodes'], nodes)
+        self.assertAllEqual(data['edges'], [[0, 1], [1, 0], [1, 2], [2, 1]])
+        self.assertAllEqual(data['weights'], [2, 2, 3, 3])
+        self.assertEqual(label, 1)
+
+        self.assertAllEqual(_adjacency_np(data).toarray(),
+                            adjacencies[:, :, 0])
+
+    def test_sparse_graph_record(self):
+        nodes = np.array([[0.5], [1.5], [2.5]], dtype=np.float32)
+        adjacency = sp.csr_matrix(np.array([
+            [0, 2, 0],
+            [2, 0, 3],
+            [0, 3, 0],
+        ], dtype=np.float32))
+
+        data, _ = _graph_record([nodes, [adjacency], 1])
+
+        self.assertAllEqual(data['edges'], [[0, 1], [1, 0], [1, 2], [2, 1]])
+        self.assertAllEqual(data['weights'], [2, 2, 3, 3])
+
+    def test_graphs(self):
+        segmentation = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 1, 1],
+            [2, 2, 3, 3],
+            [2, 2, 3, 3],
+        ])
+
+        grapher = SegmentationGrapher(None, ['unweighted'],
+                                      lambda image: segmentation,
+                                      fused=True)
+
+        images = np.zeros((2, 4, 4, 3), dtype=np.float32)
+        records = _graphs_np([images, [0, 1]], grapher, spatial=True)
+
+        self.assertEqual(len(records), 2)
+
+        data, label = records[1]
+        self.assertEqual(label, 1)
+        self.assertEqual(data['nodes'].shape, (4, grapher.num_node_channels))
+        self.assertAllEqual(_adjacency_np(data).toarray(), [
+            [0, 1, 1, 1],
+            [1, 0, 1, 1],
+            [1, 1, 0, 1],
+            [1, 1, 1, 0],
+        ])
+        self.assertAllClose(data['centroids'],
+                            [[0.5, 0.5], [0.5, 2.5], [2.5, 0.5], [2.5, 2.5]])
+        self.assertAllEqual(data['shape'], [4, 4])
+
+    def test_stage_filename(self):
+        self.assertEqual(_stage_filename('/tmp/train.tfrecords', 'graph'),
+                         '/tmp/train_graphs.tfrecords')
+        self.assertEqual(_stage_filename('/tmp/eval.tfrecords', 'sequence'),
+                         '/tmp/eval_sequences.tfrecords')
+        self.assertEqual(
+            _stage_filename('/tmp/train.tfrecords', 'receptive_field'),
+            '/tmp/train.tfrecords')
+
+    def test_remove_changed_stages(self):
+        configs = {'graph': {'graph': {'grapher': 'segmentation'}},
+                   'sequence': {'num_nodes': 10},
+                   'receptive_field': {'neighborhood_size': 9}}
+
+        fingerprints = _fingerprints(configs)
+        changed = _fingerprints(dict(configs, sequence={'num_nodes': 20}))
+
+        self.assertEqual(changed['graph'], fingerprints['graph'])
+        self.assertNotEqual(changed['sequence'], fingerprints['sequence'])
+        self.assertNotEqual(changed['receptive_field'],
+                            fingerprints['receptive_field'])
+
+        data_dir = os.path.join(self.get_temp_dir(), 'stages')
+        os.makedirs(data_dir)
+
+        filenames = ['train_graphs.tfrecords', 'train_graphs_info.json',
+                     'train_sequences-00000-of-00002.tfrecords',
+                     'train_sequences-00001-of-00002.tfrecords',
+                     'train_sequences_progress.json',
+                     'train.tfrecords', 'train_info.json',
+                     'eval_graphs.tfrecords', 'eval_graphs_info.json',
+                     'eval_sequences.tfrecords']
+
+        for filename in filenames:
+            open(os.path.join(data_dir, filename), 'w').close()
+
+        # Changing the sequence stage removes the sequence and receptive
+        # field stages, but keeps the graph stage.
+        _remove_changed_stages(data_dir, fingerprints, changed)
+        self.assertEqual(sorted(os.listdir(data_dir)),
+                         ['eval_graphs.tfrecords', 'eval_graphs_info.json',
+                          'train_graphs.tfrecords', 'train_graphs_info.json'])
+
+        _remove_changed_stages(data_dir, changed, changed)
+        self.assertEqual(len(os.listdir(data_dir)), 4)
+
+        _remove_changed_stages(data_dir, {}, changed)
+        self.assertEqual(os.listdir(data_dir), [])
+
+
+class WriteTest(tf.test.TestCase):
+
+    def _write(self, name, iterate, workers=None, function=_number_records):
+        tfrecord_file = os.path.join(self.get_temp_dir(), name)
+        _write(iterate, function, tfrecord_file, 12, 3, {'number': 'int32'},
+               workers)
+
+        return tfrecord_file
+
+    def test_resume(self):
+        tfrecord_file = self._write('ordered.tfrecords', _numbers(12, 6))
+        self.assertFalse(os.path.exists(_info_filename(tfrecord_file)))
+
+        self._write('ordered.tfrecords', _numbers(12))
+        self.assertEqual(_read_numbers(tfrecord_file), list(range(12)))
+
+    def test_resume_unordered(self):
+        with WorkerPool(2) as pool:
+            tfrecord_file = self._write('unordered.tfrecords',
+                                        _numbers(12, 6), (pool, False))
+            self.assertFalse(os.path.exists(_info_filename(tfrecord_file)))
+
+            # The interrupted write is restarted, so that no number is
+            # skipped or written twice.
+            self._write('unordered.tfrecords', _numbers(12), (pool, False))
+            self.assertEqual(sorted(_read_numbers(tfrecord_file)),
+                             list(range(12)))
+
+    def test_resume_iterator(self):
+        dataset = _Numbers(self.get_temp_dir())
+
+        def _image_records(output, stop=None):
+            _, label = output
+            if label == stop:
+                raise KeyboardInterrupt
+
+            return [[{'number': np.array([label])}, label]]
+
+        # Shuffled iterations for training are read in order, too.
+        for shuffle in [False, True]:
+            iterate = partial(iterator, dataset, eval_data=True,
+                              shuffle=shuffle, ordered=True)
+            tfrecord_file = os.path.join(
+                self.get_temp_dir(), 'images_{}.tfrecords'.format(shuffle))
+
+            _write(iterate, partial(_image_records, stop=25), tfrecord_file,
+                   40, 4, {'number': 'int32'})
+            self.assertFalse(os.path.exists(_info_filename(tfrecord_file)))
+
+            _write(iterate, _image_records, tfrecord_file, 40, 4,
+                   {'number': 'int32'})
+            self.assertEqual(_read_numbers(tfrecord_file), list(range(40)))
+
+    def test_incomplete_stage(self):
+        data_dir = os.path.join(self.get_temp_dir(), 'incomplete')
+        dataset = _Numbers(self.get_temp_dir())
+
+        # The interrupted train graph stage isn't silently skipped.
+        with self.assertRaisesRegex(RuntimeError, 'train_graphs.tfrecords'):
+            PatchySan(dataset, _PixelGrapher(stop=25), data_dir,
+                      write_num_epochs=1, num_shards=4, write_batch_size=2)
+
+    def test_distort_graphs(self):
+        data_dir = os.path.join(self.get_temp_dir(), 'distort_graphs')
+        dataset = PatchySan(_Numbers(self.get_temp_dir()), _PixelGrapher(),
+                            data_dir, write_num_epochs=2, num_nodes=1,
+                            neighborhood_size=1, write_num_workers=2,
+                            write_batch_size=2, distort_graphs=True)
+
+        # The train eval records are computed from the train graph stage.
+        self.assertFalse(os.path.exists(_stage_filename(
+            os.path.join(data_dir, 'train_eval.tfrecords'), 'graph')))
+
+        self.assertEqual(dataset.num_examples_per_epoch_for_train, 40)
+        self.assertEqual(dataset.num_examples_per_epoch_for_train_eval, 40)
+
+    def test_error(self):
+        def _failing_records(number):
+            if number == 6:
+                raise ValueError('Failed.')
+
+            return _number_records(number)
+
+        with self.assertRaises(ValueError):
+            self._write('error.tfrecords', _numbers(12),
+                        function=_failing_records)
+
+        tfrecord_file = os.path.join(self.get_temp_dir(), 'error.tfrecords')
+        self.assertFalse(os.path.exists(_info_filename(tfrecord_file)))
+
+        self._write('error.tfrecords', _numbers(12))
+        self.assertEqual(_read_numbers(tfrecord_file), list(range(12)))
@@ -7,13 +7,12 @@ import numpy as np
 import networkx as nx
 from skimage.io import imsave
 from skimage.segmentation import mark_boundaries
-from skimage.measure import regionprops
 from skimage import draw
 
 
 from data import datasets, iterator
 from segmentation.algorithm import generators as segmentations
-from segmentation import adjacencies
+from segmentation import adjacencies, segment_centroids_np
 from patchy import neighborhood_assemblies as neighborhoods
 
 
@@ -45,12 +44,11 @@ def draw_image(image, segmentation, adjacency, neighborhood):
 
     graph = nx.from_numpy_matrix(adjacency)
 
-    segmentation += np.ones_like(segmentation)
-    segments = regionprops(segmentation)
+    centroids = segment_centroids_np(segmentation)
 
     # Save the centroids in the node properties.
-    for (n, data), segment in zip(graph.nodes_iter(data=True), segments):
-        data['centroid'] = segment['centroid']
+    for (n, data), centroid in zip(graph.nodes_iter(data=True), centroids):
+        data['centroid'] = centroid
 
     # Iterate over all edges and draw them.
     for n1, n2, data in graph.edges_iter(data=True):
@@ -1,7 +1,20 @@
-from .feature_extraction import feature_extraction, NUM_FEATURES
+from .feature_extraction import feature_extraction, feature_extraction_np,\
+                                flip_features_np, num_features,\
+                                NUM_FEATURES, FEATURE_GROUPS,\
+                                DEFAULT_FEATURE_GROUPS
 from .adjacency import adjacency_unweighted,\
-                       adjacency_euclidean_distance
+                       adjacency_unweighted_np,\
+                       adjacency_euclidean_distance,\
+                       adjacency_euclidean_distance_np,\
+                       fused_adjacencies,\
+                       fused_adjacencies_np,\
+                       region_adjacency_np,\
+                       ADJACENCIES
+from .centroid import segment_centroids_np
 
 
 adjacencies = {'unweighted': adjacency_unweighted,
                'euclidean_distance': adjacency_euclidean_distance}
+
+adjacencies_np = {'unweighted': adjacency_unweighted_np,
+                  'euclidean_distance': adjacency_euclidean_distance_np}
@@ -1,11 +1,22 @@
 import tensorflow as tf
-import networkx as nx
 import numpy as np
-from skimage.future.graph import RAG
+import scipy.sparse as sp
+
+from timing import timed
+
+from .centroid import segment_centroids_np
 
 
 CONNECTIVITY = 2
 
+# The minimal weight of an edge, so that adjacent segments with identical
+# colors or centroids stay adjacent.
+MIN_WEIGHT = 1e-6
+
+# The names of the adjacencies, which can be computed in a single fused pass.
+ADJACENCIES = ['unweighted', 'euclidean_distance', 'boundary_length',
+               'color_difference']
+
 
 def adjacency_unweighted(segmentation, connectivity=CONNECTIVITY):
     """Computes the adjacency matrix of the Region Adjacency Graph.
@@ -25,16 +36,33 @@ def adjacency_unweighted(segmentation, connectivity=CONNECTIVITY):
     """
 
     def _adjacency(segmentation):
-        graph = RAG(segmentation, connectivity=connectivity)
-
-        # Simply return the unweighted adjacency matrix of the computed graph.
-        return nx.to_numpy_matrix(graph, dtype=np.float32)
+        return adjacency_unweighted_np(segmentation, connectivity)
 
     return tf.py_func(
         _adjacency, [segmentation], tf.float32, stateful=False,
         name='adjacency_unweighted')
 
 
+@timed('adjacency_unweighted')
+def adjacency_unweighted_np(segmentation, connectivity=CONNECTIVITY,
+                            centroids=None, sparse=False):
+    """Computes the adjacency matrix of the Region Adjacency Graph of a numpy
+    segmentation. See `adjacency_unweighted` for a description of the
+    arguments. The centroids are ignored and only accepted to share the
+    signature of all adjacencies.
+
+    Args:
+        sparse: Boolean whether to return a sparse matrix (optional).
+
+    Returns:
+        An adjacent matrix with shape [num_segments, num_segments]. A
+        `scipy.sparse.csr_matrix` if sparse.
+    """
+
+    return _adjacencies_np(segmentation, ['unweighted'],
+                           connectivity=connectivity, sparse=sparse)[0]
+
+
 def adjacency_euclidean_distance(segmentation, connectivity=CONNECTIVITY):
     """Computes the adjacency matrix of the Region Adjacency Graph using the
     euclidian distance between the centroids of adjacent segments.
@@ -56,34 +84,280 @@ def adjacency_euclidean_distance(segmentation, connectivity=CONNECTIVITY):
     """
 
     def _adjacency_euclidean_distance(segmentation):
-        graph = RAG(segmentation, connectivity=connectivity)
-
-        # Initialize the node's data for computing their centroids.
-        for n in graph:
-            graph.node[n].update({'count': 0,
-                                  'centroid': np.zeros((2), dtype=np.float32)})
-
-        # Run through each segmentation pixel and add the pixel's coordinates
-        # to the centroid data.
-        for index in np.ndindex(segmentation.shape):
-            current = segmentation[index]
-            graph.node[current]['count'] += 1
-            graph.node[current]['centroid'] += index
-
-        # Centroid is the sum of all pixel coordinates / pixel count.
-        for n in graph:
-            graph.node[n]['centroid'] = (graph.node[n]['centroid'] /
-                                         graph.node[n]['count'])
-
-        # Run through each edge and calculate the euclidian distance based on
-        # the two node's centroids.
-        for n1, n2, d in graph.edges_iter(data=True):
-            diff = graph.node[n1]['centroid'] - graph.node[n2]['centroid']
-            d['weight'] = np.linalg.norm(diff)
-
-        # Return graph as adjacency matrix.
-        return nx.to_numpy_matrix(graph, dtype=np.float32)
+        return adjacency_euclidean_distance_np(segmentation, connectivity)
 
     return tf.py_func(
         _adjacency_euclidean_distance, [segmentation], tf.float32,
         stateful=False, name='adjacency_euclid_distance')
+
+
+@timed('adjacency_euclidean_distance')
+def adjacency_euclidean_distance_np(segmentation, connectivity=CONNECTIVITY,
+                                    centroids=None, sparse=False):
+    """Computes the adjacency matrix of the Region Adjacency Graph of a numpy
+    segmentation using the euclidian distance between the centroids of
+    adjacent segments. See `adjacency_euclidean_distance` for a description
+    of the arguments. Already computed centroids of the segmentation can be
+    passed to reuse them (optional).
+
+    Args:
+        sparse: Boolean whether to return a sparse matrix (optional).
+
+    Returns:
+        An adjacent matrix with shape [num_segments, num_segments]. A
+        `scipy.sparse.csr_matrix` if sparse.
+    """
+
+    return _adjacencies_np(segmentation, ['euclidean_distance'],
+                           connectivity=connectivity, centroids=centroids,
+                           sparse=sparse)[0]
+
+
+def fused_adjacencies(segmentation, image, names,
+                      connectivity=CONNECTIVITY):
+    """Computes multiple adjacency matrices of the Region Adjacency Graph in
+    a single pass over the segmentation. The adjacent segments are found
+    once and each adjacency only weights their edges differently:
+
+    * `unweighted`: 1 for each edge.
+    * `euclidean_distance`: The euclidian distance between the centroids of
+      the adjacent segments.
+    * `boundary_length`: The number of adjacent pixel pairs on the boundary
+      between the adjacent segments.
+    * `color_difference`: The euclidian distance between the mean colors of
+      the adjacent segments.
+
+    Args:
+        segmentation: The segmentation.
+        image: The corresponding original image.
+        names: A list of the names of the adjacencies to compute.
+        connectivity: Integer. Pixels with a squared distance less than
+          `connectivity` from each other are considered adjacent (optional).
+
+    Returns:
+        The adjacent matrices with shape
+        [num_segments, num_segments, len(names)].
+    """
+
+    def _fused_adjacencies(segmentation, image):
+        return fused_adjacencies_np(segmentation, image, names, connectivity)
+
+    return tf.py_func(
+        _fused_adjacencies, [segmentation, image], tf.float32,
+        stateful=False, name='fused_adjacencies')
+
+
+@timed('fused_adjacencies')
+def fused_adjacencies_np(segmentation, image, names,
+                         connectivity=CONNECTIVITY, centroids=None,
+                         sparse=False):
+    """Computes multiple adjacency matrices of the Region Adjacency Graph of
+    a numpy segmentation in a single pass. See `fused_adjacencies` for a
+    description of the arguments. Already computed centroids of the
+    segmentation can be passed to reuse them (optional).
+
+    Args:
+        sparse: Boolean whether to return sparse matrices (optional).
+
+    Returns:
+        The adjacent matrices with shape
+        [num_segments, num_segments, len(names)]. A list of
+        `scipy.sparse.csr_matrix` if sparse.
+    """
+
+    adjacencies = _adjacencies_np(segmentation, names, image, connectivity,
+                                  centroids, sparse)
+
+    if sparse:
+        return adjacencies
+
+    num_segments = np.unique(segmentation).size
+
+    if len(adjacencies) == 0:
+        return np.zeros((num_segments, num_segments, 0), dtype=np.float32)
+
+    return np.stack(adjacencies, axis=2)
+
+
+def _adjacencies_np(segmentation, names, image=None,
+                    connectivity=CONNECTIVITY, centroids=None, sparse=False):
+    """Computes a list of adjacency matrices sharing the adjacent segments.
+    See `fused_adjacencies_np` for a description of the arguments.
+
+    Returns:
+        A list of adjacent matrices with shape [num_segments, num_segments].
+
+    Raises:
+        ValueError: If an adjacency is unknown or the image is missing for
+          the color difference.
+    """
+
+    num_segments, edges, segments, boundary_lengths = region_adjacency_np(
+        segmentation, connectivity, return_boundary_lengths=True)
+
+    colors = None
+    adjacencies = []
+
+    for name in names:
+        if name == 'unweighted':
+            weights = np.ones((edges.shape[0]), dtype=np.float32)
+
+        elif name == 'euclidean_distance':
+            if centroids is None:
+                centroids = segment_centroids_np(segmentation)
+
+            # Calculate the euclidian distance of each edge based on the two
+            # node's centroids.
+            weights = np.linalg.norm(
+                centroids[edges[:, 0]] - centroids[edges[:, 1]], axis=1)
+
+        elif name == 'boundary_length':
+            weights = boundary_lengths
+
+        elif name == 'color_difference':
+            if image is None:
+                raise ValueError('The color difference needs an image.')
+
+            if colors is None:
+                colors = _mean_colors_np(segments, num_segments, image)
+
+            weights = np.linalg.norm(
+                colors[edges[:, 0]] - colors[edges[:, 1]], axis=1)
+
+        else:
+            raise ValueError('Unknown adjacency {}.'.format(name))
+
+        adjacencies.append(
+            _adjacency_from_edges_np(num_segments, edges, weights, sparse))
+
+    return adjacencies
+
+
+def _mean_colors_np(segments, num_segments, image):
+    """Computes the mean color of each segment.
+
+    Args:
+        segments: The segmentation with the labels replaced by the indices of
+          the segments.
+        num_segments: The number of segments.
+        image: The image with shape [height, width] or
+          [height, width, channels].
+
+    Returns:
+        The mean colors with shape [num_segments, channels].
+    """
+
+    image = np.asarray(image, dtype=np.float64)
+    image = image.reshape(segments.size, -1)
+    segments = segments.ravel()
+
+    counts = np.bincount(segments, minlength=num_segments)
+    counts = np.maximum(counts, 1).astype(np.float64)
+
+    colors = [np.bincount(segments, weights=image[:, i],
+                          minlength=num_segments) / counts
+              for i in range(image.shape[1])]
+
+    return np.stack(colors, axis=1)
+
+
+def region_adjacency_np(segmentation, connectivity=CONNECTIVITY,
+                        return_boundary_lengths=False):
+    """Computes the edges of the Region Adjacency Graph of a numpy
+    segmentation by comparing the segmentation with its shifted copies.
+
+    Args:
+        segmentation: The segmentation.
+        connectivity: Integer. Pixels with a squared distance less than
+          `connectivity` from each other are considered adjacent (optional).
+        return_boundary_lengths: Boolean whether to additionally return the
+          number of adjacent pixel pairs of each edge (optional).
+
+    Returns:
+        num_segments: The number of segments.
+        edges: The unique edges [i, j] with i < j between the indices of the
+          adjacent segments in the order of their labels in the shape
+          [num_edges, 2].
+        segments: The segmentation with the labels replaced by the indices of
+          the segments.
+        boundary_lengths: The number of adjacent pixel pairs of each edge in
+          the shape [num_edges] (if `return_boundary_lengths`).
+    """
+
+    segmentation = np.asarray(segmentation)
+    labels, segments = np.unique(segmentation, return_inverse=True)
+    segments = segments.reshape(segmentation.shape)
+    num_segments = labels.size
+
+    # Half of the neighborhood offsets suffices, because adjacency is
+    # symmetric. Offsets with a city block length up to the connectivity are
+    # adjacent.
+    offsets = [offset for offset in np.ndindex(*([3] * segments.ndim))]
+    offsets = [np.array(offset) - 1 for offset in offsets]
+    offsets = [offset for offset in offsets
+               if 0 < np.abs(offset).sum() <= connectivity and
+               tuple(offset) > tuple(-offset)]
+
+    codes = []
+
+    for offset in offsets:
+        source = tuple(slice(max(-o, 0), segments.shape[i] - max(o, 0))
+                       for i, o in enumerate(offset))
+        target = tuple(slice(max(o, 0), segments.shape[i] - max(-o, 0))
+                       for i, o in enumerate(offset))
+
+        a = segments[source].ravel()
+        b = segments[target].ravel()
+        different = a != b
+        a, b = a[different], b[different]
+
+        # Encode the unordered pairs as single integers.
+        codes.append(np.minimum(a, b).astype(np.int64) * num_segments +
+                     np.maximum(a, b))
+
+    codes = np.concatenate(codes) if len(codes) > 0 else\
+        np.zeros((0), dtype=np.int64)
+    codes, boundary_lengths = np.unique(codes, return_counts=True)
+
+    edges = np.stack([codes // num_segments, codes % num_segments], axis=1)
+
+    if return_boundary_lengths:
+        return num_segments, edges, segments, boundary_lengths
+
+    return num_segments, edges, segments
+
+
+def _adjacency_from_edges_np(num_segments, edges, weights, sparse=False):
+    """Computes the symmetric adjacency matrix of weighted edges. Weights are
+    at least `MIN_WEIGHT`, so that the edges are exactly the nonzero entries
+    and all adjacencies of a segmentation share the same edges.
+
+    Args:
+        num_segments: The number of segments.
+        edges: The unique edges [i, j] with i < j in the shape [num_edges, 2].
+        weights: The non-negative weights of the edges in the shape
+          [num_edges].
+        sparse: Boolean whether to return a sparse matrix (optional).
+
+    Returns:
+        An adjacent matrix with shape [num_segments, num_segments]. A
+        `scipy.sparse.csr_matrix` if sparse.
+    """
+
+    weights = np.maximum(weights, MIN_WEIGHT).astype(np.float32)
+
+    if sparse:
+        rows = np.concatenate([edges[:, 0], edges[:, 1]])
+        cols = np.concatenate([edges[:, 1], edges[:, 0]])
+        adjacency = sp.csr_matrix(
+            (np.concatenate([weights, weights]), (rows, cols)),
+            shape=(num_segments, num_segments), dtype=np.float32)
+        adjacency.sort_indices()
+
+        return adjacency
+
+    adjacency = np.zeros((num_segments, num_segments), dtype=np.float32)
+    adjacency[edges[:, 0], edges[:, 1]] = weights
+    adjacency[edges[:, 1], edges[:, 0]] = weights
+
+    return adjacency
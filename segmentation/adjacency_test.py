@@ -1,9 +1,17 @@
 from __future__ import division
 
+from math import sqrt
+
 import tensorflow as tf
+import networkx as nx
 import numpy as np
+from skimage.future.graph import RAG
 
-from .adjacency import adjacency_unweighted, adjacency_euclidean_distance
+from .adjacency import adjacency_unweighted, adjacency_euclidean_distance,\
+                       adjacency_unweighted_np,\
+                       adjacency_euclidean_distance_np,\
+                       fused_adjacencies_np, region_adjacency_np,\
+                       MIN_WEIGHT
 
 
 class AdjacencyTest(tf.test.TestCase):
@@ -55,3 +63,102 @@ class AdjacencyTest(tf.test.TestCase):
         with self.test_session() as sess:
             adjacency_matrix = adjacency_euclidean_distance(segmentation)
             self.assertAllEqual(adjacency_matrix.eval(), expected)
+
+    def test_region_adjacency(self):
+        segmentation = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 0, 1],
+            [2, 0, 0, 3],
+            [2, 2, 3, 3],
+        ])
+
+        num_segments, edges, _ = region_adjacency_np(segmentation, 1)
+        self.assertEqual(num_segments, 4)
+        self.assertAllEqual(edges, [[0, 1], [0, 2], [0, 3], [1, 3], [2, 3]])
+
+        # Segments 1 and 2 are never diagonally adjacent.
+        _, edges, _ = region_adjacency_np(segmentation, 2)
+        self.assertAllEqual(edges, [[0, 1], [0, 2], [0, 3], [1, 3], [2, 3]])
+
+    def test_equivalence_to_region_adjacency_graph(self):
+        random_state = np.random.RandomState(0)
+
+        for _ in range(10):
+            segmentation = random_state.randint(0, 8, size=(6, 7))
+            segmentation = np.kron(segmentation, np.ones((3, 2), np.int32))
+
+            for connectivity in [1, 2]:
+                graph = RAG(segmentation, connectivity=connectivity)
+                expected = nx.to_numpy_matrix(
+                    graph, nodelist=sorted(graph.nodes()), dtype=np.float32)
+
+                self.assertAllEqual(
+                    adjacency_unweighted_np(segmentation, connectivity),
+                    expected)
+
+    def test_sparse_adjacency(self):
+        random_state = np.random.RandomState(0)
+        segmentation = random_state.randint(0, 8, size=(6, 7))
+        segmentation = np.kron(segmentation, np.ones((3, 2), np.int32))
+
+        for adjacency_np in [adjacency_unweighted_np,
+                             adjacency_euclidean_distance_np]:
+            adjacency = adjacency_np(segmentation, sparse=True)
+
+            self.assertEqual(adjacency.format, 'csr')
+            self.assertAllClose(adjacency.toarray(),
+                                adjacency_np(segmentation))
+
+    def test_fused_adjacencies(self):
+        segmentation = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 0, 1],
+            [2, 0, 0, 3],
+            [2, 2, 3, 3],
+        ])
+
+        image = np.zeros((4, 4, 3), dtype=np.float32)
+        image[segmentation == 1] = [3, 4, 0]
+        image[segmentation == 3] = [0, 0, 2]
+
+        names = ['unweighted', 'euclidean_distance', 'boundary_length',
+                 'color_difference']
+
+        adjacencies = fused_adjacencies_np(segmentation, image, names,
+                                           connectivity=1)
+
+        self.assertEqual(adjacencies.shape, (4, 4, 4))
+        self.assertAllEqual(adjacencies[:, :, 0],
+                            adjacency_unweighted_np(segmentation, 1))
+        self.assertAllClose(adjacencies[:, :, 1],
+                            adjacency_euclidean_distance_np(segmentation, 1))
+
+        self.assertAllEqual(adjacencies[:, :, 2], [
+            [0, 3, 3, 2],
+            [3, 0, 0, 1],
+            [3, 0, 0, 1],
+            [2, 1, 1, 0],
+        ])
+
+        # Segments with identical colors stay adjacent.
+        self.assertAllClose(adjacencies[:, :, 3], [
+            [0, 5, MIN_WEIGHT, 2],
+            [5, 0, 0, sqrt(29)],
+            [MIN_WEIGHT, 0, 0, 2],
+            [2, sqrt(29), 2, 0],
+        ], atol=1e-8)
+
+        sparse = fused_adjacencies_np(segmentation, image, names,
+                                      connectivity=1, sparse=True)
+
+        # All adjacencies share the same edges.
+        for i, adjacency in enumerate(sparse):
+            self.assertAllClose(adjacency.toarray(), adjacencies[:, :, i])
+
+            adjacency.eliminate_zeros()
+            self.assertEqual(adjacency.nnz, sparse[0].nnz)
+            self.assertAllEqual(adjacencies[:, :, i] != 0,
+                                adjacencies[:, :, 0] != 0)
+
+        with self.assertRaises(ValueError):
+            fused_adjacencies_np(segmentation, image, ['unknown'])
@@ -1,22 +1,40 @@
-from .slic import slic, slic_generator, slic_json_generator
-from .slico import slico, slico_generator, slico_json_generator
-from .quickshift import quickshift, quickshift_generator,\
+from .slic import slic, slic_np, slic_generator, slic_json_generator
+from .slico import slico, slico_np, slico_generator, slico_json_generator
+from .quickshift import quickshift, quickshift_np, quickshift_generator,\
                         quickshift_json_generator
-from .felzenszwalb import felzenszwalb, felzenszwalb_generator,\
-                          felzenszwalb_json_generator
+from .felzenszwalb import felzenszwalb, felzenszwalb_np,\
+                          felzenszwalb_generator, felzenszwalb_json_generator
+from .native_slic import native_slic, native_slic_np,\
+                         native_slic_generator, native_slic_json_generator
+from .exact import exact_num_segments, exact_num_segments_np,\
+                   exact_generator, exact_json_generator
+from .scale import scaled_segmentation, scaled_segmentation_np,\
+                   scaled_generator, scaled_json_generator
 
 
 algorithms = {'slic': slic,
               'slico': slico,
               'quickshift': quickshift,
-              'felzenszwalb': felzenszwalb}
+              'felzenszwalb': felzenszwalb,
+              'native_slic': native_slic}
 
 generators = {'slic': slic_generator,
               'slico': slico_generator,
               'quickshift': quickshift_generator,
-              'felzenszwalb': felzenszwalb_generator}
+              'felzenszwalb': felzenszwalb_generator,
+              'native_slic': native_slic_generator}
 
-json_generators = {'slic': slic_json_generator,
-                   'slico': slico_json_generator,
-                   'quickshift': quickshift_json_generator,
-                   'felzenszwalb': felzenszwalb_json_generator}
+
+def _json_generator(json_generator):
+    return exact_json_generator(scaled_json_generator(json_generator))
+
+
+# All json generators accept optional `segmentation_scale` and
+# `exact_num_segments` values. The exact number of segments is enforced on
+# the upsampled segmentation.
+json_generators = {
+    'slic': _json_generator(slic_json_generator),
+    'slico': _json_generator(slico_json_generator),
+    'quickshift': _json_generator(quickshift_json_generator),
+    'felzenszwalb': _json_generator(felzenszwalb_json_generator),
+    'native_slic': _json_generator(native_slic_json_generator)}
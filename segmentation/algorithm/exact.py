@@ -0,0 +1,228 @@
+import heapq
+
+import tensorflow as tf
+import numpy as np
+
+from timing import timed
+
+from ..adjacency import region_adjacency_np
+
+
+def exact_num_segments(segmentation, image, num_segments):
+    """Post-processes a segmentation to have exactly `num_segments` segments.
+    The smallest segments are merged with their most similar adjacent segment
+    as long as there are too many segments and the largest segments are split
+    in halves along their longer side as long as there are too few segments.
+
+    Args:
+        segmentation: The segmentation.
+        image: The corresponding original image.
+        num_segments: The exact number of segments.
+
+    Returns:
+        Integer mask indicating segment labels 0 to `num_segments` - 1.
+    """
+
+    def _exact_num_segments(segmentation, image):
+        return exact_num_segments_np(segmentation, image, num_segments)
+
+    exact = tf.py_func(_exact_num_segments, [segmentation, image], tf.int32,
+                       stateful=False, name='exact_num_segments')
+    exact.set_shape(segmentation.get_shape())
+
+    return exact
+
+
+@timed('exact_num_segments')
+def exact_num_segments_np(segmentation, image, num_segments):
+    """Post-processes a numpy segmentation to have exactly `num_segments`
+    segments. See `exact_num_segments` for a description of the arguments.
+
+    Returns:
+        Integer mask indicating segment labels 0 to `num_segments` - 1.
+
+    Raises:
+        ValueError: If the image has less pixels than segments.
+    """
+
+    if segmentation.size < num_segments:
+        raise ValueError('Can\'t segment {} pixels into {} segments.'
+                         .format(segmentation.size, num_segments))
+
+    segmentation = _merge_segments_np(_relabel_np(segmentation), image,
+                                      num_segments)
+    segmentation = _split_segments_np(_relabel_np(segmentation),
+                                      num_segments)
+
+    return segmentation.astype(np.int32)
+
+
+def exact_generator(segment, num_segments, numpy=False):
+    """Generator to post-process the segmentations of a segmentation
+    algorithm to have exactly `num_segments` segments.
+
+    Args:
+        segment: The segmentation algorithm that takes a single input image.
+        num_segments: The exact number of segments.
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
+
+    Returns:
+        Segmentation algorithm that takes a single input image.
+    """
+
+    exact = exact_num_segments_np if numpy else exact_num_segments
+
+    def _generator(image):
+        return exact(segment(image), image, num_segments)
+
+    return _generator
+
+
+def exact_json_generator(json_generator):
+    """Extends a json generator of a segmentation algorithm by the optional
+    `exact_num_segments` value, which post-processes the segmentations to
+    have exactly this number of segments.
+
+    Args:
+        json_generator: The json generator of a segmentation algorithm.
+
+    Returns:
+        A json generator.
+    """
+
+    def _json_generator(config, numpy=False):
+        segment = json_generator(config, numpy)
+
+        if config.get('exact_num_segments') is None:
+            return segment
+
+        return exact_generator(segment, config['exact_num_segments'], numpy)
+
+    return _json_generator
+
+
+def _relabel_np(segmentation):
+    """Relabels a segmentation with consecutive labels in the order of the
+    original labels.
+
+    Args:
+        segmentation: The segmentation.
+
+    Returns:
+        The segmentation with labels 0 to n - 1.
+    """
+
+    _, relabeled = np.unique(segmentation, return_inverse=True)
+
+    return relabeled.reshape(segmentation.shape)
+
+
+def _merge_segments_np(segmentation, image, num_segments):
+    """Merges the smallest segment with its adjacent segment of the most
+    similar mean color until `num_segments` segments remain.
+
+    Args:
+        segmentation: The segmentation with labels 0 to n - 1.
+        image: The corresponding original image.
+        num_segments: The number of segments to keep.
+
+    Returns:
+        The merged segmentation with labels between 0 and n - 1.
+    """
+
+    count, edges, _ = region_adjacency_np(segmentation)
+
+    if count <= num_segments:
+        return segmentation
+
+    flat = segmentation.ravel()
+    colors = image.reshape(flat.size, -1).astype(np.float64)
+
+    sizes = np.bincount(flat, minlength=count).astype(np.int64)
+    sums = np.stack([np.bincount(flat, weights=colors[:, c], minlength=count)
+                     for c in range(colors.shape[1])], axis=1)
+
+    neighbors = [set() for _ in range(count)]
+    for i, j in edges:
+        neighbors[i].add(j)
+        neighbors[j].add(i)
+
+    # Each segment maps to the segment it was merged into.
+    parents = np.arange(count)
+
+    # Heap of the sizes of the remaining segments. Entries of merged or
+    # grown segments are outdated and skipped.
+    heap = [(sizes[i], i) for i in range(count)]
+    heapq.heapify(heap)
+
+    while count > num_segments and len(heap) > 0:
+        size, i = heapq.heappop(heap)
+
+        if parents[i] != i or size != sizes[i] or len(neighbors[i]) == 0:
+            continue
+
+        # Merge with the adjacent segment of the most similar mean color and
+        # prefer lower labels on ties.
+        color = sums[i] / sizes[i]
+        j = min(neighbors[i], key=lambda n: (
+            np.sum((sums[n] / sizes[n] - color) ** 2), n))
+
+        parents[i] = j
+        sizes[j] += sizes[i]
+        sums[j] += sums[i]
+
+        for n in neighbors[i]:
+            neighbors[n].discard(i)
+            if n != j:
+                neighbors[n].add(j)
+                neighbors[j].add(n)
+
+        neighbors[i] = set()
+        count -= 1
+
+        heapq.heappush(heap, (sizes[j], j))
+
+    # Resolve the chains of merges to their remaining segment.
+    while True:
+        resolved = parents[parents]
+        if np.array_equal(resolved, parents):
+            break
+        parents = resolved
+
+    return parents[segmentation]
+
+
+def _split_segments_np(segmentation, num_segments):
+    """Splits the largest segment in halves along its longer side until there
+    are `num_segments` segments.
+
+    Args:
+        segmentation: The segmentation with labels 0 to n - 1.
+        num_segments: The number of segments to create.
+
+    Returns:
+        The split segmentation.
+    """
+
+    segmentation = segmentation.copy()
+    sizes = np.bincount(segmentation.ravel()).tolist()
+
+    while len(sizes) < num_segments:
+        label = int(np.argmax(sizes))
+        rows, cols = np.nonzero(segmentation == label)
+
+        # Split along the axis with the larger extent at the median
+        # coordinate, so that both halves have about the same size.
+        if rows.max() - rows.min() >= cols.max() - cols.min():
+            order = np.lexsort((cols, rows))
+        else:
+            order = np.lexsort((rows, cols))
+
+        half = order[rows.size // 2:]
+        segmentation[rows[half], cols[half]] = len(sizes)
+
+        sizes[label] = rows.size - half.size
+        sizes.append(half.size)
+
+    return segmentation
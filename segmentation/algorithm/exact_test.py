@@ -0,0 +1,62 @@
+import tensorflow as tf
+import numpy as np
+
+from .exact import exact_num_segments_np
+
+
+class ExactTest(tf.test.TestCase):
+
+    def test_merge_segments(self):
+        segmentation = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 1, 1],
+            [2, 2, 3, 4],
+            [2, 2, 3, 4],
+        ])
+
+        image = np.zeros((4, 4, 3), dtype=np.float32)
+        image[0:2, 0:2] = 128
+        image[:, 3] = 255
+
+        # The smallest segments 3 and 4 are merged with their most similar
+        # neighbors 2 and 1.
+        expected = [
+            [0, 0, 1, 1],
+            [0, 0, 1, 1],
+            [2, 2, 2, 1],
+            [2, 2, 2, 1],
+        ]
+
+        self.assertAllEqual(
+            exact_num_segments_np(segmentation, image, 3), expected)
+
+    def test_split_segments(self):
+        segmentation = np.array([
+            [0, 0, 0, 0],
+            [0, 0, 0, 0],
+            [1, 1, 1, 1],
+        ])
+
+        image = np.zeros((3, 4, 3), dtype=np.float32)
+
+        # The largest segment is split along its longer side.
+        expected = [
+            [0, 0, 2, 2],
+            [0, 0, 2, 2],
+            [1, 1, 1, 1],
+        ]
+
+        self.assertAllEqual(
+            exact_num_segments_np(segmentation, image, 3), expected)
+
+    def test_exact_num_segments(self):
+        random_state = np.random.RandomState(0)
+        segmentation = random_state.randint(0, 20, size=(12, 12))
+        image = random_state.randint(0, 256, size=(12, 12, 3))
+
+        for num_segments in [1, 10, 50, 144]:
+            exact = exact_num_segments_np(segmentation, image, num_segments)
+            self.assertAllEqual(np.unique(exact), np.arange(num_segments))
+
+        with self.assertRaises(ValueError):
+            exact_num_segments_np(segmentation, image, 145)
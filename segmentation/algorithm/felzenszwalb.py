@@ -2,6 +2,8 @@ import tensorflow as tf
 import numpy as np
 from skimage.segmentation import felzenszwalb as skimage_felzenszwalb
 
+from timing import timed
+
 
 SCALE = 1.0
 SIGMA = 0.0
@@ -25,14 +27,29 @@ def felzenszwalb(image, scale=SCALE, sigma=SIGMA, min_size=MIN_SIZE):
     image = tf.cast(image, tf.uint8)
 
     def _felzenszwalb(image):
-        segmentation = skimage_felzenszwalb(image, scale, sigma, min_size)
-        return segmentation.astype(np.int32)
+        return felzenszwalb_np(image, scale, sigma, min_size)
 
     return tf.py_func(_felzenszwalb, [image], tf.int32, stateful=False,
                       name='felzenszwalb')
 
 
-def felzenszwalb_generator(scale=SCALE, sigma=SIGMA, min_size=MIN_SIZE):
+@timed('felzenszwalb')
+def felzenszwalb_np(image, scale=SCALE, sigma=SIGMA, min_size=MIN_SIZE):
+    """Computes Felsenszwalb's efficient graph based image segmentation on a
+    numpy image. See `felzenszwalb` for a description of the arguments.
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    image = image.astype(np.uint8)
+
+    segmentation = skimage_felzenszwalb(image, scale, sigma, min_size)
+    return segmentation.astype(np.int32)
+
+
+def felzenszwalb_generator(scale=SCALE, sigma=SIGMA, min_size=MIN_SIZE,
+                           numpy=False):
     """Generator to compute Felsenszwalb's efficient graph based image
     segmentation.
 
@@ -41,24 +58,30 @@ def felzenszwalb_generator(scale=SCALE, sigma=SIGMA, min_size=MIN_SIZE):
         sigma: Width of Gaussian kernel used in preprocessing (optional).
         min_size: Minimum component size. Enforced using postprocessing
           (optional).
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
 
     Returns:
         Segmentation algorithm that takes a single input image.
     """
 
+    segment = felzenszwalb_np if numpy else felzenszwalb
+
     def _generator(image):
-        return felzenszwalb(image, scale, sigma, min_size)
+        return segment(image, scale, sigma, min_size)
 
     return _generator
 
 
-def felzenszwalb_json_generator(config):
+def felzenszwalb_json_generator(config, numpy=False):
     """Generator to compute Felsenszwalb's efficient graph based image
     segmentation based on a json object.
 
     Args:
         config: A configuration object with sensible defaults for
           missing values.
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
 
     Returns:
         Segmentation algorithm that takes a single input image.
@@ -66,4 +89,5 @@ def felzenszwalb_json_generator(config):
 
     return felzenszwalb_generator(config.get('scale', SCALE),
                                   config.get('sigma', SIGMA),
-                                  config.get('min_size', MIN_SIZE))
+                                  config.get('min_size', MIN_SIZE),
+                                  numpy)
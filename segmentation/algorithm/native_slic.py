@@ -0,0 +1,592 @@
+from __future__ import division
+
+import tensorflow as tf
+import numpy as np
+
+from timing import timed
+
+
+NUM_SEGMENTS = 400
+COMPACTNESS = 30.0
+MAX_ITERATIONS = 10
+MIN_SIZE_FACTOR = 0.5
+CONNECTIVITY = True
+
+# sRGB to XYZ conversion matrix and XYZ coordinates of the D65 white point.
+RGB_TO_XYZ = np.array([[0.412453, 0.357580, 0.180423],
+                       [0.212671, 0.715160, 0.072169],
+                       [0.019334, 0.119193, 0.950227]], dtype=np.float32)
+WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+# Offsets of the 3x3 neighboring grid cells whose centers are candidates for
+# the assignment of a pixel.
+CELL_OFFSETS = [(dy, dx) for dy in [-1, 0, 1] for dx in [-1, 0, 1]]
+
+# Offsets of the 4-connected neighboring pixels.
+PIXEL_OFFSETS = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+
+
+def native_slic(image, num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
+                max_iterations=MAX_ITERATIONS,
+                min_size_factor=MIN_SIZE_FACTOR,
+                enforce_connectivity=CONNECTIVITY):
+    """Segments an image using k-means clustering in Color-(x,y,z) space
+    built from native TensorFlow operations only. In contrast to `slic`, the
+    segmentation runs without `py_func` and therefore in parallel to other
+    operations of the input pipeline.
+
+    The cluster centers are initialized on a regular grid and each pixel is
+    only compared to the centers of its 3x3 neighboring grid cells in each of
+    the `max_iterations` iterations. Connectivity is enforced by labeling the
+    connected components of the clusters and merging components smaller
+    than the minimum segment size with an adjacent component.
+
+    Args:
+        image: The image.
+        num_segments: The (approiximate) number of segments in the segmented
+          output image (optional).
+        compactness: Balances color-space proximity and image-space-proximity.
+          Higher values give more weight to image-space proximity (optional).
+        max_iterations: Number of iterations of k-means (optional).
+        min_size_factor: Proportion of the minimum segment size to be removed
+          with respect to the supposed segment size
+          `width*height/num_segments` (optional).
+        enforce_connectivitiy: Whether the generated segments are connected or
+          not (optional).
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    with tf.name_scope('native_slic', values=[image]):
+        shape = tf.shape(image)
+        height, width = shape[0], shape[1]
+        num_pixels = height * width
+
+        step = tf.sqrt(tf.cast(num_pixels, tf.float32) / num_segments)
+        grid_height = _grid_size(height, step)
+        grid_width = _grid_size(width, step)
+
+        # Build the flattened pixel features [L, a, b, y, x].
+        zeros = tf.zeros_like(tf.cast(image[:, :, 0], tf.int32))
+        rows = zeros + tf.expand_dims(tf.range(0, height), 1)
+        cols = zeros + tf.expand_dims(tf.range(0, width), 0)
+        rows = tf.reshape(rows, [-1])
+        cols = tf.reshape(cols, [-1])
+
+        lab = tf.reshape(_rgb_to_lab(image), [-1, 3])
+        features = tf.concat(1, [lab,
+                                 tf.expand_dims(tf.cast(rows, tf.float32), 1),
+                                 tf.expand_dims(tf.cast(cols, tf.float32), 1)])
+
+        # Place the initial centers in the middle of the grid cells.
+        num_cells = grid_height * grid_width
+        cells = tf.range(0, num_cells)
+        center_rows = ((cells // grid_width) * 2 + 1) * height //\
+            (2 * grid_height)
+        center_cols = ((cells % grid_width) * 2 + 1) * width //\
+            (2 * grid_width)
+        centers = tf.gather(features, center_rows * width + center_cols)
+
+        candidates, valid = _candidates(rows, cols, height, width,
+                                        grid_height, grid_width)
+
+        ratio = tf.square(compactness / step)
+        weights = tf.concat(0, [tf.ones([3]), tf.ones([2]) * ratio])
+
+        for _ in range(max_iterations):
+            clusters = _assign(features, centers, candidates, valid, weights)
+
+            counts = tf.unsorted_segment_sum(
+                tf.ones_like(clusters, dtype=tf.float32), clusters, num_cells)
+            sums = tf.unsorted_segment_sum(features, clusters, num_cells)
+
+            # Keep the centers of clusters without pixels.
+            centers = tf.where(
+                counts > 0,
+                sums / tf.expand_dims(tf.maximum(counts, 1), 1),
+                centers)
+
+        clusters = _assign(features, centers, candidates, valid, weights)
+        clusters = tf.reshape(clusters, [height, width])
+
+        if enforce_connectivity:
+            min_size = tf.cast(min_size_factor * tf.cast(num_pixels,
+                               tf.float32) / num_segments, tf.int32)
+            clusters = _enforce_connectivity(clusters, min_size)
+
+        # Relabel the segments consecutively in scanline order.
+        _, segmentation = tf.unique(tf.reshape(clusters, [-1]))
+        segmentation = tf.reshape(segmentation, [height, width])
+        segmentation.set_shape(image.get_shape()[:2])
+
+    return segmentation
+
+
+@timed('native_slic')
+def native_slic_np(image, num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
+                   max_iterations=MAX_ITERATIONS,
+                   min_size_factor=MIN_SIZE_FACTOR,
+                   enforce_connectivity=CONNECTIVITY):
+    """Segments a numpy image using k-means clustering in Color-(x,y,z) space
+    with the same algorithm as `native_slic`. See `native_slic` for a
+    description of the arguments.
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    height, width = image.shape[:2]
+    num_pixels = height * width
+
+    step = np.sqrt(np.float32(num_pixels) / num_segments)
+    grid_height = max(int(np.round(height / step)), 1)
+    grid_width = max(int(np.round(width / step)), 1)
+
+    rows, cols = np.indices((height, width))
+    rows = rows.ravel()
+    cols = cols.ravel()
+
+    lab = _rgb_to_lab_np(image).reshape(-1, 3)
+    features = np.concatenate([lab, rows[:, None], cols[:, None]],
+                              axis=1).astype(np.float32)
+
+    num_cells = grid_height * grid_width
+    cells = np.arange(num_cells)
+    center_rows = ((cells // grid_width) * 2 + 1) * height //\
+        (2 * grid_height)
+    center_cols = ((cells % grid_width) * 2 + 1) * width //\
+        (2 * grid_width)
+    centers = features[center_rows * width + center_cols]
+
+    candidates, valid = _candidates_np(rows, cols, height, width,
+                                       grid_height, grid_width)
+
+    ratio = np.square(compactness / step)
+    weights = np.array([1, 1, 1, ratio, ratio], dtype=np.float32)
+
+    for _ in range(max_iterations):
+        clusters = _assign_np(features, centers, candidates, valid, weights)
+
+        counts = np.bincount(clusters, minlength=num_cells)
+        sums = np.stack([np.bincount(clusters, weights=features[:, i],
+                                     minlength=num_cells)
+                         for i in range(features.shape[1])], axis=1)
+
+        nonempty = counts > 0
+        centers = centers.copy()
+        centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+    clusters = _assign_np(features, centers, candidates, valid, weights)
+    clusters = clusters.reshape(height, width)
+
+    if enforce_connectivity:
+        min_size = int(min_size_factor * num_pixels / num_segments)
+        clusters = _enforce_connectivity_np(clusters, min_size)
+
+    # Relabel the segments consecutively in scanline order.
+    flat = clusters.ravel()
+    _, first, inverse = np.unique(flat, return_index=True,
+                                  return_inverse=True)
+    order = np.empty_like(first)
+    order[np.argsort(first)] = np.arange(first.size)
+
+    return order[inverse].reshape(height, width).astype(np.int32)
+
+
+def native_slic_generator(num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
+                          max_iterations=MAX_ITERATIONS,
+                          min_size_factor=MIN_SIZE_FACTOR,
+                          enforce_connectivity=CONNECTIVITY, numpy=False):
+    """Generator to segment an image using k-means clustering in
+    Color-(x,y,z) space built from native TensorFlow operations.
+
+    Args:
+        num_segments: The (approiximate) number of segments in the segmented
+          output image (optional).
+        compactness: Balances color-space proximity and image-space-proximity.
+          Higher values give more weight to image-space proximity (optional).
+        max_iterations: Number of iterations of k-means (optional).
+        min_size_factor: Proportion of the minimum segment size to be removed
+          with respect to the supposed segment size
+          `width*height/num_segments` (optional).
+        enforce_connectivitiy: Whether the generated segments are connected or
+          not (optional).
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
+
+    Returns:
+        Segmentation algorithm that takes a single input image.
+    """
+
+    segment = native_slic_np if numpy else native_slic
+
+    def _generator(image):
+        return segment(image, num_segments, compactness, max_iterations,
+                       min_size_factor, enforce_connectivity)
+
+    return _generator
+
+
+def native_slic_json_generator(config, numpy=False):
+    """Generator to segment an image using k-means clustering in
+    Color-(x,y,z) space built from native TensorFlow operations based on a
+    json object.
+
+    Args:
+        config: A configuration object with sensible defaults for
+          missing values.
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
+
+    Returns:
+        Segmentation algorithm that takes a single input image.
+    """
+
+    return native_slic_generator(
+        config.get('num_segments', NUM_SEGMENTS),
+        config.get('compactness', COMPACTNESS),
+        config.get('max_iterations', MAX_ITERATIONS),
+        config.get('min_size_factor', MIN_SIZE_FACTOR),
+        config.get('enforce_connectivity', CONNECTIVITY),
+        numpy)
+
+
+def _grid_size(size, step):
+    """Computes the number of grid cells along an image side.
+
+    Args:
+        size: A scalar int32 tensor.
+        step: The scalar float32 grid step.
+
+    Returns:
+        A scalar int32 tensor.
+    """
+
+    size = tf.round(tf.cast(size, tf.float32) / step)
+
+    return tf.maximum(tf.cast(size, tf.int32), 1)
+
+
+def _rgb_to_lab(image):
+    """Converts a RGB image with values between 0 and 255 to the CIE-Lab
+    color space.
+
+    Args:
+        image: The image with shape [height, width, 3].
+
+    Returns:
+        A float32 tensor with shape [height, width, 3].
+    """
+
+    rgb = tf.cast(image, tf.float32) / 255
+    rgb = tf.where(rgb > 0.04045, tf.pow((rgb + 0.055) / 1.055, 2.4),
+                   rgb / 12.92)
+
+    xyz = tf.matmul(tf.reshape(rgb, [-1, 3]), RGB_TO_XYZ.T) / WHITE
+    xyz = tf.where(xyz > 0.008856, tf.pow(tf.maximum(xyz, 0.008856), 1 / 3),
+                   7.787 * xyz + 16 / 116)
+
+    x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    lab = tf.concat(1, [tf.expand_dims(116 * y - 16, 1),
+                        tf.expand_dims(500 * (x - y), 1),
+                        tf.expand_dims(200 * (y - z), 1)])
+
+    return tf.reshape(lab, tf.shape(image))
+
+
+def _rgb_to_lab_np(image):
+    """Converts a numpy RGB image to the CIE-Lab color space. See
+    `_rgb_to_lab` for a description of the arguments.
+
+    Returns:
+        A float32 numpy array with shape [height, width, 3].
+    """
+
+    rgb = image.astype(np.float32) / 255
+    rgb = np.where(rgb > 0.04045, np.power((rgb + 0.055) / 1.055, 2.4),
+                   rgb / 12.92)
+
+    xyz = np.dot(rgb.reshape(-1, 3), RGB_TO_XYZ.T) / WHITE
+    xyz = np.where(xyz > 0.008856,
+                   np.power(np.maximum(xyz, 0.008856), 1 / 3),
+                   7.787 * xyz + 16 / 116)
+
+    x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    lab = np.stack([116 * y - 16, 500 * (x - y), 200 * (y - z)], axis=1)
+
+    return lab.reshape(image.shape).astype(np.float32)
+
+
+def _candidates(rows, cols, height, width, grid_height, grid_width):
+    """Computes the candidate centers of each pixel, which are the centers of
+    the 3x3 neighboring grid cells.
+
+    Args:
+        rows: The int32 rows of the flattened pixels.
+        cols: The int32 columns of the flattened pixels.
+        height: The image height.
+        width: The image width.
+        grid_height: The number of grid cells along the height.
+        grid_width: The number of grid cells along the width.
+
+    Returns:
+        An int32 tensor with shape [num_pixels, 9] holding the candidate
+        centers and a boolean tensor with the same shape indicating whether
+        the candidate lies inside the grid.
+    """
+
+    cell_rows = rows * grid_height // height
+    cell_cols = cols * grid_width // width
+
+    candidates = []
+    valid = []
+    for dy, dx in CELL_OFFSETS:
+        r = cell_rows + dy
+        c = cell_cols + dx
+
+        inside = tf.logical_and(
+            tf.logical_and(r >= 0, r < grid_height),
+            tf.logical_and(c >= 0, c < grid_width))
+
+        r = tf.minimum(tf.maximum(r, 0), grid_height - 1)
+        c = tf.minimum(tf.maximum(c, 0), grid_width - 1)
+
+        candidates.append(tf.expand_dims(r * grid_width + c, 1))
+        valid.append(tf.expand_dims(inside, 1))
+
+    return tf.concat(1, candidates), tf.concat(1, valid)
+
+
+def _candidates_np(rows, cols, height, width, grid_height, grid_width):
+    """Computes the candidate centers of each numpy pixel. See `_candidates`
+    for a description of the arguments.
+
+    Returns:
+        A numpy array with shape [num_pixels, 9] holding the candidate
+        centers and a boolean numpy array with the same shape indicating
+        whether the candidate lies inside the grid.
+    """
+
+    cell_rows = rows * grid_height // height
+    cell_cols = cols * grid_width // width
+
+    offsets = np.array(CELL_OFFSETS)
+    r = cell_rows[:, None] + offsets[:, 0]
+    c = cell_cols[:, None] + offsets[:, 1]
+
+    valid = (r >= 0) & (r < grid_height) & (c >= 0) & (c < grid_width)
+
+    r = np.clip(r, 0, grid_height - 1)
+    c = np.clip(c, 0, grid_width - 1)
+
+    return r * grid_width + c, valid
+
+
+def _assign(features, centers, candidates, valid, weights):
+    """Assigns each pixel to its nearest candidate center.
+
+    Args:
+        features: The float32 pixel features with shape [num_pixels, 5].
+        centers: The float32 center features with shape [num_centers, 5].
+        candidates: The int32 candidate centers with shape [num_pixels, 9].
+        valid: The boolean validity of the candidates with shape
+          [num_pixels, 9].
+        weights: The float32 weights of the features with shape [5].
+
+    Returns:
+        An int32 tensor with shape [num_pixels] holding the assigned centers.
+    """
+
+    differences = tf.gather(centers, candidates) - tf.expand_dims(features, 1)
+    distances = tf.reduce_sum(tf.square(differences) * weights, 2)
+    distances = tf.where(valid, distances,
+                         tf.ones_like(distances) * np.inf)
+
+    nearest = tf.cast(tf.argmin(distances, 1), tf.int32)
+    nearest = tf.one_hot(nearest, len(CELL_OFFSETS), dtype=tf.int32)
+
+    return tf.reduce_sum(candidates * nearest, 1)
+
+
+def _assign_np(features, centers, candidates, valid, weights):
+    """Assigns each numpy pixel to its nearest candidate center. See `_assign`
+    for a description of the arguments.
+
+    Returns:
+        A numpy array with shape [num_pixels] holding the assigned centers.
+    """
+
+    differences = centers[candidates] - features[:, None, :]
+    distances = np.sum(np.square(differences) * weights, axis=2)
+    distances[~valid] = np.inf
+
+    nearest = np.argmin(distances, axis=1)
+
+    return candidates[np.arange(candidates.shape[0]), nearest]
+
+
+def _neighbor(x, dy, dx, fill):
+    """Shifts a two-dimensional tensor so that each element holds the value
+    of its neighbor at offset (`dy`, `dx`). Elements without a neighbor are
+    filled with `fill`.
+
+    Args:
+        x: The tensor with shape [height, width].
+        dy: The row offset -1, 0 or 1.
+        dx: The column offset -1, 0 or 1.
+        fill: The value of elements without neighbor.
+
+    Returns:
+        A tensor with the shape of `x`.
+    """
+
+    if dy == 1:
+        x = tf.concat(0, [x[1:], tf.zeros_like(x[:1]) + fill])
+    elif dy == -1:
+        x = tf.concat(0, [tf.zeros_like(x[:1]) + fill, x[:-1]])
+
+    if dx == 1:
+        x = tf.concat(1, [x[:, 1:], tf.zeros_like(x[:, :1]) + fill])
+    elif dx == -1:
+        x = tf.concat(1, [tf.zeros_like(x[:, :1]) + fill, x[:, :-1]])
+
+    return x
+
+
+def _neighbor_np(x, dy, dx, fill):
+    """Shifts a two-dimensional numpy array so that each element holds the
+    value of its neighbor. See `_neighbor` for a description of the
+    arguments.
+
+    Returns:
+        A numpy array with the shape of `x`.
+    """
+
+    height, width = x.shape
+    shifted = np.full_like(x, fill)
+
+    shifted[max(-dy, 0):height - max(dy, 0), max(-dx, 0):width - max(dx, 0)] =\
+        x[max(dy, 0):height - max(-dy, 0), max(dx, 0):width - max(-dx, 0)]
+
+    return shifted
+
+
+def _enforce_connectivity(clusters, min_size):
+    """Splits the clusters into their 4-connected components and merges
+    components smaller than `min_size` with an adjacent larger component.
+
+    Args:
+        clusters: The int32 clusters with shape [height, width].
+        min_size: The minimum size of a component.
+
+    Returns:
+        An int32 tensor with shape [height, width] holding the component
+        labels.
+    """
+
+    shape = tf.shape(clusters)
+    num_pixels = shape[0] * shape[1]
+
+    # Label each component with its smallest pixel index by propagating the
+    # minimum over equally clustered neighbors. Pointer jumping along the
+    # labels speeds up the propagation along long components.
+    def _propagate(labels, _):
+        propagated = labels
+        for dy, dx in PIXEL_OFFSETS:
+            same = tf.equal(_neighbor(clusters, dy, dx, -1), clusters)
+            propagated = tf.minimum(propagated, tf.where(
+                same, _neighbor(labels, dy, dx, 0), labels))
+
+        propagated = tf.reshape(tf.gather(tf.reshape(propagated, [-1]),
+                                          propagated), shape)
+
+        return propagated, tf.reduce_any(tf.not_equal(propagated, labels))
+
+    labels = tf.reshape(tf.range(0, num_pixels), shape)
+    labels, _ = tf.while_loop(lambda _, changed: changed, _propagate,
+                              [labels, tf.constant(True)], back_prop=False)
+
+    sizes = tf.unsorted_segment_sum(tf.ones_like(labels),
+                                    labels, num_pixels)
+    small = tf.gather(sizes, labels) < min_size
+
+    # Keep the largest component if all components are too small.
+    largest = tf.cast(tf.argmax(sizes, 0), tf.int32)
+    small = tf.logical_and(small, tf.logical_or(
+        tf.not_equal(labels, largest),
+        tf.reduce_any(tf.logical_not(small))))
+
+    # Grow the adjacent larger components into the small components until
+    # no pixel changes anymore.
+    def _merge(labels, small, _):
+        merged = labels
+        merging = tf.cast(tf.zeros_like(labels), tf.bool)
+        for dy, dx in PIXEL_OFFSETS:
+            neighbor_labels = _neighbor(labels, dy, dx, 0)
+            neighbor_large = tf.logical_not(_neighbor(
+                tf.cast(small, tf.int32), dy, dx, 1) > 0)
+
+            adopt = tf.logical_and(tf.logical_and(small, neighbor_large),
+                                   tf.logical_not(merging))
+            merged = tf.where(adopt, neighbor_labels, merged)
+            merging = tf.logical_or(merging, adopt)
+
+        return (merged, tf.logical_and(small, tf.logical_not(merging)),
+                tf.reduce_any(merging))
+
+    labels, _, _ = tf.while_loop(lambda _, __, changed: changed, _merge,
+                                 [labels, small, tf.constant(True)],
+                                 back_prop=False)
+
+    return labels
+
+
+def _enforce_connectivity_np(clusters, min_size):
+    """Splits the numpy clusters into their 4-connected components and merges
+    small components. See `_enforce_connectivity` for a description of the
+    arguments.
+
+    Returns:
+        A numpy array with shape [height, width] holding the component labels.
+    """
+
+    shape = clusters.shape
+    labels = np.arange(clusters.size).reshape(shape)
+
+    changed = True
+    while changed:
+        propagated = labels
+        for dy, dx in PIXEL_OFFSETS:
+            same = _neighbor_np(clusters, dy, dx, -1) == clusters
+            propagated = np.minimum(propagated, np.where(
+                same, _neighbor_np(labels, dy, dx, 0), labels))
+
+        propagated = propagated.ravel()[propagated]
+        changed = (propagated != labels).any()
+        labels = propagated
+
+    sizes = np.bincount(labels.ravel(), minlength=clusters.size)
+    small = sizes[labels] < min_size
+
+    # Keep the largest component if all components are too small.
+    if small.all():
+        small &= labels != np.argmax(sizes)
+
+    changed = True
+    while changed:
+        merged = labels.copy()
+        merging = np.zeros_like(small)
+        for dy, dx in PIXEL_OFFSETS:
+            neighbor_labels = _neighbor_np(labels, dy, dx, 0)
+            neighbor_large = ~_neighbor_np(small, dy, dx, True)
+
+            adopt = small & neighbor_large & ~merging
+            merged[adopt] = neighbor_labels[adopt]
+            merging |= adopt
+
+        labels = merged
+        small = small & ~merging
+        changed = merging.any()
+
+    return labels
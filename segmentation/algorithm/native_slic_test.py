@@ -0,0 +1,63 @@
+import tensorflow as tf
+import numpy as np
+from scipy.ndimage import label
+
+from .native_slic import native_slic, native_slic_np
+
+
+class NativeSlicTest(tf.test.TestCase):
+
+    def _image(self):
+        return np.array([
+            [[255, 255, 255], [255, 255, 255], [0, 0, 0], [0, 0, 0]],
+            [[255, 255, 255], [255, 255, 255], [0, 0, 0], [0, 0, 0]],
+            [[0, 0, 0], [0, 0, 0], [255, 255, 255], [255, 255, 255]],
+            [[0, 0, 0], [0, 0, 0], [255, 255, 255], [255, 255, 255]],
+        ], dtype=np.uint8)
+
+    def test_native_slic(self):
+        expected = [
+            [0, 0, 1, 1],
+            [0, 0, 1, 1],
+            [2, 2, 3, 3],
+            [2, 2, 3, 3],
+        ]
+
+        with self.test_session() as sess:
+            segmentation = native_slic(tf.constant(self._image()), 4)
+            self.assertAllEqual(segmentation.eval(), expected)
+
+        self.assertAllEqual(native_slic_np(self._image(), 4), expected)
+
+    def _noisy_image(self):
+        random_state = np.random.RandomState(0)
+
+        # Blocks of random colors with additional noise.
+        colors = random_state.randint(0, 256, (4, 4, 3))
+        image = np.repeat(np.repeat(colors, 6, 0), 8, 1)
+        image += random_state.randint(-10, 11, image.shape)
+
+        return np.clip(image, 0, 255).astype(np.uint8)
+
+    def test_native_slic_equals_numpy(self):
+        image = self._noisy_image()
+
+        with self.test_session() as sess:
+            segmentation = native_slic(tf.constant(image), 20).eval()
+
+        expected = native_slic_np(image, 20)
+        self.assertAllEqual(segmentation, expected)
+
+    def test_connectivity(self):
+        segmentation = native_slic_np(self._noisy_image(), 20)
+
+        num_segments = segmentation.max() + 1
+        self.assertAllEqual(np.unique(segmentation), np.arange(num_segments))
+
+        for i in range(num_segments):
+            _, num_components = label(segmentation == i)
+            self.assertEqual(num_components, 1)
+
+        # All segments are at least half as large as the supposed size.
+        self.assertTrue(np.bincount(segmentation.ravel()).min() >=
+                        int(0.5 * 24 * 32 / 20))
@@ -2,6 +2,8 @@ import tensorflow as tf
 import numpy as np
 from skimage.segmentation import quickshift as skimage_quickshift
 
+from timing import timed
+
 
 RATIO = 1.0
 KERNEL_SIZE = 5
@@ -31,17 +33,33 @@ def quickshift(image, ratio=RATIO, kernel_size=KERNEL_SIZE,
     image = tf.cast(image, tf.uint8)
 
     def _quickshift(image):
-        segmentation = skimage_quickshift(image, ratio, kernel_size,
-                                          max_distance, sigma=sigma)
-        return segmentation.astype(np.int32)
+        return quickshift_np(image, ratio, kernel_size, max_distance, sigma)
 
     # TODO quickshift is stateful?
     return tf.py_func(_quickshift, [image], tf.int32, stateful=True,
                       name='quickshift')
 
 
+@timed('quickshift')
+def quickshift_np(image, ratio=RATIO, kernel_size=KERNEL_SIZE,
+                  max_distance=MAX_DISTANCE, sigma=SIGMA):
+    """Segments a numpy image using quickshift clustering in Color-(x,y)
+    space. See `quickshift` for a description of the arguments.
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    image = image.astype(np.uint8)
+
+    segmentation = skimage_quickshift(image, ratio, kernel_size,
+                                      max_distance, sigma=sigma)
+    return segmentation.astype(np.int32)
+
+
 def quickshift_generator(ratio=RATIO, kernel_size=KERNEL_SIZE,
-                         max_distance=MAX_DISTANCE, sigma=SIGMA):
+                         max_distance=MAX_DISTANCE, sigma=SIGMA,
+                         numpy=False):
     """Generator to segment an image using quickshift clustering in Color-(x,y)
     space.
 
@@ -54,24 +72,30 @@ def quickshift_generator(ratio=RATIO, kernel_size=KERNEL_SIZE,
         max_distance: Cut-off point for data distances. Higher means fewer
           clusters (optional).
         sigma: Width of Gaussian kernel used in preprocessing (optional).
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
 
     Returns:
         Segmentation algorithm that takes a single input image.
     """
 
+    segment = quickshift_np if numpy else quickshift
+
     def _generator(image):
-        return quickshift(image, ratio, kernel_size, max_distance, sigma)
+        return segment(image, ratio, kernel_size, max_distance, sigma)
 
     return _generator
 
 
-def quickshift_json_generator(config):
+def quickshift_json_generator(config, numpy=False):
     """Generator to segment an image using quickshift clustering in Color-(x,y)
     space based on a json object.
 
     Args:
         config: A configuration object with sensible defaults for
           missing values.
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
 
     Returns:
         Segmentation algorithm that takes a single input image.
@@ -80,4 +104,5 @@ def quickshift_json_generator(config):
     return quickshift_generator(config.get('ratio', RATIO),
                                 config.get('kernel_size', KERNEL_SIZE),
                                 config.get('max_distance', MAX_DISTANCE),
-                                config.get('sigma', SIGMA))
+                                config.get('sigma', SIGMA),
+                                numpy)
@@ -0,0 +1,134 @@
+from __future__ import division
+
+import tensorflow as tf
+import numpy as np
+from skimage.transform import resize
+
+from timing import timed
+
+
+def scaled_segmentation(image, segment, scale):
+    """Segments a downsampled image and upsamples the segmentation to the
+    size of the image with nearest neighbor interpolation, so that the
+    segmentation cost drops by about the square of the scale.
+
+    Args:
+        image: The image.
+        segment: The segmentation algorithm that takes a single input image.
+        scale: The factor to downsample the image with, e.g. 0.5.
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    with tf.name_scope('scaled_segmentation', values=[image]):
+        shape = tf.shape(image)
+        height, width = shape[0], shape[1]
+
+        scaled_height = _scaled_size(height, scale)
+        scaled_width = _scaled_size(width, scale)
+
+        scaled_image = tf.image.resize_images(
+            tf.cast(image, tf.float32), [scaled_height, scaled_width])
+
+        segmentation = segment(scaled_image)
+
+        # Gather the nearest row and column of each pixel.
+        rows = tf.range(0, height) * scaled_height // height
+        cols = tf.range(0, width) * scaled_width // width
+
+        segmentation = tf.gather(segmentation, rows)
+        segmentation = tf.transpose(
+            tf.gather(tf.transpose(segmentation), cols))
+        segmentation.set_shape(image.get_shape()[:2])
+
+    return segmentation
+
+
+@timed('scaled_segmentation')
+def scaled_segmentation_np(image, segment, scale):
+    """Segments a downsampled numpy image and upsamples the segmentation. See
+    `scaled_segmentation` for a description of the arguments.
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    height, width = image.shape[:2]
+    scaled_height = max(int(round(height * scale)), 1)
+    scaled_width = max(int(round(width * scale)), 1)
+
+    scaled_image = resize(image.astype(np.float32),
+                          (scaled_height, scaled_width), order=1,
+                          mode='reflect', preserve_range=True)
+
+    segmentation = segment(scaled_image)
+
+    # Gather the nearest row and column of each pixel.
+    rows = np.arange(height) * scaled_height // height
+    cols = np.arange(width) * scaled_width // width
+
+    return segmentation[rows[:, None], cols[None, :]]
+
+
+def scaled_generator(segment, scale, numpy=False):
+    """Generator to segment downsampled images with a segmentation
+    algorithm.
+
+    Args:
+        segment: The segmentation algorithm that takes a single input image.
+        scale: The factor to downsample the images with, e.g. 0.5.
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
+
+    Returns:
+        Segmentation algorithm that takes a single input image.
+    """
+
+    scaled = scaled_segmentation_np if numpy else scaled_segmentation
+
+    def _generator(image):
+        return scaled(image, segment, scale)
+
+    return _generator
+
+
+def scaled_json_generator(json_generator):
+    """Extends a json generator of a segmentation algorithm by the optional
+    `segmentation_scale` value, which segments images downsampled by this
+    factor. Parameters of the algorithm measured in pixels, e.g. minimum
+    segment sizes, refer to the downsampled image.
+
+    Args:
+        json_generator: The json generator of a segmentation algorithm.
+
+    Returns:
+        A json generator.
+    """
+
+    def _json_generator(config, numpy=False):
+        segment = json_generator(config, numpy)
+        scale = config.get('segmentation_scale', 1.0)
+
+        if scale == 1.0:
+            return segment
+
+        return scaled_generator(segment, scale, numpy)
+
+    return _json_generator
+
+
+def _scaled_size(size, scale):
+    """Scales a size tensor and rounds it to at least one pixel.
+
+    Args:
+        size: A scalar int32 tensor.
+        scale: The scale.
+
+    Returns:
+        A scalar int32 tensor.
+    """
+
+    size = tf.round(tf.cast(size, tf.float32) * scale)
+
+    return tf.maximum(tf.cast(size, tf.int32), 1)
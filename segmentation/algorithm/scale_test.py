@@ -0,0 +1,42 @@
+import tensorflow as tf
+import numpy as np
+
+from .scale import scaled_segmentation_np, scaled_json_generator
+
+
+class ScaleTest(tf.test.TestCase):
+
+    def test_scaled_segmentation(self):
+        image = np.zeros((4, 6, 3), dtype=np.uint8)
+        image[:, 4:] = 255
+
+        shapes = []
+
+        def _segment(image):
+            shapes.append(image.shape)
+            return (image[:, :, 0] > 127).astype(np.int32)
+
+        segmentation = scaled_segmentation_np(image, _segment, 0.5)
+
+        # The image is segmented at half the resolution and the segmentation
+        # is upsampled with nearest neighbor interpolation.
+        self.assertEqual(shapes, [(2, 3, 3)])
+        self.assertAllEqual(segmentation, [
+            [0, 0, 0, 0, 1, 1],
+            [0, 0, 0, 0, 1, 1],
+            [0, 0, 0, 0, 1, 1],
+            [0, 0, 0, 0, 1, 1],
+        ])
+
+    def test_scaled_json_generator(self):
+        def _json_generator(config, numpy=False):
+            return lambda image: np.zeros(image.shape[:2], dtype=np.int32)
+
+        json_generator = scaled_json_generator(_json_generator)
+        image = np.zeros((10, 10, 3), dtype=np.uint8)
+
+        segment = json_generator({'segmentation_scale': 0.3}, numpy=True)
+        self.assertEqual(segment(image).shape, (10, 10))
+
+        segment = json_generator({}, numpy=True)
+        self.assertEqual(segment(image).shape, (10, 10))
@@ -2,6 +2,8 @@ import tensorflow as tf
 import numpy as np
 from skimage.segmentation import slic as skimage_slic
 
+from timing import timed
+
 
 NUM_SEGMENTS = 400
 COMPACTNESS = 30.0
@@ -42,22 +44,42 @@ def slico(image, num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
     image = tf.cast(image, tf.uint8)
 
     def _slico(image):
-        segmentation = skimage_slic(image, num_segments, compactness,
-                                    max_iterations, sigma,
-                                    min_size_factor=min_size_factor,
-                                    max_size_factor=max_size_factor,
-                                    enforce_connectivity=enforce_connectivity,
-                                    slic_zero=True)
-        return segmentation.astype(np.int32)
+        return slico_np(image, num_segments, compactness, max_iterations,
+                        sigma, min_size_factor, max_size_factor,
+                        enforce_connectivity)
 
     return tf.py_func(_slico, [image], tf.int32, stateful=False, name='slico')
 
 
+@timed('slico')
+def slico_np(image, num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
+             max_iterations=MAX_ITERATIONS, sigma=SIGMA,
+             min_size_factor=MIN_SIZE_FACTOR, max_size_factor=MAX_SIZE_FACTOR,
+             enforce_connectivity=CONNECTIVITY):
+    """Segments a numpy image using k-means clustering in Color-(x,y,z) space
+    with adaptive compactness. See `slico` for a description of the
+    arguments.
+
+    Returns:
+        Integer mask indicating segment labels.
+    """
+
+    image = image.astype(np.uint8)
+
+    segmentation = skimage_slic(image, num_segments, compactness,
+                                max_iterations, sigma,
+                                min_size_factor=min_size_factor,
+                                max_size_factor=max_size_factor,
+                                enforce_connectivity=enforce_connectivity,
+                                slic_zero=True)
+    return segmentation.astype(np.int32)
+
+
 def slico_generator(num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
                     max_iterations=MAX_ITERATIONS, sigma=SIGMA,
                     min_size_factor=MIN_SIZE_FACTOR,
                     max_size_factor=MAX_SIZE_FACTOR,
-                    enforce_connectivity=CONNECTIVITY):
+                    enforce_connectivity=CONNECTIVITY, numpy=False):
     """Generator to segment an image using k-means clustering in Color-(x,y,z)
     space.
 
@@ -76,25 +98,32 @@ def slico_generator(num_segments=NUM_SEGMENTS, compactness=COMPACTNESS,
           (optional).
         enforce_connectivitiy: Whether the generated segments are connected or
           not (optional).
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
 
     Returns:
         Segmentation algorithm that takes a single input image.
     """
 
+    segment = slico_np if numpy else slico
+
     def _generator(image):
-        return slico(image, num_segments, compactness, max_iterations,
-                     sigma)
+        return segment(image, num_segments, compactness, max_iterations,
+                       sigma, min_size_factor, max_size_factor,
+                       enforce_connectivity)
 
     return _generator
 
 
-def slico_json_generator(config):
+def slico_json_generator(config, numpy=False):
     """Generator to segment an image using k-means clustering in Color-(x,y,z)
     space based on a json object.
 
     Args:
         config: A configuration object with sensible defaults for
           missing values.
+        numpy: Whether the algorithm takes and returns numpy arrays instead
+          of tensors (optional).
 
     Returns:
         Segmentation algorithm that takes a single input image.
@@ -106,4 +135,5 @@ def slico_json_generator(config):
                            config.get('sigma', SIGMA),
                            config.get('min_size_factor', MIN_SIZE_FACTOR),
                            config.get('max_size_factor', MAX_SIZE_FACTOR),
-                           config.get('enforce_connectivity', CONNECTIVITY))
+                           config.get('enforce_connectivity', CONNECTIVITY),
+                           numpy)
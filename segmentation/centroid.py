@@ -0,0 +1,31 @@
+import numpy as np
+
+from timing import timed
+
+
+@timed('segment_centroids')
+def segment_centroids_np(segmentation):
+    """Computes the centroids of all segments of a numpy segmentation.
+
+    Args:
+        segmentation: The segmentation with non-negative labels.
+
+    Returns:
+        The [row, column] centroids of the segments in the order of their
+        labels in the shape [num_segments, 2].
+    """
+
+    segmentation = np.asarray(segmentation)
+    labels = segmentation.ravel()
+    rows, cols = np.indices(segmentation.shape)
+
+    # Sum up the coordinates of the pixels of each label.
+    counts = np.bincount(labels)
+    present = counts > 0
+    row_sums = np.bincount(labels, weights=rows.ravel())
+    col_sums = np.bincount(labels, weights=cols.ravel())
+
+    centroids = np.stack([row_sums[present], col_sums[present]], axis=1)
+    centroids /= counts[present, None]
+
+    return centroids.astype(np.float32)
@@ -0,0 +1,26 @@
+from __future__ import division
+
+import tensorflow as tf
+import numpy as np
+
+from .centroid import segment_centroids_np
+
+
+class CentroidTest(tf.test.TestCase):
+
+    def test_segment_centroids(self):
+        segmentation = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 0, 1],
+            [2, 0, 0, 4],
+            [2, 2, 4, 4],
+        ])
+
+        expected = [
+            [(0+1+0+1+2+1+2)/7, (0+1+0+1+2+1+2)/7],
+            [(0+0+1)/3, (2+3+3)/3],
+            [(2+3+3)/3, (0+0+1)/3],
+            [(3+2+3)/3, (3+2+3)/3],
+        ]
+
+        self.assertAllClose(segment_centroids_np(segmentation), expected)
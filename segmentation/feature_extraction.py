@@ -1,70 +1,72 @@
-from math import sqrt, pi as PI, isnan
+from math import sqrt
 
 import tensorflow as tf
 import numpy as np
-from skimage.measure import regionprops
+from scipy import ndimage
+from skimage.morphology import convex_hull_image
 
+from timing import timed
 
-# Static number of features to generate for one segment.
+
+# The number of features of each feature group:
+# * `moments`: The raw moments up to order 3 of the segment's pixels.
+# * `bbox`: The height and width of the bounding box.
+# * `shape`: The convex area and the perimeter.
+# * `weighted_moments`: The moments weighted by the intensity image.
+# * `color_stats`: The mean, minimum and maximum of each color channel.
+# * `area`: The number of pixels.
+# * `color_std`: The standard deviation of each color channel.
+FEATURE_GROUPS = {'moments': 16, 'bbox': 2, 'shape': 2,
+                  'weighted_moments': 16, 'color_stats': 9, 'area': 1,
+                  'color_std': 3}
+
+# The feature groups computed by default in the order of their features.
+DEFAULT_FEATURE_GROUPS = ['moments', 'bbox', 'shape', 'weighted_moments',
+                          'color_stats']
+
+# Static number of features to generate for one segment by default.
 NUM_FEATURES = 45
 
 
+def num_features(groups=DEFAULT_FEATURE_GROUPS):
+    """Computes the number of features of a selection of feature groups.
+
+    Args:
+        groups: A list of the names of the feature groups (optional).
+
+    Returns:
+        A number.
+
+    Raises:
+        ValueError: If a feature group is unknown.
+    """
+
+    _check_feature_groups(groups)
+
+    return sum(FEATURE_GROUPS[group] for group in groups)
+
+
 # TODO Oriented Bounding Box missing
-def feature_extraction(segmentation, image):
+def feature_extraction(segmentation, image, groups=DEFAULT_FEATURE_GROUPS):
     """Extracts a fixed number of features for every segment label in the
     segmentation.
 
     Args:
         segmentation: The segmentation.
         image: The corresponding original image.
+        groups: A list of the names of the feature groups to compute. The
+          features are concatenated in the order of the groups (optional).
 
     Returns:
         Numpy array with shape [num_segments, num_features].
     """
 
     def _feature_extraction(segmentation, intensity_image, image):
-        props = regionprops(segmentation, intensity_image)
-
-        # Create the output feature vector with shape
-        # [num_segments, num_features].
-        features = np.zeros((len(props), NUM_FEATURES), dtype=np.float32)
-
-        for i, prop in enumerate(props):
-            # Moments features.
-            features[i][0:16] = prop['moments'].flatten()
-
-            # Bounding box features.
-            bbox = prop['bbox']
-            features[i][16] = bbox[2] - bbox[0]
-            features[i][17] = bbox[3] - bbox[1]
+        return _bincount_features(segmentation, intensity_image, image,
+                                  groups)
 
-            # Polygon features.
-            features[i][18] = prop['convex_area']
-            features[i][19] = prop['perimeter']
-
-            # Weighted moments features.
-            features[i][20:36] = prop['weighted_moments'].flatten()
-
-            # Color features.
-            sliced_image = image[bbox[0]:bbox[2], bbox[1]:bbox[3]]
-            sliced_image = sliced_image[prop['image']]
-
-            features[i][36] = sliced_image[..., 0].mean()
-            features[i][37] = sliced_image[..., 1].mean()
-            features[i][38] = sliced_image[..., 2].mean()
-
-            features[i][39] = sliced_image[..., 0].min()
-            features[i][40] = sliced_image[..., 1].min()
-            features[i][41] = sliced_image[..., 2].min()
-
-            features[i][42] = sliced_image[..., 0].max()
-            features[i][43] = sliced_image[..., 1].max()
-            features[i][44] = sliced_image[..., 2].max()
-
-        return features
-
-    # We need to increment the segmentation, because labels with value 0 are
-    # ignored when calling regionprops.
+    # We need to increment the segmentation, because the features are
+    # computed for labels starting at 1 like regionprops does.
     segmentation = segmentation + tf.ones_like(segmentation)
 
     # Get the intensity image with shape [height, width] of the image by
@@ -84,3 +86,295 @@ def feature_extraction(segmentation, image):
     return tf.py_func(
         _feature_extraction, [segmentation, intensity_image, image],
         tf.float32, stateful=False, name='feature_extraction')
+
+
+def feature_extraction_np(segmentation, image, groups=DEFAULT_FEATURE_GROUPS):
+    """Extracts a fixed number of features for every segment label in the
+    numpy segmentation. See `feature_extraction` for a description of the
+    arguments.
+
+    Returns:
+        Numpy array with shape [num_segments, num_features].
+    """
+
+    # We need to increment the segmentation, because the features are
+    # computed for labels starting at 1 like regionprops does.
+    segmentation = segmentation + 1
+
+    # The intensity image is the value channel of the HSV colorspace, which is
+    # the maximum of the RGB channels.
+    intensity_image = image.astype(np.uint8).max(axis=2).astype(np.float32)
+    intensity_image *= np.float32(1.0 / 255)
+
+    return _bincount_features(segmentation, intensity_image, image, groups)
+
+
+def flip_features_np(features, groups=DEFAULT_FEATURE_GROUPS):
+    """Computes the features of the segments of a horizontally flipped
+    image from the features of the segments of the image. The moments of each
+    segment are mirrored within its bounding box, all other features are
+    invariant to horizontal flips.
+
+    Args:
+        features: Numpy array with shape [num_segments, num_features].
+        groups: A list of the names of the feature groups of the features
+          (optional).
+
+    Returns:
+        Numpy array with shape [num_segments, num_features].
+
+    Raises:
+        ValueError: If moments should be flipped without the width of their
+          bounding box.
+    """
+
+    features = features.astype(np.float32)
+    offsets = _feature_offsets(groups)
+
+    starts = [offsets[group] for group in ['moments', 'weighted_moments']
+              if group in offsets]
+
+    if len(starts) == 0:
+        return features
+
+    if 'bbox' not in offsets:
+        raise ValueError('Flipping moments needs the bbox feature group.')
+
+    # The moments m_qp are indexed by the power q of the column coordinates
+    # first. Mirroring the column coordinates c to w - 1 - c expands every
+    # moment m_qp into sum_k binom(q, k) (w - 1)^(q - k) (-1)^k m_kp.
+    width = features[:, offsets['bbox'] + 1].astype(np.float64) - 1
+    q, k = np.meshgrid(np.arange(4), np.arange(4), indexing='ij')
+    binomials = np.array([[1, 0, 0, 0], [1, 1, 0, 0], [1, 2, 1, 0],
+                          [1, 3, 3, 1]], dtype=np.float64)
+    exponents = np.maximum(q - k, 0)
+    transform = binomials * (-1.0) ** k *\
+        width[:, None, None] ** exponents * (k <= q)
+
+    flipped = features.copy()
+
+    for start in starts:
+        moments = features[:, start:start + 16].reshape(-1, 4, 4)
+        moments = np.einsum('nqk,nkp->nqp', transform, moments)
+        flipped[:, start:start + 16] = moments.reshape(-1, 16)
+
+    return flipped
+
+
+# The weights of the codes of border pixels to estimate the perimeter like
+# `skimage.measure.perimeter` with a 4-connected neighborhood.
+PERIMETER_WEIGHTS = np.zeros((50), dtype=np.float64)
+PERIMETER_WEIGHTS[[5, 7, 15, 17, 25, 27]] = 1
+PERIMETER_WEIGHTS[[21, 33]] = sqrt(2)
+PERIMETER_WEIGHTS[[13, 23]] = (1 + sqrt(2)) / 2
+
+
+@timed('feature_extraction')
+def _bincount_features(segmentation, intensity_image, image,
+                       groups=DEFAULT_FEATURE_GROUPS):
+    """Extracts the features of every region in an incremented segmentation
+    for all regions at once. Computes the same features as a loop over
+    `skimage.measure.regionprops` for the default feature groups.
+
+    Args:
+        segmentation: The segmentation with labels starting at 1.
+        intensity_image: The [height, width] intensity image.
+        image: The corresponding original image.
+        groups: A list of the names of the feature groups to compute
+          (optional).
+
+    Returns:
+        Numpy array with shape [num_segments, num_features].
+    """
+
+    _check_feature_groups(groups)
+
+    _, segments = np.unique(segmentation, return_inverse=True)
+    segments = segments.reshape(segmentation.shape)
+    num_segments = segments.max() + 1 if segments.size > 0 else 0
+
+    features = {}
+
+    # Sort the pixels by their segment to reduce each segment at once.
+    flat = segments.ravel()
+    order = np.argsort(flat, kind='mergesort')
+    counts = np.bincount(flat, minlength=num_segments)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    def _reduce(ufunc, values):
+        return ufunc.reduceat(values.ravel()[order], starts)
+
+    if 'area' in groups:
+        features['area'] = counts[:, None]
+
+    if {'moments', 'weighted_moments', 'bbox'} & set(groups):
+        rows, cols = np.indices(segments.shape)
+
+        # Bounding box features.
+        min_rows = _reduce(np.minimum, rows)
+        min_cols = _reduce(np.minimum, cols)
+        features['bbox'] = np.stack(
+            [_reduce(np.maximum, rows) - min_rows + 1,
+             _reduce(np.maximum, cols) - min_cols + 1], axis=1)
+
+    if {'moments', 'weighted_moments'} & set(groups):
+        # Moments features of the coordinates relative to the bounding box.
+        # The moment sum(c^q r^p) is stored at 4q + p like regionprops used
+        # to.
+        rows = (rows.ravel() - min_rows[flat]).astype(np.float64)
+        cols = (cols.ravel() - min_cols[flat]).astype(np.float64)
+        intensities = intensity_image.ravel().astype(np.float64)
+
+        row_powers = [np.ones_like(rows), rows, rows ** 2, rows ** 3]
+        col_powers = [np.ones_like(cols), cols, cols ** 2, cols ** 3]
+
+        moments = np.zeros((num_segments, 16), dtype=np.float64)
+        weighted_moments = np.zeros((num_segments, 16), dtype=np.float64)
+
+        for p in range(4):
+            for q in range(4):
+                powers = row_powers[p] * col_powers[q]
+
+                if 'moments' in groups:
+                    moments[:, 4 * q + p] = np.bincount(
+                        flat, weights=powers, minlength=num_segments)
+
+                if 'weighted_moments' in groups:
+                    weighted_moments[:, 4 * q + p] = np.bincount(
+                        flat, weights=powers * intensities,
+                        minlength=num_segments)
+
+        features['moments'] = moments
+        features['weighted_moments'] = weighted_moments
+
+    # Polygon features.
+    if 'shape' in groups:
+        features['shape'] = np.stack(
+            [_convex_areas_np(segments, num_segments),
+             _perimeters_np(segments, num_segments)], axis=1)
+
+    # Color features.
+    if {'color_stats', 'color_std'} & set(groups):
+        colors = image.reshape(-1, image.shape[-1]).astype(np.float64)
+        means = np.stack([np.bincount(flat, weights=colors[:, c],
+                                      minlength=num_segments)
+                          for c in range(3)], axis=1) / counts[:, None]
+
+    if 'color_stats' in groups:
+        minimums = np.stack([_reduce(np.minimum, colors[:, c])
+                             for c in range(3)], axis=1)
+        maximums = np.stack([_reduce(np.maximum, colors[:, c])
+                             for c in range(3)], axis=1)
+        features['color_stats'] = np.concatenate(
+            [means, minimums, maximums], axis=1)
+
+    if 'color_std' in groups:
+        squares = np.stack([np.bincount(flat, weights=colors[:, c] ** 2,
+                                        minlength=num_segments)
+                            for c in range(3)], axis=1) / counts[:, None]
+        features['color_std'] = np.sqrt(np.maximum(squares - means ** 2, 0))
+
+    return np.concatenate(
+        [np.zeros((num_segments, 0))] + [features[group] for group in groups],
+        axis=1).astype(np.float32)
+
+
+def _check_feature_groups(groups):
+    """Checks that all feature groups are known.
+
+    Args:
+        groups: A list of the names of the feature groups.
+
+    Raises:
+        ValueError: If a feature group is unknown.
+    """
+
+    for group in groups:
+        if group not in FEATURE_GROUPS:
+            raise ValueError('Unknown feature group {}.'.format(group))
+
+
+def _feature_offsets(groups):
+    """Computes the index of the first feature of each feature group.
+
+    Args:
+        groups: A list of the names of the feature groups.
+
+    Returns:
+        A dictionary mapping the names of the feature groups to their offset.
+
+    Raises:
+        ValueError: If a feature group is unknown.
+    """
+
+    _check_feature_groups(groups)
+
+    offsets = np.cumsum([0] + [FEATURE_GROUPS[group] for group in groups])
+
+    return {group: int(offset) for group, offset in zip(groups, offsets)}
+
+
+def _convex_areas_np(segments, num_segments):
+    """Computes the number of pixels in the convex hull of each segment.
+
+    Args:
+        segments: The segmentation with the labels replaced by the indices of
+          the segments.
+        num_segments: The number of segments.
+
+    Returns:
+        Numpy array with shape [num_segments].
+    """
+
+    areas = np.zeros((num_segments), dtype=np.float64)
+
+    # The convex hulls can't be vectorized, but their computation is
+    # restricted to the bounding box of each segment.
+    for i, slices in enumerate(ndimage.find_objects(segments + 1)):
+        areas[i] = convex_hull_image(segments[slices] == i).sum()
+
+    return areas
+
+
+def _perimeters_np(segments, num_segments):
+    """Estimates the perimeter of each segment like
+    `skimage.measure.perimeter` with a 4-connected neighborhood.
+
+    Args:
+        segments: The segmentation with the labels replaced by the indices of
+          the segments.
+        num_segments: The number of segments.
+
+    Returns:
+        Numpy array with shape [num_segments].
+    """
+
+    height, width = segments.shape
+    padded = np.pad(segments, 1, mode='constant', constant_values=-1)
+
+    def _shifted(values, dy, dx):
+        return values[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+
+    # Border pixels have a 4-connected neighbor outside of their segment.
+    border = np.zeros((height, width), dtype=np.bool_)
+    for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+        border |= _shifted(padded, dy, dx) != segments
+
+    padded_border = np.pad(border, 1, mode='constant', constant_values=False)
+
+    # Code each border pixel by its neighboring border pixels of the same
+    # segment.
+    codes = border.astype(np.int64)
+    for dy in [-1, 0, 1]:
+        for dx in [-1, 0, 1]:
+            if dy == 0 and dx == 0:
+                continue
+
+            weight = 10 if dy != 0 and dx != 0 else 2
+            neighbor = _shifted(padded_border, dy, dx) &\
+                (_shifted(padded, dy, dx) == segments)
+            codes += weight * (border & neighbor)
+
+    return np.bincount(segments[border],
+                       weights=PERIMETER_WEIGHTS[codes[border]],
+                       minlength=num_segments)
@@ -0,0 +1,70 @@
+"""Benchmarks the extraction of the node features of a segmentation.
+
+Run with:
+    python -m segmentation.feature_extraction_benchmark --benchmarks=.
+"""
+
+import time
+
+from six.moves import xrange
+import tensorflow as tf
+import numpy as np
+from skimage.segmentation import slic
+
+from .feature_extraction import _bincount_features
+from .feature_extraction_test import _regionprops_features
+
+
+# Sizes of the shipped PatchySan PascalVOC configuration.
+HEIGHT = 375
+WIDTH = 500
+NUM_SEGMENTS = 300
+
+BURN_ITERS = 1
+NUM_ITERS = 10
+
+
+class FeatureExtractionBenchmark(tf.test.Benchmark):
+
+    def _inputs(self):
+        rng = np.random.RandomState(0)
+
+        # A smooth random image, so that the segments look like superpixels
+        # of natural images.
+        image = rng.rand(HEIGHT // 25, WIDTH // 25, 3)
+        image = np.kron(image, np.ones((25, 25, 1))) * 255
+        image += rng.rand(HEIGHT, WIDTH, 3) * 32
+        image = np.clip(image, 0, 255).astype(np.float32)
+
+        segmentation = slic(image / 255, n_segments=NUM_SEGMENTS,
+                            compactness=30.0)
+
+        intensity_image = image.astype(np.uint8).max(axis=2)
+        intensity_image = intensity_image.astype(np.float32) / 255
+
+        return segmentation + 1, intensity_image, image
+
+    def _run(self, name, function):
+        inputs = self._inputs()
+
+        for _ in xrange(BURN_ITERS):
+            function(*inputs)
+
+        start = time.time()
+        for _ in xrange(NUM_ITERS):
+            function(*inputs)
+        wall_time = (time.time() - start) / NUM_ITERS
+
+        self.report_benchmark(
+            iters=NUM_ITERS, wall_time=wall_time, name=name,
+            extras={'examples_per_sec': 1 / wall_time})
+
+    def benchmark_regionprops(self):
+        self._run('regionprops', _regionprops_features)
+
+    def benchmark_bincount(self):
+        self._run('bincount', _bincount_features)
+
+
+if __name__ == '__main__':
+    tf.test.main()
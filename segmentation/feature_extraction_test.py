@@ -1,8 +1,67 @@
-from math import sqrt, pi as PI
+from math import sqrt
 
 import tensorflow as tf
+import numpy as np
+from skimage.measure import moments, regionprops
 
-from .feature_extraction import feature_extraction
+from .feature_extraction import feature_extraction, feature_extraction_np,\
+                                flip_features_np, num_features,\
+                                _bincount_features, NUM_FEATURES
+
+
+def _regionprops_features(segmentation, intensity_image, image):
+    """Extracts the features of every region in an incremented segmentation
+    with a loop over `skimage.measure.regionprops`. The reference of
+    `_bincount_features`.
+
+    Args:
+        segmentation: The segmentation with labels starting at 1.
+        intensity_image: The [height, width] intensity image.
+        image: The corresponding original image.
+
+    Returns:
+        Numpy array with shape [num_segments, num_features].
+    """
+
+    props = regionprops(segmentation, intensity_image)
+
+    # Create the output feature vector with shape
+    # [num_segments, num_features].
+    features = np.zeros((len(props), NUM_FEATURES), dtype=np.float32)
+
+    for i, prop in enumerate(props):
+        # Moments features.
+        features[i][0:16] = prop['moments'].flatten()
+
+        # Bounding box features.
+        bbox = prop['bbox']
+        features[i][16] = bbox[2] - bbox[0]
+        features[i][17] = bbox[3] - bbox[1]
+
+        # Polygon features.
+        features[i][18] = prop['convex_area']
+        features[i][19] = prop['perimeter']
+
+        # Weighted moments features.
+        features[i][20:36] = prop['weighted_moments'].flatten()
+
+        # Color features.
+        sliced_image = image[bbox[0]:bbox[2], bbox[1]:bbox[3]]
+        sliced_image = sliced_image[prop['image']]
+
+        features[i][36] = sliced_image[..., 0].mean()
+        features[i][37] = sliced_image[..., 1].mean()
+        features[i][38] = sliced_image[..., 2].mean()
+
+        features[i][39] = sliced_image[..., 0].min()
+        features[i][40] = sliced_image[..., 1].min()
+        features[i][41] = sliced_image[..., 2].min()
+
+        features[i][42] = sliced_image[..., 0].max()
+        features[i][43] = sliced_image[..., 1].max()
+        features[i][44] = sliced_image[..., 2].max()
+
+    return features
 
 
 class FeaturesTest(tf.test.TestCase):
@@ -56,3 +115,70 @@ class FeaturesTest(tf.test.TestCase):
             self.assertAllEqual(f[36:39], mean[0:3])
             self.assertAllEqual(f[39:42], minimum)
             self.assertAllEqual(f[42:45], maximum)
+
+    def test_equivalence_to_regionprops(self):
+        random_state = np.random.RandomState(0)
+
+        for _ in range(10):
+            height, width = random_state.randint(5, 40, size=2)
+
+            # Blocky segmentations with possibly disconnected segments.
+            segmentation = random_state.randint(0, 9, size=(height, width))
+            segmentation = np.kron(segmentation, np.ones((2, 3), np.int32))
+
+            image = random_state.randint(0, 256, segmentation.shape + (3,))
+            image = image.astype(np.float32)
+            intensity_image = image.max(axis=2) / 255
+
+            expected = _regionprops_features(segmentation + 1,
+                                             intensity_image, image)
+
+            # Newer scikit-image versions index moments by the power of the
+            # row coordinates first.
+            if moments(np.array([[0, 1]]), 1)[0, 1] == 1:
+                for start in [0, 20]:
+                    expected[:, start:start + 16] = np.transpose(
+                        expected[:, start:start + 16].reshape(-1, 4, 4),
+                        (0, 2, 1)).reshape(-1, 16)
+
+            self.assertAllClose(
+                _bincount_features(segmentation + 1, intensity_image, image),
+                expected, rtol=1e-5, atol=1e-3)
+
+    def test_feature_groups(self):
+        random_state = np.random.RandomState(0)
+        segmentation = random_state.randint(0, 6, size=(8, 9))
+        segmentation = np.kron(segmentation, np.ones((2, 3), np.int32))
+        image = random_state.randint(0, 256, segmentation.shape + (3,))
+        image = image.astype(np.float32)
+
+        features = feature_extraction_np(segmentation, image)
+        self.assertEqual(features.shape[1], num_features())
+
+        groups = ['color_std', 'bbox', 'area', 'weighted_moments']
+        selected = feature_extraction_np(segmentation, image, groups)
+        self.assertEqual(selected.shape, (features.shape[0], 22))
+        self.assertEqual(num_features(groups), 22)
+
+        self.assertAllEqual(selected[:, 3:5], features[:, 16:18])
+        self.assertAllClose(selected[:, 6:22], features[:, 20:36])
+
+        _, segments = np.unique(segmentation, return_inverse=True)
+        segments = segments.reshape(segmentation.shape)
+        self.assertAllEqual(selected[:, 5], np.bincount(segments.ravel()))
+        self.assertAllClose(
+            selected[:, 0:3],
+            [image[segments == i].std(axis=0)
+             for i in range(features.shape[0])], rtol=1e-4)
+
+        # The flipped features equal the features of the flipped image.
+        self.assertAllClose(
+            flip_features_np(selected, groups),
+            feature_extraction_np(segmentation[:, ::-1], image[:, ::-1],
+                                  groups), rtol=1e-4, atol=1e-2)
+
+        with self.assertRaises(ValueError):
+            num_features(['unknown'])
+
+        with self.assertRaises(ValueError):
+            flip_features_np(selected[:, 6:22], ['weighted_moments'])
@@ -0,0 +1 @@
+from .timer import timed, record, pop_durations, merge_durations, summary
@@ -0,0 +1,106 @@
+import time
+import threading
+import functools
+import collections
+
+import numpy as np
+
+
+# The durations recorded in this process since they were last popped. Timed
+# functions may be run concurrently by TensorFlow's py_func threads.
+_durations = collections.defaultdict(list)
+_lock = threading.Lock()
+
+
+def timed(name):
+    """Decorator that records the duration of every call of a function.
+
+    Args:
+        name: The name to record the durations with.
+
+    Returns:
+        A decorator.
+    """
+
+    def _decorator(function):
+        @functools.wraps(function)
+        def _timed(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return _timed
+
+    return _decorator
+
+
+def record(name, duration):
+    """Records a duration.
+
+    Args:
+        name: The name to record the duration with.
+        duration: The duration in seconds.
+    """
+
+    with _lock:
+        _durations[name].append(duration)
+
+
+def pop_durations():
+    """Returns and resets all durations recorded in this process.
+
+    Returns:
+        A dictionary holding a list of durations in seconds for each name.
+    """
+
+    global _durations
+
+    with _lock:
+        durations = _durations
+        _durations = collections.defaultdict(list)
+
+    return dict(durations)
+
+
+def merge_durations(durations, other):
+    """Appends the durations of a dictionary to another dictionary, e.g. to
+    collect the durations popped in worker processes.
+
+    Args:
+        durations: The dictionary to append to.
+        other: The dictionary to append.
+    """
+
+    for name in other:
+        durations.setdefault(name, []).extend(other[name])
+
+
+def summary(durations):
+    """Summarizes the latencies of recorded durations.
+
+    Args:
+        durations: A dictionary holding a list of durations for each name.
+
+    Returns:
+        A dictionary holding the count and the mean, p50, p95 and total
+        latency in seconds for each name.
+    """
+
+    summaries = {}
+
+    for name in durations:
+        values = np.array(durations[name], dtype=np.float64)
+
+        if values.size == 0:
+            continue
+
+        summaries[name] = {'count': int(values.size),
+                           'mean': float(values.mean()),
+                           'p50': float(np.percentile(values, 50)),
+                           'p95': float(np.percentile(values, 95)),
+                           'total': float(values.sum())}
+
+    return summaries
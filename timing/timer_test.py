@@ -0,0 +1,42 @@
+import tensorflow as tf
+
+from .timer import timed, record, pop_durations, merge_durations, summary
+
+
+class TimerTest(tf.test.TestCase):
+
+    def test_timed(self):
+        pop_durations()
+
+        @timed('double')
+        def double(value):
+            return 2 * value
+
+        self.assertEqual(double.__name__, 'double')
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(3), 6)
+
+        durations = pop_durations()
+        self.assertEqual(list(durations.keys()), ['double'])
+        self.assertEqual(len(durations['double']), 2)
+        self.assertEqual(pop_durations(), {})
+
+    def test_merge_durations(self):
+        durations = {'a': [1.0]}
+        merge_durations(durations, {'a': [2.0], 'b': [3.0]})
+
+        self.assertEqual(durations, {'a': [1.0, 2.0], 'b': [3.0]})
+
+    def test_summary(self):
+        pop_durations()
+
+        for duration in [1.0, 2.0, 3.0, 4.0, 5.0]:
+            record('stage', duration)
+
+        stage = summary(pop_durations())['stage']
+
+        self.assertEqual(stage['count'], 5)
+        self.assertAlmostEqual(stage['mean'], 3.0)
+        self.assertAlmostEqual(stage['p50'], 3.0)
+        self.assertAlmostEqual(stage['p95'], 4.8)
+        self.assertAlmostEqual(stage['total'], 15.0)